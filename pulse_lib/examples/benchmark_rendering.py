@@ -0,0 +1,309 @@
+"""
+Benchmarks for the rendering of pulse data.
+
+Run as script, e.g. python -m pulse_lib.examples.benchmark_rendering
+"""
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.segment_container import segment_container
+import pulse_lib.segments.utility.looping as lp
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+from pulse_lib.segments.data_classes.data_IQ import IQ_data_single, envelope_generator
+from pulse_lib.keysight.M3202A_uploader import UploadAggregator, Job
+from pulse_lib.render_pool import render_pool
+
+
+def make_staircase(n_steps, step_time=10):
+    '''
+    make a pulse_data object with n_steps blocks of increasing amplitude, e.g. as in a charge stability diagram.
+    Args:
+        n_steps (int) : number of blocks
+        step_time (double) : duration of a single block in ns
+    Returns:
+        data (pulse_data) : pulse data with approximately 2*n_steps breakpoints.
+    '''
+    data = pulse_data()
+    for i in range(n_steps):
+        data.add_pulse_data(base_pulse_element(i*step_time, (i+1)*step_time, i % 100, i % 100))
+    return data
+
+
+def benchmark_baseband_render(n_breakpoints=(10_000, 100_000, 1_000_000), sample_rate=1e9):
+    '''
+    compare the loop renderer with the vectorized renderer for the baseband part of the waveform.
+    Args:
+        n_breakpoints (tuple<int>) : sizes of the breakpoint tables to render.
+        sample_rate (double) : sample rate in Hz
+    '''
+    for n in n_breakpoints:
+        data = make_staircase(n//2)
+        # render the breakpoint table before timing.
+        times, voltages = data.baseband_pulse_data.pulse_data
+
+        results = {}
+        for renderer in ['loop', 'vectorized']:
+            pulse_data.set_baseband_renderer(renderer)
+            start = time.perf_counter()
+            wvf = data._render(sample_rate)
+            results[renderer] = (time.perf_counter() - start, wvf)
+
+        pulse_data.set_baseband_renderer('vectorized')
+        t_loop, wvf_loop = results['loop']
+        t_vec, wvf_vec = results['vectorized']
+        identical = np.array_equal(wvf_loop, wvf_vec)
+        print(f'{len(times):8d} breakpoints, {len(wvf_vec):9d} Sa: loop {t_loop*1000:8.1f} ms, '
+              f'vectorized {t_vec*1000:7.1f} ms, speedup {t_loop/t_vec:5.1f}x, identical: {identical}')
+
+
+def benchmark_batch_render(n_indices=(100, 1000), n_steps=100, sample_rate=1e9):
+    '''
+    compare rendering of all sweep indices one by one with the batched render.
+    Args:
+        n_indices (tuple<int>) : number of sweep indices
+        n_steps (int) : number of blocks per index
+        sample_rate (double) : sample rate in Hz
+    '''
+    for n in n_indices:
+        data_objects = []
+        for i in range(n):
+            data = make_staircase(n_steps, step_time=10 + i*0.1)
+            data.baseband_pulse_data.pulse_data
+            data_objects.append(data)
+
+        start = time.perf_counter()
+        for data in data_objects:
+            data._render(sample_rate)
+        t_single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        waveforms = pulse_data.render_batch(data_objects, sample_rate=sample_rate)
+        t_batch = time.perf_counter() - start
+
+        print(f'{n:6d} indices, {waveforms.shape[1]:7d} Sa: one by one {t_single*1000:8.1f} ms, '
+              f'batch {t_batch*1000:7.1f} ms, speedup {t_single/t_batch:5.1f}x')
+
+
+def benchmark_breakpoint_table(n_pulses=(1_000, 100_000, 1_000_000)):
+    '''
+    compare the sweep-line kernel for the breakpoint table with the previous kernel (np.unique on shifted time stamps).
+    Args:
+        n_pulses (tuple<int>) : number of (partially overlapping) ramps
+    '''
+    for n in n_pulses:
+        data = pulse_data()
+        for i in range(n):
+            data.add_pulse_data(base_pulse_element(i*10, i*10 + 15, i % 100, (i+1) % 100))
+        seq = data.baseband_pulse_data
+
+        start = time.perf_counter()
+        times_unique, voltages_unique = seq.pulse_data_unique
+        t_unique = time.perf_counter() - start
+
+        seq.re_render = True
+        start = time.perf_counter()
+        times, voltages = seq.pulse_data
+        t_sweep = time.perf_counter() - start
+
+        print(f'{n:8d} pulses: np.unique {t_unique*1000:8.1f} ms, sweep-line {t_sweep*1000:7.1f} ms, '
+              f'speedup {t_unique/t_sweep:5.1f}x')
+
+
+def benchmark_integrate(n_indices=(100, 1000), n_steps=100, sample_rate=1e9):
+    '''
+    compare the integration of all sweep indices one by one with the batched integration.
+    Args:
+        n_indices (tuple<int>) : number of sweep indices
+        n_steps (int) : number of blocks per index
+        sample_rate (double) : sample rate in Hz
+    '''
+    for n in n_indices:
+        data_objects = []
+        for i in range(n):
+            data = make_staircase(n_steps, step_time=10 + i*0.1)
+            data.baseband_pulse_data.pulse_data
+            data_objects.append(data)
+
+        start = time.perf_counter()
+        integrals = [data.integrate_waveform(0, data.total_time, sample_rate) for data in data_objects]
+        t_single = time.perf_counter() - start
+
+        post_delays = np.array([data.total_time for data in data_objects])
+        start = time.perf_counter()
+        integrals_batch = pulse_data.integrate_batch(data_objects, 0, post_delays, sample_rate)
+        t_batch = time.perf_counter() - start
+
+        print(f'{n:6d} indices: integrate one by one {t_single*1000:8.2f} ms, batch {t_batch*1000:7.2f} ms, '
+              f'speedup {t_single/t_batch:5.1f}x, max difference {np.max(np.abs(integrals - integrals_batch)):.2e}')
+
+
+def benchmark_MW_render(n_pulses=(100, 1_000, 10_000, 100_000), sample_rate=1e9):
+    '''
+    compare rendering MW pulses one by one with the vectorized MW renderer, e.g. for a randomized benchmarking sequence.
+    Args:
+        n_pulses (tuple<int>) : number of MW pulses in the segment
+        sample_rate (double) : sample rate in Hz
+    '''
+    envelope = envelope_generator('blackman')
+    for n in n_pulses:
+        data = pulse_data()
+        for i in range(n):
+            data.add_MW_data(IQ_data_single(i*25, i*25 + 20, 100, 10e6, (i % 4)*np.pi/2, envelope))
+        data.baseband_pulse_data.pulse_data
+
+        results = {}
+        for renderer in ['loop', 'vectorized']:
+            pulse_data.set_MW_renderer(renderer)
+            start = time.perf_counter()
+            wvf = data._render(sample_rate)
+            results[renderer] = (time.perf_counter() - start, wvf)
+
+        pulse_data.set_MW_renderer('vectorized')
+        t_loop, wvf_loop = results['loop']
+        t_vec, wvf_vec = results['vectorized']
+        identical = np.array_equal(wvf_loop, wvf_vec)
+        print(f'{n:7d} MW pulses: loop {t_loop*1000:8.1f} ms, vectorized {t_vec*1000:7.1f} ms, '
+              f'speedup {t_loop/t_vec:5.1f}x, identical: {identical}')
+
+
+def benchmark_content_cache(n_points=(10, 50), sample_rate=1e9):
+    '''
+    render all indices of all channels of a 2D sweep in two identical segments (e.g. the same segment used in two sequences)
+    with the waveform cache keyed per data object and by content. The waveform cache is cleared.
+    Args:
+        n_points (tuple<int>) : number of points of the sweep axes
+        sample_rate (double) : sample rate in Hz
+    '''
+    channels = ['P1', 'P2', 'B1', 'B2']
+    for key in ['id', 'content']:
+        segments = []
+        for i in range(2):
+            seg = segment_container(channels)
+            seg.P1.add_block(0, 1000, lp.linspace(-100, 100, n_points[0], axis=0, name='P1', unit='mV'))
+            seg.P2.add_block(0, 1000, lp.linspace(-100, 100, n_points[1], axis=1, name='P2', unit='mV'))
+            seg.B1.add_ramp_ss(0, 1000, 10, 20)
+            seg.B2.add_block(100, 900, 50)
+            # same as sequencer
+            seg.extend_dim(seg.shape, ref=True)
+            segments.append(seg)
+
+        pulse_data.set_waveform_cache_key(key)
+        pulse_data.set_waveform_cache_size(2*len(channels)*n_points[0]*n_points[1])
+        pulse_data.clear_waveform_cache()
+        pulse_data.reset_waveform_cache_stats()
+
+        start = time.perf_counter()
+        for seg in segments:
+            for channel in channels:
+                for index in np.ndindex(tuple(reversed(n_points))):
+                    seg.get_waveform(channel, index, sample_rate=sample_rate)
+        duration = time.perf_counter() - start
+
+        stats = pulse_data.get_waveform_cache_stats()
+        print(f"key '{key}': {duration*1000:7.1f} ms, renders {stats['renders']:5d}, hits {stats['hits']:5d}, "
+              f"dedup rate {stats['dedup_rate']*100:5.1f}%")
+
+    pulse_data.set_waveform_cache_key('id')
+    pulse_data.set_waveform_cache_size(100)
+
+
+def benchmark_upload_threads(n_threads=(1, 2, 4, 8), n_channels=20, n_segments=4, n_steps=20_000):
+    '''
+    render an upload job with the UploadAggregator with a thread pool of increasing size.
+    Args:
+        n_threads (tuple<int>) : sizes of the thread pool
+        n_channels (int) : number of channels
+        n_segments (int) : number of segments in the sequence
+        n_steps (int) : number of blocks per channel per segment
+    '''
+    channels = [f'P{i}' for i in range(n_channels)]
+    sequence = []
+    for i in range(n_segments):
+        seg = segment_container(channels)
+        for j, channel in enumerate(channels):
+            for k in range(n_steps):
+                getattr(seg, channel).add_block(k*10, (k+1)*10, (k + j) % 100)
+        sequence.append(seg)
+
+    zeros = {channel:(0,0) for channel in channels}
+    ones = {channel:1.0 for channel in channels}
+    limits = {channel:(-1000, 1000) for channel in channels}
+
+    # breakpoint tables are computed on first use.
+    for seg in sequence:
+        for channel in channels:
+            seg.get_waveform_npt(channel, (0,))
+            getattr(seg, channel).integrate((0,))
+
+    t_serial = None
+    for n in n_threads:
+        executor = ThreadPoolExecutor(n) if n > 1 else None
+        aggregator = UploadAggregator(channels, ones, limits, zeros, executor=executor)
+        job = Job([], sequence, (0,), None, 1)
+        # render all waveforms in every run.
+        pulse_data.clear_waveform_cache()
+
+        start = time.perf_counter()
+        aggregator.upload_job(job, lambda channel_name, waveform: None)
+        duration = time.perf_counter() - start
+        job.released = True
+        if executor is not None:
+            executor.shutdown()
+
+        if t_serial is None:
+            t_serial = duration
+        render_time = aggregator.get_task_timing_summary()['render'][1]
+        print(f'{n:3d} threads: {duration*1000:8.1f} ms, speedup {t_serial/duration:5.1f}x, '
+              f'sum of render tasks {render_time*1000:8.1f} ms')
+
+
+def benchmark_render_pool(n_processes=(1, 2, 4), n_points=(50, 40), n_channels=4, sample_rate=1e9):
+    '''
+    render all indices of a 2D sweep in-process and with a render pool with an increasing number of processes.
+    Args:
+        n_processes (tuple<int>) : number of worker processes
+        n_points (tuple<int>) : number of points of the sweep axes
+        n_channels (int) : number of channels
+        sample_rate (double) : sample rate in Hz
+    '''
+    channels = [f'P{i}' for i in range(n_channels)]
+    seg = segment_container(channels)
+    for i, channel in enumerate(channels):
+        for k in range(200):
+            getattr(seg, channel).add_block(k*50, (k+1)*50, (k + i) % 100)
+        getattr(seg, channel).add_block(0, 10_000, lp.linspace(-100, 100, n_points[i % 2], axis=i % 2, name=f'v{i%2}', unit='mV'))
+    seg.extend_dim(seg.shape, ref=True)
+    sequence = [seg]
+
+    start = time.perf_counter()
+    for channel in channels:
+        seg.get_waveform_batch(channel, sample_rate=sample_rate)
+    t_in_process = time.perf_counter() - start
+    print(f'in-process: {t_in_process*1000:8.1f} ms')
+
+    for n in n_processes:
+        start = time.perf_counter()
+        pool = render_pool(sequence, channels, n, sample_rate=sample_rate)
+        t_start = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for channel in channels:
+            waveforms = pool.render_indices(channel, sample_rate=sample_rate)
+            waveforms.release()
+        duration = time.perf_counter() - start
+        pool.shutdown()
+        print(f'{n:3d} processes: start {t_start*1000:8.1f} ms, render {duration*1000:8.1f} ms, '
+              f'speedup {t_in_process/duration:5.1f}x')
+
+
+if __name__ == '__main__':
+    benchmark_breakpoint_table()
+    benchmark_baseband_render()
+    benchmark_batch_render()
+    benchmark_integrate()
+    benchmark_MW_render()
+    benchmark_content_cache()
+    benchmark_upload_threads()
+    benchmark_render_pool()
@@ -1,13 +1,26 @@
+import os
 import time
+import heapq
+import asyncio
+import itertools
+import threading
 import numpy as np
 import logging
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from collections import deque
+from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+
+from pulse_lib.render_pool import shared_waveform
+from pulse_lib.keysight.awg_memory import AwgMemoryAllocator, WaveformRegistry
 
 
 class AwgConfig:
     MAX_AMPLITUDE = 1500 # mV
     ALIGNMENT = 10 # waveform must be multiple 10 bytes
+    MAX_DAC_CODE = 32767 # DAC code for output +MAX_AMPLITUDE
+    CONSTANT_NPT = 100 # length of the looped waveform of a constant run
+    MAX_CYCLES = 65535 # maximum number of cycles of a queued waveform
 
 
 class M3202A_Uploader:
@@ -34,14 +47,41 @@ class M3202A_Uploader:
         self.channel_delays = channel_delays
         self.channel_compensation_limits = channel_compensation_limits
         self.channel_attenuation = channel_attenuation
+        # upload int16 DAC codes instead of normalized floats.
+        # Only for AWG drivers that accept np.int16 waveforms, i.e. have attribute supports_dac_codes = True.
+        self.upload_dac_codes = False
+        # number of threads to integrate and render channels and segments. If None the number of cores is used.
+        self.render_threads = 1
+        self._executor = None
+        self._executor_threads = None
+        # maximum number of bytes of waveforms in AWG memory (see WaveformRegistry.resident_bytes).
+        # Uploads wait till memory is released by other jobs. If None, there is no limit.
+        self.max_upload_bytes = None
+        # increase of the priority of a waiting background upload per second.
+        self.priority_aging_rate = 1.0
+        self._scheduler = None
+        # serializes the calls to the AWG drivers of the upload thread and the main thread.
+        self._awg_lock = threading.RLock()
+        # reuse waveforms in AWG memory with the same content instead of uploading them again.
+        self.deduplicate_waveforms = True
+        self.waveform_registry = WaveformRegistry()
+        # upload every segment as a separate waveform and queue the segments on the AWG.
+        # Segments that are equal for all indices are then only uploaded once (see deduplicate_waveforms).
+        self.upload_per_segment = False
+        # minimum length of a run of constant samples that is uploaded as a short looped waveform.
+        # If None, constant runs are uploaded sample by sample.
+        self.min_constant_npt = None
+        self.constant_run_statistics = {'runs':0, 'samples_saved':0}
 
         self.jobs = []
 
 
-    def create_job(self, sequence, index, seq_id, n_rep, prescaler=0, neutralize=True):
+    def create_job(self, sequence, index, seq_id, n_rep, prescaler=0, neutralize=True, priority=0):
         # remove any old job with same sequencer and index
         self.release_memory(seq_id, index)
-        return Job(self.jobs, sequence, index, seq_id, n_rep, prescaler, neutralize)
+        job = Job(self.jobs, sequence, index, seq_id, n_rep, prescaler, neutralize, priority)
+        job.waveform_registry = self.waveform_registry
+        return job
 
 
     def add_upload_job(self, job):
@@ -60,16 +100,157 @@ class M3202A_Uploader:
         4) start upload of all data
         5) store reference to uploaded waveform in job
         '''
-        start = time.perf_counter()
+        self.jobs.append(job)
+        self.__upload_job(job)
 
-        aggregator = UploadAggregator(self.channel_names, self.channel_attenuation, self.channel_compensation_limits, self.channel_delays)
 
-        aggregator.upload_job(job, self.__upload_to_awg)
+    def add_upload_job_async(self, job):
+        '''
+        add a job to the uploader and upload it in a background thread.
+        The jobs are uploaded in order of priority (see UploadScheduler). Jobs with equal priority are
+        uploaded in the order they are added. play() waits till the upload of the job is done.
+        When max_upload_bytes is set, the upload waits till enough memory is released by other jobs.
+        Args:
+            job (upload_job) : upload_job object that defines what needs to be uploaded
+        Returns:
+            future (concurrent.futures.Future) : future of the upload. A job that is not started can be cancelled.
+        '''
+        if self._scheduler is None:
+            self._scheduler = UploadScheduler(self.__upload_job)
+        self._scheduler.aging_rate = self.priority_aging_rate
 
         self.jobs.append(job)
+        job.upload_future = self._scheduler.submit(job)
+        return job.upload_future
+
+
+    def get_upload_statistics(self):
+        '''
+        Latency statistics of the background uploads (see UploadScheduler.get_statistics).
+        '''
+        if self._scheduler is None:
+            return {}
+        return self._scheduler.get_statistics()
+
+
+    def get_memory_statistics(self):
+        '''
+        Occupancy and fragmentation of the waveform memory per AWG (see AwgMemoryAllocator.get_statistics).
+        AWGs without an AwgMemoryAllocator are skipped.
+        '''
+        return {awg_name:awg.memory_manager.get_statistics()
+                for awg_name, awg in self.AWGs.items()
+                if isinstance(getattr(awg, 'memory_manager', None), AwgMemoryAllocator)}
+
+
+    def get_waveform_statistics(self):
+        '''
+        Statistics of the waveform deduplication (see WaveformRegistry.get_statistics).
+        '''
+        return self.waveform_registry.get_statistics()
+
+
+    def get_constant_run_statistics(self):
+        '''
+        Number of constant runs uploaded as looped waveforms and the number of samples not uploaded (see min_constant_npt).
+        '''
+        return dict(self.constant_run_statistics)
+
+
+    def preflight(self, sequence, shape, indices=None, sample_rate=1e9, neutralize=True, max_compensation_time=None):
+        '''
+        Checks the amplitude and DC compensation of all indices of a sweep without rendering the waveforms.
+        Args:
+            sequence (list<segment_container>) : segments of the sequence
+            shape (tuple) : shape of the sweep
+            indices (list<tuple>) : indices to check. If None, all indices are checked (in C order).
+            sample_rate (double) : sample rate of the AWG
+            neutralize (bool) : add DC compensation
+            max_compensation_time (double) : maximum duration of the DC compensation in ns. If None, it is not checked.
+        Returns:
+            report (PreflightReport) : arrays per index and the violations of the limits.
+        '''
+        aggregator = UploadAggregator(self.channel_names, self.channel_attenuation, self.channel_compensation_limits,
+                                      self.channel_delays)
+        return aggregator.preflight(sequence, shape, indices, sample_rate, neutralize, max_compensation_time)
+
+
+    def compact_memory(self):
+        '''
+        Compacts the waveform memory of the AWGs. Waits till the AWGs are idle.
+        Returns:
+            n_moved (dict<str, int>) : number of waveforms moved per AWG.
+        '''
+        self.wait_until_AWG_idle()
+        n_moved = {}
+        with self._awg_lock:
+            for awg_name, awg in self.AWGs.items():
+                memory_manager = getattr(awg, 'memory_manager', None)
+                if isinstance(memory_manager, AwgMemoryAllocator):
+                    n_moved[awg_name] = memory_manager.compact(getattr(awg, 'move_waveform', None))
+        return n_moved
+
+
+    def __upload_job(self, job):
+        '''
+        Class taking care of putting the waveform on the right AWG.
+
+        Steps:
+        1) get all the upload data
+        2) perform DC correction (if needed)
+        3) convert data in an aprropriate upload format
+        4) start upload of all data
+        5) store reference to uploaded waveform in job
+        '''
+        start = time.perf_counter()
+
+        if self.upload_dac_codes:
+            for awg_name, awg in self.AWGs.items():
+                if not getattr(awg, 'supports_dac_codes', False):
+                    raise ValueError(f'upload_dac_codes is set, but the driver of AWG {awg_name} does not accept int16 DAC codes')
+
+        aggregator = UploadAggregator(self.channel_names, self.channel_attenuation, self.channel_compensation_limits, self.channel_delays,
+                                      self.upload_dac_codes, self.__get_executor(), self.upload_per_segment,
+                                      self.min_constant_npt)
+
+        def upload_func(channel_name, waveform):
+            key = None
+            if self.deduplicate_waveforms:
+                awg_name = self.channel_map[channel_name][0]
+                key = WaveformRegistry.make_key(awg_name, waveform)
+            # the upload does not wait for the memory held by this job.
+            held_references = [queue_item.wave_reference
+                               for queue in job.channel_queues.values()
+                               for queue_item in queue]
+            wave_ref, uploaded = self.waveform_registry.acquire(
+                    key, lambda:self.__upload_to_awg(channel_name, waveform), waveform.nbytes,
+                    self.max_upload_bytes, held_references)
+            if uploaded:
+                job.nbytes += waveform.nbytes
+            else:
+                logging.debug(f'{channel_name}: waveform already in AWG memory')
+            return wave_ref
+
+        aggregator.upload_job(job, upload_func)
+        self.constant_run_statistics['runs'] += aggregator.constant_runs
+        self.constant_run_statistics['samples_saved'] += aggregator.constant_samples_saved
 
         duration = time.perf_counter() - start
         logging.info(f'generated upload data ({duration*1000:6.3f} ms)')
+        for task_name, (n, task_duration) in aggregator.get_task_timing_summary().items():
+            logging.debug(f'{task_name}: {n} tasks {task_duration*1000:6.3f} ms')
+
+
+    def __get_executor(self):
+        n_threads = self.render_threads if self.render_threads is not None else os.cpu_count()
+        if n_threads <= 1:
+            return None
+        if self._executor is None or self._executor_threads != n_threads:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = ThreadPoolExecutor(n_threads, thread_name_prefix='pulse_lib_render')
+            self._executor_threads = n_threads
+        return self._executor
 
 
     def __upload_to_awg(self, channel_name, waveform):
@@ -79,7 +260,8 @@ class M3202A_Uploader:
 #        logging.debug(f'{channel_name}: V({vmin*1000:6.3f}, {vmax*1000:6.3f}) {length}')
         (awg_name, channel) = self.channel_map[channel_name]
         awg = self.AWGs[awg_name]
-        wave_ref = awg.upload_waveform(waveform)
+        with self._awg_lock:
+            wave_ref = awg.upload_waveform(waveform)
         return wave_ref
 
 
@@ -118,46 +300,77 @@ class M3202A_Uploader:
         """
         # 0)
         job =  self.__get_job(seq_id, index)
+        # wait for background upload (see add_upload_job_async)
+        job.wait_uploaded()
         self.wait_until_AWG_idle()
 
-        # 1 + 2)
-        # flush the queue's
-        for channel_name, queue in job.channel_queues.items():
-            """
-            upload data <tuple>:
-                [0] <tuple <double>> : min output voltate, max output voltage
-                [1] <list <tuple <mem_loc<int>, n_rep<int>, precaler<int>> : upload locations of differnt segments
-                    (by definition backend now merges all segments in 1 since it should
-                    not slow you down, but option is left open if this would change .. )
-            """
-            awg_name, channel_number = self.channel_map[channel_name]
-
-            # This should happen in HVI
-            # self.AWGs[awg_name].awg_stop(channel_number)
-
-            self.AWGs[awg_name].set_channel_amplitude(AwgConfig.MAX_AMPLITUDE/1000,channel_number)
-            self.AWGs[awg_name].set_channel_offset(0,channel_number)
-
-            # empty AWG queue
-            self.AWGs[awg_name].awg_flush(channel_number)
-
-            start_delay = 0 # no start delay
-            trigger_mode = 1 # software/HVI trigger
-            cycles = 1
-            for queue_item in queue:
-                self.AWGs[awg_name].awg_queue_waveform(
-                        channel_number, queue_item.wave_reference,
-                        trigger_mode,start_delay,cycles, queue_item.prescaler)
-                trigger_mode = 0 # Auto tigger -- next waveform will play automatically.
-
-        # 3)
-        if job.HVI_start_function is None:
-            job.HVI.load()
-            job.HVI.start()
-        else:
-            job.HVI_start_function(job.HVI, self.AWGs, self.channel_map, job.playback_time, job.n_rep, **job.HVI_kwargs)
+        self.__start_playback(job, release_job)
+
+
+    async def upload_async(self, job):
+        '''
+        add a job to the uploader and await the upload. The job is rendered and uploaded in the background upload thread.
+        Args:
+            job (upload_job) : upload_job object that defines what needs to be uploaded
+        '''
+        await asyncio.wrap_future(self.add_upload_job_async(job))
 
 
+    async def play_async(self, seq_id, index, release_job = True):
+        """
+        start playback of a sequence that has been uploaded. Awaits the upload and the end of the previous playback.
+        Args:
+            seq_id (uuid) : id of the sequence
+            index (tuple) : index that has to be played
+            release_job (bool) : release memory on AWG after done.
+        """
+        job =  self.__get_job(seq_id, index)
+        if job.upload_future is not None:
+            # shield: cancelling play_async must not cancel the upload.
+            await asyncio.shield(asyncio.wrap_future(job.upload_future))
+        await self.wait_idle_async()
+
+        self.__start_playback(job, release_job)
+
+
+    def __start_playback(self, job, release_job):
+        with self._awg_lock:
+            # 1 + 2)
+            # flush the queue's
+            for channel_name, queue in job.channel_queues.items():
+                """
+                upload data <tuple>:
+                    [0] <tuple <double>> : min output voltate, max output voltage
+                    [1] <list <tuple <mem_loc<int>, n_rep<int>, precaler<int>> : upload locations of differnt segments
+                        (by definition backend now merges all segments in 1 since it should
+                        not slow you down, but option is left open if this would change .. )
+                """
+                awg_name, channel_number = self.channel_map[channel_name]
+
+                # This should happen in HVI
+                # self.AWGs[awg_name].awg_stop(channel_number)
+
+                self.AWGs[awg_name].set_channel_amplitude(AwgConfig.MAX_AMPLITUDE/1000,channel_number)
+                self.AWGs[awg_name].set_channel_offset(0,channel_number)
+
+                # empty AWG queue
+                self.AWGs[awg_name].awg_flush(channel_number)
+
+                start_delay = 0 # no start delay
+                trigger_mode = 1 # software/HVI trigger
+                for queue_item in queue:
+                    self.AWGs[awg_name].awg_queue_waveform(
+                            channel_number, queue_item.wave_reference,
+                            trigger_mode,start_delay,queue_item.cycles, queue_item.prescaler)
+                    trigger_mode = 0 # Auto tigger -- next waveform will play automatically.
+
+            # 3)
+            if job.HVI_start_function is None:
+                job.HVI.load()
+                job.HVI.start()
+            else:
+                job.HVI_start_function(job.HVI, self.AWGs, self.channel_map, job.playback_time, job.n_rep, **job.HVI_kwargs)
+
         # determine if the current job needs to be reused.
         if release_job:
             job.release()
@@ -170,14 +383,15 @@ class M3202A_Uploader:
             seq_id (uuid) : id of the sequence. if None release all
             index (tuple) : index that has to be released; if None release all.
         """
-        for job in self.jobs:
+        # job.release() removes the job from self.jobs
+        for job in list(self.jobs):
             if (seq_id is None
                 or (job.seq_id == seq_id and (index is None or job.index == index))):
                 job.release()
 
 
     def release_jobs(self):
-        for job in self.jobs:
+        for job in list(self.jobs):
             job.release()
 
 
@@ -193,10 +407,25 @@ class M3202A_Uploader:
             time.sleep(0.001)
 
 
+    async def wait_idle_async(self, poll_interval=0.001):
+        '''
+        await till the AWG is done with playback. The wait can be cancelled.
+        Args:
+            poll_interval (float) : interval to check the AWG state in seconds.
+        '''
+        # assume all awg's are used and also all the channels
+        awg_name, channel = next(iter(self.channel_map.values()))
+        awg = self.AWGs[awg_name]
+
+        while awg.awg_is_running(channel):
+            await asyncio.sleep(poll_interval)
+
+
 @dataclass
 class AwgQueueItem:
     wave_reference: object
     prescaler: int
+    cycles: int = 1
 
 
 class Job(object):
@@ -223,6 +452,24 @@ class Job(object):
         self.neutralize = neutralize
         self.priority = priority
         self.playback_time = 0 #total playtime of the waveform
+        # sweep-wide number of samples of the DC compensation and of the uploaded waveform (see PreflightReport.get_uniform_length).
+        # If None, the compensation and length are determined per job.
+        self.compensation_npt = None
+        self.upload_npt = None
+        # optional process pool to render the waveforms (see pulse_lib.render_pool)
+        self.render_pool = None
+        # waveforms in shared memory, released with the job
+        self.shared_buffers = []
+        # future of a background upload
+        self.upload_future = None
+        # bytes uploaded to the AWGs for this job. Waveforms that were already in AWG memory are not counted.
+        self.nbytes = 0
+        # time of submission, start and end of a background upload (time.perf_counter())
+        self.submit_time = None
+        self.start_time = None
+        self.done_time = None
+        # registry of the waveforms in AWG memory. The job holds a reference to every waveform in its queues.
+        self.waveform_registry = None
 
         self.released = False
 
@@ -245,11 +492,19 @@ class Job(object):
         self.HVI_kwargs = kwargs
 
 
-    def add_waveform(self, channel_name, wave_ref, prescaler):
+    def add_waveform(self, channel_name, wave_ref, prescaler, cycles=1):
         if channel_name not in self.channel_queues:
             self.channel_queues[channel_name] = []
 
-        self.channel_queues[channel_name].append(AwgQueueItem(wave_ref, prescaler))
+        self.channel_queues[channel_name].append(AwgQueueItem(wave_ref, prescaler, cycles))
+
+
+    def wait_uploaded(self):
+        '''
+        wait till the background upload of the job is done. Raises the exception of a failed upload.
+        '''
+        if self.upload_future is not None:
+            self.upload_future.result()
 
 
     def release(self):
@@ -257,12 +512,23 @@ class Job(object):
             logging.warning(f'job {self.seq_id}-{self.index} already released')
             return
 
+        if self.upload_future is not None:
+            # wait till upload is done, also when failed
+            wait([self.upload_future])
+
         logging.debug(f'release job {self.seq_id}-{self.index}')
         self.released = True
 
         for channel_name, queue in self.channel_queues.items():
             for queue_item in queue:
-                queue_item.wave_reference.release()
+                if self.waveform_registry is not None:
+                    self.waveform_registry.release(queue_item.wave_reference)
+                else:
+                    queue_item.wave_reference.release()
+
+        for shared_buffer in self.shared_buffers:
+            shared_buffer.release()
+        self.shared_buffers = []
 
         if self in self.job_list:
             self.job_list.remove(self)
@@ -275,6 +541,103 @@ class Job(object):
             self.release()
 
 
+class UploadScheduler:
+    '''
+    Executes upload jobs in a background thread in order of priority.
+
+    Jobs that are not yet started are passed by jobs with a higher priority.
+    The priority of a waiting job increases with aging_rate per second to avoid starvation.
+    The effective priority of job i at time t is priority_i + aging_rate*(t - submit_time_i). The order of two
+    waiting jobs does not change in time, so the queue is a heap on priority_i - aging_rate*submit_time_i.
+
+    Args:
+        upload_function (Callable[[Job], None]) : function that renders and uploads a job.
+        aging_rate (float) : increase of priority per second of waiting.
+        n_statistics (int) : number of finished jobs kept for the statistics.
+    '''
+    def __init__(self, upload_function, aging_rate=1.0, n_statistics=1000):
+        self.upload_function = upload_function
+        self.aging_rate = aging_rate
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        # (priority, wait time, upload time) of finished jobs.
+        self._latencies = deque(maxlen=n_statistics)
+
+
+    def submit(self, job):
+        '''
+        Add job to the queue.
+        Returns:
+            future (concurrent.futures.Future) : future of the upload.
+        '''
+        future = Future()
+        job.submit_time = time.perf_counter()
+        key = -(job.priority - self.aging_rate*job.submit_time)
+        with self._condition:
+            heapq.heappush(self._queue, (key, next(self._counter), job, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pulse_lib_upload', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+
+    @property
+    def n_waiting(self):
+        return len(self._queue)
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._queue) == 0:
+                    self._condition.wait()
+                _, _, job, future = heapq.heappop(self._queue)
+
+            if not future.set_running_or_notify_cancel():
+                # cancelled before start
+                continue
+
+            job.start_time = time.perf_counter()
+            try:
+                self.upload_function(job)
+            except BaseException as ex:
+                future.set_exception(ex)
+            else:
+                future.set_result(None)
+            job.done_time = time.perf_counter()
+            self._latencies.append((job.priority, job.start_time - job.submit_time, job.done_time - job.start_time))
+
+            logging.debug(f'job {job.seq_id}-{job.index} priority {job.priority}: '
+                          f'wait {(job.start_time - job.submit_time)*1000:6.1f} ms, '
+                          f'upload {(job.done_time - job.start_time)*1000:6.1f} ms')
+
+
+    def get_statistics(self):
+        '''
+        Latency statistics of the last finished jobs per priority.
+        Returns:
+            statistics (dict<int, dict>) : per priority: number of jobs, mean and maximum wait time,
+                and mean upload time in seconds.
+        '''
+        per_priority = {}
+        for priority, wait_time, upload_time in list(self._latencies):
+            per_priority.setdefault(priority, []).append((wait_time, upload_time))
+
+        statistics = {}
+        for priority, values in sorted(per_priority.items()):
+            values = np.array(values)
+            statistics[priority] = {
+                    'jobs' : len(values),
+                    'mean_wait' : np.mean(values[:,0]),
+                    'max_wait' : np.max(values[:,0]),
+                    'mean_upload' : np.mean(values[:,1]),
+                    }
+        return statistics
+
+
 @dataclass
 class ChannelInfo:
     attenuation: float = 1.0
@@ -284,13 +647,103 @@ class ChannelInfo:
     channel_delays: Tuple[float] = (0,0)
     integral: float = 0.0
     npt: int = 0
-    data: List[List[float]] = field(default_factory=list)
+    segment_npt: List[int] = field(default_factory=list)
+    segment_offset: List[int] = field(default_factory=list)
+    # (start_pt, unit_npt, count) of symbolically repeated segments (see pulse_data.repeat), else None
+    segment_repeat: List[Tuple[int, int, int]] = field(default_factory=list)
+    # (start_pt, stop_pt) of the runs with constant voltage per segment
+    segment_constant: List[List[Tuple[int, int]]] = field(default_factory=list)
+    waveform: np.ndarray = None
+
+
+@dataclass
+class PreflightViolation:
+    index: Tuple[int]
+    channel_name: str
+    # 'amplitude' (AWG output in mV) or 'compensation_time' (ns)
+    kind: str
+    value: float
+    limit: float
+
+
+@dataclass
+class PreflightReport:
+    '''
+    Result of a pre-flight check of a sweep (see M3202A_Uploader.preflight).
+    Voltages are in mV at device level, i.e. before attenuation.
+    The extrema of waveforms with MW pulses are bounds, unless they come close to the limits.
+    '''
+    indices: np.ndarray
+    # number of samples of the segments
+    npt: np.ndarray
+    compensation_npt: np.ndarray
+    # number of samples of the uploaded waveform per channel, including compensation and zero padding.
+    upload_npt: np.ndarray
+    v_min: Dict[str, np.ndarray]
+    v_max: Dict[str, np.ndarray]
+    integral: Dict[str, np.ndarray]
+    violations: List[PreflightViolation]
+
+    @property
+    def ok(self):
+        return len(self.violations) == 0
+
+    @property
+    def max_upload_npt(self):
+        return int(np.max(self.upload_npt, initial=0))
+
+    def get_uniform_length(self):
+        '''
+        Sweep-wide DC compensation and waveform length that fit all indices of the report.
+        Returns:
+            (compensation_npt, upload_npt) : number of samples of the compensation and of the waveform,
+                excluding the zero padding at the end.
+        '''
+        compensation_npt = int(np.max(self.compensation_npt, initial=0))
+        npt = int(np.max(self.npt, initial=0)) + compensation_npt
+        remainder = npt % AwgConfig.ALIGNMENT
+        upload_npt = npt + (AwgConfig.ALIGNMENT - remainder if remainder > 0 else 0)
+        return compensation_npt, upload_npt
+
+
+@dataclass
+class TaskTiming:
+    task: str
+    channel_name: str
+    segment: int
+    duration: float
 
 
 class UploadAggregator:
-    def __init__(self, channel_names, channel_attenuation, channel_compensation_limits, channel_delays):
+    def __init__(self, channel_names, channel_attenuation, channel_compensation_limits, channel_delays, dac_codes=False,
+                 executor=None, per_segment=False, min_constant_npt=None):
+        '''
+        Args:
+            channel_names (list): list with all channel names
+            channel_attenuation (dict): attenuation from AWG to device per channel
+            channel_compensation_limits (dict): dict with channel name as key and tuple as value with lower and upper limit
+            channel_delays (dict): channel delays
+            dac_codes (bool): if True the upload data is np.int16 DAC codes (see to_dac_codes),
+                otherwise np.double normalized to [-1.0, 1.0].
+            executor (concurrent.futures.Executor): executor to integrate and render the channels and segments concurrently.
+                If None, all tasks are executed in the calling thread.
+            per_segment (bool): upload every segment as a separate waveform (see split_waveform).
+            min_constant_npt (int): minimum length of a run of constant samples that is uploaded as a short looped waveform.
+                If None, constant runs are not detected.
+        '''
         self.npt = 0
+        self.dac_codes = dac_codes
+        self.executor = executor
+        self.per_segment = per_segment
+        self.min_constant_npt = min_constant_npt
+        self.compensation_npt = 0
+        self.constant_runs = 0
+        self.constant_samples_saved = 0
         self.channels = dict()
+        # timing of the tasks of the last uploaded job
+        self.task_timings = []
+        # float buffer per thread to copy the waveforms in before conversion to DAC codes
+        self._render_buffers = threading.local()
 
         for channel_name in channel_names:
             info = ChannelInfo()
@@ -310,138 +763,415 @@ class UploadAggregator:
     def upload_job(self, job, awg_upload_func):
         '''
         Steps:
-        1) get all the upload data
-        2) perform DC correction (if needed)
-        3) convert data in an aprropriate upload format
-        4) start upload of all data
-        5) store reference to uploaded waveform in job
+        1) get the length and integral of all segments (task per channel)
+        2) determine DC correction (if needed) and total length
+        3) render all segments directly in a preallocated waveform per channel (task per segment and channel)
+        4) add DC compensation and zero padding (task per channel)
+        5) start upload of all data in channel order. In per segment mode, or with constant run detection,
+           the waveform is split in multiple AWG waveforms (see split_waveform).
+        6) store reference to uploaded waveform in job
         '''
-
+        self.task_timings = []
         sample_rate = job.sample_rate
 
-        for i in range(len(job.sequence)):
-
-            seg = job.sequence[i]
+        self.run_tasks(
+                [('segment_info', channel_name, None, self.add_segment_info, (job, channel_name, channel_info, sample_rate))
+                 for channel_name, channel_info in self.channels.items()])
+        self.npt = max([channel_info.npt for channel_info in self.channels.values()], default=0)
 
-            for channel_name, channel_info in self.channels.items():
-                start = time.perf_counter()
-
-                pre_delay = 0
-                post_delay = 0
+        compensation_npt = 0
+        if job.neutralize:
+            compensation_npt = self.get_compensation_npt(sample_rate)
+            if job.compensation_npt is not None:
+                compensation_npt = max(compensation_npt, job.compensation_npt)
+        self.compensation_npt = compensation_npt
+
+        upload_npt = self.get_aligned_npt(self.npt + compensation_npt)
+        if job.upload_npt is not None:
+            if upload_npt > job.upload_npt:
+                logging.warning(f'job {job.index} needs {upload_npt} samples, more than the uniform length {job.upload_npt}')
+            upload_npt = max(upload_npt, job.upload_npt)
+
+        use_render_pool = job.render_pool is not None and job.render_pool.active
+        dtype = np.int16 if self.dac_codes else np.double
+        for channel_info in self.channels.values():
+            # add extra zeros to make sure you end up with 0V when done.
+            n_samples = upload_npt + 2*AwgConfig.ALIGNMENT
+            if use_render_pool:
+                # rendered by the worker processes in shared memory.
+                shared_buffer = shared_waveform((n_samples,), dtype)
+                job.shared_buffers.append(shared_buffer)
+                channel_info.waveform = shared_buffer.data
+            else:
+                channel_info.waveform = np.empty(n_samples, dtype=dtype)
+
+        if not use_render_pool or not self.render_in_pool(job, sample_rate):
+            self.run_tasks(
+                    [('render', channel_name, i, self.render_segment, (job, channel_name, channel_info, i, sample_rate))
+                     for channel_name, channel_info in self.channels.items()
+                     for i in range(len(job.sequence))])
+
+        self.run_tasks(
+                [('compensation', channel_name, None, self.add_compensation, (channel_name, channel_info, sample_rate, compensation_npt))
+                 for channel_name, channel_info in self.channels.items()])
 
-                if i == 0:
-                    pre_delay = channel_info.channel_delays[0]
-                if i == len(job.sequence) -1:
-                    post_delay = channel_info.channel_delays[1]
+        for channel_name, channel_info in self.channels.items():
+            if self.per_segment or self.min_constant_npt is not None:
+                waveforms = self.split_waveform(channel_info)
+            else:
+                waveforms = [(channel_info.waveform, 1)]
+            for waveform, cycles in waveforms:
+                wave_ref = awg_upload_func(channel_name, waveform)
+                job.add_waveform(channel_name, wave_ref, job.prescaler, cycles)
+            channel_info.waveform = None
+
+        # playback ends after the first block of zeros
+        job.playback_time = (upload_npt + AwgConfig.ALIGNMENT) / sample_rate * 1e9
 
-                wvf = seg.get_waveform(channel_name, job.index, pre_delay, post_delay, sample_rate)
-                integral = 0
-                if job.neutralize:
-                    integral = getattr(seg, channel_name).integrate(job.index, pre_delay, post_delay, sample_rate)
+        self.reset_data()
 
-                self.add_data(channel_info, wvf, integral)
 
-                duration = time.perf_counter() - start
-                logging.debug(f'added {i}:{channel_name} {duration*1000:6.3f} ms {len(wvf)} Sa, integral: {integral}')
+    def preflight(self, sequence, shape, indices, sample_rate, neutralize, max_compensation_time=None):
+        '''
+        Computes the number of samples, integral, extrema and DC compensation of all indices at once
+        with the batch methods of the segments. Nothing is rendered, except waveforms with MW pulses
+        that may exceed the AWG output range (see pulse_data.get_vmax).
+        '''
+        if indices is None:
+            indices = list(np.ndindex(*shape))
+        indices = [tuple(index) for index in indices]
+        n = len(indices)
+
+        compensation_time = np.zeros(n)
+        integrals = {}
+        v_min = {}
+        v_max = {}
+        channel_npt = []
+        for channel_name, channel_info in self.channels.items():
+            integral = np.zeros(n)
+            npt = np.zeros(n, dtype=int)
+            v_min[channel_name] = np.full(n, np.inf)
+            v_max[channel_name] = np.full(n, -np.inf)
+            # output range at device level
+            v_limit = AwgConfig.MAX_AMPLITUDE * channel_info.attenuation
+            for i, seg in enumerate(sequence):
+                segment = getattr(seg, channel_name)
+                pre_delay = channel_info.channel_delays[0] if i == 0 else 0
+                post_delay = channel_info.channel_delays[1] if i == len(sequence) - 1 else 0
+
+                npt += segment.get_segment_npt_batch(indices, pre_delay, post_delay, sample_rate)
+                if neutralize:
+                    integral += segment.integrate_batch(indices, pre_delay, post_delay, sample_rate)
+                seg_v_min, seg_v_max = segment.v_min_max_batch(indices, sample_rate, (-v_limit, v_limit))
+                np.minimum(v_min[channel_name], seg_v_min, out=v_min[channel_name])
+                np.maximum(v_max[channel_name], seg_v_max, out=v_max[channel_name])
+
+            channel_npt.append(npt)
+            integrals[channel_name] = integral
+            if channel_info.dc_compensation:
+                compensation_time = np.maximum(compensation_time,
+                                               np.where(integral <= 0,
+                                                        -integral / channel_info.dc_compensation_max,
+                                                        -integral / channel_info.dc_compensation_min))
+
+        npt = np.max(channel_npt, axis=0) if len(channel_npt) > 0 else np.zeros(n, dtype=int)
+        compensation_npt = (compensation_time * sample_rate + 0.99).astype(int)
+        upload_npt = np.array([self.get_aligned_npt(npt_total) for npt_total in npt + compensation_npt],
+                              dtype=int) + 2*AwgConfig.ALIGNMENT
+
+        violations = []
+        for channel_name, channel_info in self.channels.items():
+            if channel_info.dc_compensation:
+                # the compensation pulse is part of the output
+                compensated = compensation_npt > 0
+                compensation_voltage = np.zeros(n)
+                compensation_voltage[compensated] = (-integrals[channel_name][compensated] * sample_rate
+                                                     / compensation_npt[compensated])
+                np.minimum(v_min[channel_name], compensation_voltage, out=v_min[channel_name])
+                np.maximum(v_max[channel_name], compensation_voltage, out=v_max[channel_name])
+
+            v_limit = AwgConfig.MAX_AMPLITUDE * channel_info.attenuation
+            for i in np.nonzero((v_max[channel_name] > v_limit) | (v_min[channel_name] < -v_limit))[0]:
+                value = v_max[channel_name][i] if v_max[channel_name][i] > v_limit else v_min[channel_name][i]
+                violations.append(PreflightViolation(indices[i], channel_name, 'amplitude',
+                                                     value / channel_info.attenuation, AwgConfig.MAX_AMPLITUDE))
+
+        if max_compensation_time is not None:
+            for i in np.nonzero(compensation_npt / sample_rate * 1e9 > max_compensation_time)[0]:
+                violations.append(PreflightViolation(indices[i], None, 'compensation_time',
+                                                     compensation_npt[i] / sample_rate * 1e9, max_compensation_time))
+
+        return PreflightReport(np.array(indices), npt, compensation_npt, upload_npt,
+                               v_min, v_max, integrals, violations)
+
+
+    def render_in_pool(self, job, sample_rate):
+        '''
+        render all channels of the job in the worker processes of the render pool of the job.
+        Returns:
+            success (bool) : False if the render pool failed.
+        '''
+        tasks = []
+        for channel_name, channel_info in self.channels.items():
+            segment_delays = [self.get_segment_delays(job, channel_info, i) for i in range(len(job.sequence))]
+            segment_offsets = list(zip(channel_info.segment_offset, channel_info.segment_npt))
+            scale = 1/(channel_info.attenuation * AwgConfig.MAX_AMPLITUDE)
+            shared_buffer = job.shared_buffers[len(tasks)]
+            tasks.append((channel_name, job.index, segment_delays, segment_offsets, sample_rate,
+                          shared_buffer.name, len(shared_buffer.data), scale, self.dac_codes))
 
+        start = time.perf_counter()
+        n_timings = len(job.render_pool.task_timings)
+        success = job.render_pool.render_channels(tasks)
+        if success:
+            for channel_name, duration in job.render_pool.task_timings[n_timings:]:
+                self.task_timings.append(TaskTiming('render', channel_name, None, duration))
+            logging.debug(f'rendered in pool {(time.perf_counter() - start)*1000:6.3f} ms')
+        return success
 
-        if job.neutralize:
-            self.add_dc_compensation(sample_rate)
 
-        self.align_data(sample_rate)
-        self.append_zeros()
+    def run_tasks(self, tasks):
+        '''
+        Executes the tasks with the executor, or in the calling thread if there is no executor,
+        and waits till all tasks are done. The duration of the tasks is added to task_timings.
+        Args:
+            tasks (list<tuple>): list with (task name, channel name, segment number, function, args).
+        '''
+        if self.executor is None:
+            for task in tasks:
+                self._run_task(*task)
+        else:
+            futures = [self.executor.submit(self._run_task, *task) for task in tasks]
+            # result() raises the exception of a failed task
+            for future in futures:
+                future.result()
 
-        self.add_upload_data(job, awg_upload_func)
 
-        job.playback_time = self.npt / sample_rate * 1e9
+    def _run_task(self, task_name, channel_name, segment, func, args):
+        start = time.perf_counter()
+        func(*args)
+        duration = time.perf_counter() - start
+        self.task_timings.append(TaskTiming(task_name, channel_name, segment, duration))
 
-        self.reset_data()
 
+    def get_task_timing_summary(self):
+        '''
+        Returns:
+            summary (dict<str, tuple>): number of tasks and total duration in seconds per task name.
+        '''
+        summary = {}
+        for timing in self.task_timings:
+            n, total = summary.get(timing.task, (0, 0.0))
+            summary[timing.task] = (n + 1, total + timing.duration)
+        return summary
 
-    def add_upload_data(self, job, awg_upload_func):
 
-        for channel_name, channel_info in self.channels.items():
+    def get_segment_delays(self, job, channel_info, i):
+        pre_delay = 0
+        post_delay = 0
 
-            waveform = self.get_upload_data(channel_info)
+        if i == 0:
+            pre_delay = channel_info.channel_delays[0]
+        if i == len(job.sequence) -1:
+            post_delay = channel_info.channel_delays[1]
 
-            wave_ref = awg_upload_func(channel_name, waveform)
-            job.add_waveform(channel_name, wave_ref, job.prescaler)
+        return pre_delay, post_delay
 
 
-    def reset_data(self, reset_integral=True):
-        for channel_info in self.channels.values():
-            channel_info.data = []
-            channel_info.npt = 0
-            if reset_integral:
-                channel_info.integral = 0.0
-
-
-    def add_data(self, channel_info, wvf, integral):
-        channel_info.integral += integral
-        channel_info.data.append(wvf)
-        channel_info.npt += len(wvf)
-        self.npt = max(self.npt, channel_info.npt)
+    def add_segment_info(self, job, channel_name, channel_info, sample_rate):
+        '''
+        get the number of samples and the integral of all segments of the channel without rendering.
+        '''
+        for i, seg in enumerate(job.sequence):
+            pre_delay, post_delay = self.get_segment_delays(job, channel_info, i)
+
+            npt = seg.get_waveform_npt(channel_name, job.index, pre_delay, post_delay, sample_rate)
+            if job.neutralize:
+                channel_info.integral += getattr(seg, channel_name).integrate(job.index, pre_delay, post_delay, sample_rate)
+
+            channel_info.segment_offset.append(channel_info.npt)
+            channel_info.segment_npt.append(npt)
+            repeat_info = None
+            if self.per_segment:
+                repeat_info = getattr(seg, channel_name).get_repeat_info(job.index, pre_delay, sample_rate)
+            channel_info.segment_repeat.append(repeat_info)
+            if self.min_constant_npt is not None and repeat_info is None:
+                channel_info.segment_constant.append(
+                        getattr(seg, channel_name).get_constant_intervals(job.index, pre_delay, sample_rate, self.min_constant_npt))
+            else:
+                channel_info.segment_constant.append([])
+            channel_info.npt += npt
+
+
+    def render_segment(self, job, channel_name, channel_info, i, sample_rate):
+        '''
+        render segment i in the waveform of the channel and scale it to AWG output.
+        '''
+        start = time.perf_counter()
 
+        # divide by attenuation
+        # divide by AwgConfig.AWG_AMPLITUDE
+        scale = 1/(channel_info.attenuation * AwgConfig.MAX_AMPLITUDE)
+
+        seg = job.sequence[i]
+        pre_delay, post_delay = self.get_segment_delays(job, channel_info, i)
+        npt = channel_info.segment_npt[i]
+        offset = channel_info.segment_offset[i]
+        if self.dac_codes:
+            wvf = seg.get_waveform(channel_name, job.index, pre_delay, post_delay, sample_rate,
+                                   out=self.get_render_buffer(npt))
+            # note: numpy inplace multiplication is much faster than standard multiplication
+            wvf *= scale
+            to_dac_codes(wvf, out=channel_info.waveform[offset:offset + npt])
+        else:
+            wvf = seg.get_waveform(channel_name, job.index, pre_delay, post_delay, sample_rate,
+                                   out=channel_info.waveform[offset:offset + npt])
+            wvf *= scale
 
-    def add_dc_compensation(self, sample_rate):
+        duration = time.perf_counter() - start
+        logging.debug(f'added {i}:{channel_name} {duration*1000:6.3f} ms {npt} Sa')
 
-        compensation_npt = self.get_compensation_npt(sample_rate)
 
-        for channel_name, channel_info in self.channels.items():
-
-            if compensation_npt > 0 and channel_info.dc_compensation:
-                compensation_voltage = -channel_info.integral * sample_rate / compensation_npt
-                dc_compensation = np.full((compensation_npt,), compensation_voltage)
-                self.add_data(channel_info, dc_compensation, -channel_info.integral)
-                logging.debug(f'DC compensation {channel_name}: {compensation_voltage:6.1f} mV {compensation_npt} Sa')
-            else :
-                no_compensation = np.zeros((compensation_npt,), np.float)
-                self.add_data(channel_info, no_compensation, 0)
+    def get_render_buffer(self, npt):
+        '''
+        float buffer of the calling thread with npt samples. The buffer is reused for all segments rendered by the thread.
+        '''
+        buffer = getattr(self._render_buffers, 'buffer', None)
+        if buffer is None or len(buffer) < npt:
+            buffer = np.empty(npt)
+            self._render_buffers.buffer = buffer
+        return buffer[:npt]
 
 
-    def align_data(self, sample_rate, keep_voltage=False):
+    def split_waveform(self, channel_info):
+        '''
+        Splits the waveform of the channel in views that are uploaded as separate AWG waveforms.
+        All views start at a multiple of AwgConfig.ALIGNMENT.
 
-        npt = self.npt
-        remainder = npt % AwgConfig.ALIGNMENT
-        padding_npt = (AwgConfig.ALIGNMENT - remainder) if remainder > 0 else 0
-        total_npt = npt + padding_npt
+        In per segment mode the waveform is split per segment and a view with the compensation and zero padding.
+        If a segment boundary is not aligned the view starts at the aligned sample before the boundary and contains
+        the last samples of the previous segment. A symbolically repeated segment (see pulse_data.repeat) is uploaded
+        once and played with the AWG queue cycles, if the number of samples of the repeated waveform is a
+        multiple of AwgConfig.ALIGNMENT.
 
-        for channel_name, channel_info in self.channels.items():
-            if channel_info.npt != npt:
-                logging.warn(f'Unequal data length {channel_name}:{channel_info.npt} overall:{self.npt}')
+        With constant run detection (min_constant_npt) every run of constant samples is played as a
+        short waveform of AwgConfig.CONSTANT_NPT samples (or longer for very long runs) with the AWG queue cycles.
+        Returns:
+            waveforms (list<tuple<np.ndarray, int>>) : views on the waveform with the number of cycles to play them.
+        '''
+        waveform = channel_info.waveform
+        # looped parts (start, unit_npt, cycles)
+        loops = []
+        for offset, repeat_info in zip(channel_info.segment_offset, channel_info.segment_repeat):
+            if repeat_info is not None and repeat_info[1] % AwgConfig.ALIGNMENT == 0:
+                start_pt, unit_npt, count = repeat_info
+                # the repeated samples are periodic. Start the repetition at the first aligned sample.
+                unit_start = self.get_aligned_npt(offset + start_pt)
+                cycles = (offset + start_pt + count*unit_npt - unit_start) // unit_npt
+                if cycles > 1:
+                    loops.append((unit_start, unit_npt, cycles))
+
+        if self.min_constant_npt is not None:
+            runs = [(offset + start_pt, offset + stop_pt)
+                    for offset, intervals in zip(channel_info.segment_offset, channel_info.segment_constant)
+                    for start_pt, stop_pt in intervals]
+            compensation_stop = channel_info.npt + (self.compensation_npt if channel_info.dc_compensation else 0)
+            runs += [(channel_info.npt, compensation_stop), (compensation_stop, len(waveform))]
+            for start_pt, stop_pt in runs:
+                loop = self.get_constant_loop(waveform, start_pt, stop_pt)
+                if loop is not None:
+                    loops.append(loop)
+                    self.constant_runs += 1
+                    self.constant_samples_saved += (loop[2] - 1)*loop[1]
+
+        boundaries = []
+        if self.per_segment:
+            boundaries = [offset - offset % AwgConfig.ALIGNMENT
+                          for offset in channel_info.segment_offset + [channel_info.npt]]
+
+        waveforms = []
+        start = 0
+        def add_views(stop):
+            nonlocal start
+            for boundary in boundaries + [stop]:
+                if start < boundary <= stop:
+                    waveforms.append((waveform[start:boundary], 1))
+                    start = boundary
+
+        for loop_start, unit_npt, cycles in sorted(loops):
+            if loop_start < start:
+                continue
+            add_views(loop_start)
+            waveforms.append((waveform[loop_start:loop_start + unit_npt], cycles))
+            start = loop_start + cycles*unit_npt
+        add_views(len(waveform))
+        return waveforms
+
+
+    def get_constant_loop(self, waveform, start_pt, stop_pt):
+        '''
+        Returns:
+            (start, unit_npt, cycles) : aligned part of the run [start_pt, stop_pt) played as a looped waveform,
+                or None if the run is too short or the samples are not constant.
+        '''
+        start = self.get_aligned_npt(start_pt)
+        npt = stop_pt - start
+        if npt < self.min_constant_npt:
+            return None
+        unit_npt = max(AwgConfig.CONSTANT_NPT, self.get_aligned_npt(-(-npt // AwgConfig.MAX_CYCLES)))
+        cycles = npt // unit_npt
+        if cycles < 2:
+            return None
+        stop = start + cycles*unit_npt
+        # the breakpoint table gives the candidates. Check the samples, e.g. for MW pulses or markers.
+        if not np.all(waveform[start:stop] == waveform[start]):
+            return None
+        return start, unit_npt, cycles
+
+
+    def add_compensation(self, channel_name, channel_info, sample_rate, compensation_npt):
+        '''
+        add DC compensation and zero padding after the rendered segments of the channel.
+        '''
+        if channel_info.npt != self.npt:
+            logging.warn(f'Unequal data length {channel_name}:{channel_info.npt} overall:{self.npt}')
 
-            npt_fill = total_npt - channel_info.npt
+        scale = 1/(channel_info.attenuation * AwgConfig.MAX_AMPLITUDE)
+        waveform = channel_info.waveform
+        offset = channel_info.npt
 
-            voltage = 0
-            if keep_voltage:
-                voltage = channel_info.data[-1][-1]
+        if compensation_npt > 0 and channel_info.dc_compensation:
+            compensation_voltage = -channel_info.integral * sample_rate / compensation_npt
+            if self.dac_codes:
+                waveform[offset:offset + compensation_npt] = to_dac_codes(np.array([compensation_voltage * scale]))
+            else:
+                waveform[offset:offset + compensation_npt] = compensation_voltage * scale
+            offset += compensation_npt
+            logging.debug(f'DC compensation {channel_name}: {compensation_voltage:6.1f} mV {compensation_npt} Sa')
 
-            padding_samples = np.full((npt_fill,), voltage)
-            self.add_data(channel_info, padding_samples, voltage * padding_npt / sample_rate)
+        waveform[offset:] = 0
 
 
-    def append_zeros(self):
-        zero_padding = np.zeros(AwgConfig.ALIGNMENT, dtype=np.float)
+    def reset_data(self, reset_integral=True):
+        self.npt = 0
         for channel_info in self.channels.values():
-            self.add_data(channel_info, zero_padding, 0)
-
-
-    def get_upload_data(self, channel_info, append_zeros=True):
+            channel_info.segment_npt = []
+            channel_info.segment_offset = []
+            channel_info.segment_repeat = []
+            channel_info.segment_constant = []
+            channel_info.npt = 0
+            channel_info.waveform = None
+            if reset_integral:
+                channel_info.integral = 0.0
 
-        if append_zeros:
-            # add extra zeros to make sure you end up with 0V when done.
-            zero_padding = np.zeros(AwgConfig.ALIGNMENT, dtype=np.float)
-            data = channel_info.data + [zero_padding]
-        else:
-            data = channel_info.data
 
-        # concat all
-        # divide by attenuation
-        # divide by AwgConfig.AWG_AMPLITUDE
-        waveform = np.concatenate(data)
-        # note: numpy inplace multiplication is much faster than standard multiplication
-        waveform *= 1/(channel_info.attenuation * AwgConfig.MAX_AMPLITUDE)
-        return waveform
+    def get_aligned_npt(self, npt):
+        '''
+        number of samples rounded up to a multiple of AwgConfig.ALIGNMENT.
+        '''
+        remainder = npt % AwgConfig.ALIGNMENT
+        padding_npt = (AwgConfig.ALIGNMENT - remainder) if remainder > 0 else 0
+        return npt + padding_npt
 
 
     def get_compensation_npt(self, sample_rate):
@@ -481,6 +1211,27 @@ class UploadAggregator:
             return -channel_info.integral / channel_info.dc_compensation_min
 
 
+def to_dac_codes(waveform, out=None):
+    """
+    Converts a waveform normalized to [-1.0, 1.0] to DAC codes.
+    Values outside the range are clipped.
+
+    Args:
+        waveform (np.ndarray[dtype=double]) : normalized waveform. The array is modified in place.
+        out (np.ndarray[dtype=int16]) : optional output array.
+
+    Returns:
+        dac_codes (np.ndarray[dtype=int16]) : DAC codes, round(waveform*AwgConfig.MAX_DAC_CODE)
+    """
+    waveform *= AwgConfig.MAX_DAC_CODE
+    np.rint(waveform, out=waveform)
+    np.clip(waveform, -AwgConfig.MAX_DAC_CODE, AwgConfig.MAX_DAC_CODE, out=waveform)
+    if out is None:
+        return waveform.astype(np.int16)
+    out[:] = waveform
+    return out
+
+
 def convert_prescaler_to_sample_rate(prescaler):
     """
     Keysight specific function.
@@ -0,0 +1,335 @@
+import bisect
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass
+class MemoryAllocation:
+    wave_number: int
+    offset: int
+    size: int
+
+
+class AwgMemoryAllocator:
+    '''
+    Allocator for the waveform memory of an AWG.
+
+    The free memory is administrated as extents (offset, size). A waveform is placed in the smallest
+    free extent that fits (best-fit). Released memory is merged with the adjacent free extents.
+    compact() moves all waveforms to the start of the memory to remove fragmentation.
+
+    Args:
+        memory_size (int): size of the memory in samples.
+        alignment (int): allocation granularity in samples. Sizes are rounded up to a multiple of alignment.
+        max_waveforms (int): maximum number of waveforms in memory.
+    '''
+    def __init__(self, memory_size, alignment=10, max_waveforms=65536):
+        self.memory_size = memory_size
+        self.alignment = alignment
+        self.max_waveforms = max_waveforms
+
+        self.allocations = {}
+        # released wave numbers are reused after all other free numbers
+        self._free_wave_numbers = deque(range(max_waveforms))
+        # free extents sorted on offset and on (size, offset)
+        self._free_offsets = [0]
+        self._free_size = {0:memory_size}
+        self._free_by_size = [(memory_size, 0)]
+
+        self.used = 0
+        self.n_failed = 0
+
+
+    def allocate(self, size):
+        '''
+        Allocates memory for a waveform.
+        Args:
+            size (int): number of samples of the waveform.
+        Returns:
+            wave_number (int): number of the waveform in AWG memory.
+        Raises:
+            MemoryError: if there is no free extent with the requested size.
+        '''
+        n = self._aligned_size(size)
+        i = bisect.bisect_left(self._free_by_size, (n, -1))
+        if i == len(self._free_by_size) or len(self._free_wave_numbers) == 0:
+            self.n_failed += 1
+            stats = self.get_statistics()
+            raise MemoryError(f'No AWG memory available for {size} samples. '
+                              f'Free: {stats["free"]}, largest free extent: {stats["largest_free"]}, '
+                              f'waveforms: {stats["n_waveforms"]}')
+
+        extent_size, offset = self._free_by_size[i]
+        self._remove_free(offset)
+        if extent_size > n:
+            self._add_free(offset + n, extent_size - n)
+
+        wave_number = self._free_wave_numbers.popleft()
+        self.allocations[wave_number] = MemoryAllocation(wave_number, offset, n)
+        self.used += n
+        logging.debug(f'allocated {wave_number}: {size} Sa at {offset}')
+        return wave_number
+
+
+    def free(self, wave_number):
+        '''
+        Releases the memory of a waveform and merges it with the adjacent free extents.
+        '''
+        allocation = self.allocations.pop(wave_number)
+        self._free_wave_numbers.append(wave_number)
+        self.used -= allocation.size
+
+        offset = allocation.offset
+        size = allocation.size
+
+        # merge with previous free extent
+        i = bisect.bisect_left(self._free_offsets, offset)
+        if i > 0:
+            prev_offset = self._free_offsets[i-1]
+            prev_size = self._free_size[prev_offset]
+            if prev_offset + prev_size == offset:
+                self._remove_free(prev_offset)
+                offset = prev_offset
+                size += prev_size
+        # merge with next free extent
+        next_offset = allocation.offset + allocation.size
+        if next_offset in self._free_size:
+            size += self._free_size[next_offset]
+            self._remove_free(next_offset)
+
+        self._add_free(offset, size)
+        logging.debug(f'freed {wave_number}: {allocation.size} Sa at {allocation.offset}')
+
+
+    def compact(self, move_function=None):
+        '''
+        Moves all waveforms to the start of the memory, leaving a single free extent.
+        Only call this when the AWG is idle.
+        Args:
+            move_function (Callable[[int, int, int, int], None]): function (wave_number, old_offset, new_offset, size)
+                that moves the waveform data in the AWG. Waveforms are moved in order of increasing offset,
+                so the new location never overlaps with data that is still to be moved.
+        Returns:
+            n_moved (int): number of waveforms that were moved.
+        '''
+        n_moved = 0
+        offset = 0
+        for allocation in sorted(self.allocations.values(), key=lambda a:a.offset):
+            if allocation.offset != offset:
+                if move_function is not None:
+                    move_function(allocation.wave_number, allocation.offset, offset, allocation.size)
+                allocation.offset = offset
+                n_moved += 1
+            offset += allocation.size
+
+        self._free_offsets = []
+        self._free_size = {}
+        self._free_by_size = []
+        if offset < self.memory_size:
+            self._add_free(offset, self.memory_size - offset)
+
+        logging.info(f'compacted AWG memory: moved {n_moved} waveforms')
+        return n_moved
+
+
+    def get_statistics(self):
+        '''
+        Returns:
+            statistics (dict):
+                memory_size, used, free: size of memory in samples.
+                largest_free: size of largest free extent.
+                n_free_extents: number of free extents.
+                fragmentation: 1 - largest_free/free. 0.0 if all free memory is contiguous.
+                occupancy: used/memory_size.
+                n_waveforms: number of waveforms in memory.
+                n_failed: number of failed allocations.
+        '''
+        free = self.memory_size - self.used
+        largest_free = self._free_by_size[-1][0] if len(self._free_by_size) > 0 else 0
+        return {
+            'memory_size' : self.memory_size,
+            'used' : self.used,
+            'free' : free,
+            'largest_free' : largest_free,
+            'n_free_extents' : len(self._free_offsets),
+            'fragmentation' : 1.0 - largest_free/free if free > 0 else 0.0,
+            'occupancy' : self.used/self.memory_size,
+            'n_waveforms' : len(self.allocations),
+            'n_failed' : self.n_failed,
+            }
+
+
+    def _aligned_size(self, size):
+        return max(1, -(-size // self.alignment)) * self.alignment
+
+
+    def _add_free(self, offset, size):
+        bisect.insort(self._free_offsets, offset)
+        self._free_size[offset] = size
+        bisect.insort(self._free_by_size, (size, offset))
+
+
+    def _remove_free(self, offset):
+        size = self._free_size.pop(offset)
+        del self._free_offsets[bisect.bisect_left(self._free_offsets, offset)]
+        del self._free_by_size[bisect.bisect_left(self._free_by_size, (size, offset))]
+
+
+@dataclass
+class ResidentWaveform:
+    wave_reference: object
+    nbytes: int
+    ref_count: int = 0
+
+
+class WaveformRegistry:
+    '''
+    Reference counted registry of the waveforms in AWG memory, keyed on the content of the waveform.
+
+    A waveform with the same content as a waveform in AWG memory is not uploaded again,
+    but the waveform in memory is reused. The waveform is released when the last reference is released.
+
+    The registry keeps account of the bytes in AWG memory of all waveforms it uploaded (resident_bytes),
+    including uploads in progress. acquire can wait till the resident bytes fit in a memory budget.
+    '''
+    def __init__(self):
+        self._waveforms = {}
+        # key of the resident waveforms by id of the wave reference
+        self._keys = {}
+        self._lock = threading.Condition()
+
+        self.resident_bytes = 0
+        self.uploads = 0
+        self.hits = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+
+
+    @staticmethod
+    def make_key(awg_name, waveform):
+        '''
+        Key of a waveform in the memory of an AWG.
+        Args:
+            awg_name (str) : name of the AWG
+            waveform (np.ndarray) : waveform data
+        Returns:
+            key (tuple) : (awg_name, dtype, length, digest of the content)
+        '''
+        waveform = np.ascontiguousarray(waveform)
+        digest = hashlib.blake2b(waveform.data, digest_size=20).digest()
+        return (awg_name, waveform.dtype.str, len(waveform), digest)
+
+
+    def acquire(self, key, upload_function, nbytes, max_bytes=None, held_references=()):
+        '''
+        Returns a reference to the waveform in AWG memory. The waveform is uploaded if it is not in memory.
+        The reference count of the waveform is incremented. Every acquire must be matched by a release of the reference.
+        Args:
+            key (tuple) : key of the waveform (see make_key). If None, the waveform is always uploaded and never shared.
+            upload_function (Callable[[], object]) : function that uploads the waveform and returns the AWG waveform reference.
+            nbytes (int) : size of the waveform
+            max_bytes (int) : maximum resident bytes. The upload waits till other waveforms are released.
+                If None, there is no limit.
+            held_references (list) : wave references held by the caller. The upload does not wait for these
+                waveforms to be released. If the caller holds all resident waveforms, the upload does not wait.
+        Returns:
+            (wave_reference, uploaded) : AWG waveform reference and whether the waveform has been uploaded.
+        '''
+        with self._lock:
+            resident = self._waveforms.get(key) if key is not None else None
+            if resident is not None:
+                resident.ref_count += 1
+                self.hits += 1
+                self.bytes_saved += nbytes
+                return resident.wave_reference, False
+
+            if max_bytes is not None:
+                while (self.resident_bytes + nbytes > max_bytes
+                       and self.resident_bytes > self._get_bytes(held_references)):
+                    logging.debug(f'upload waits for memory: {self.resident_bytes} + {nbytes} bytes')
+                    self._lock.wait()
+            # reserve the memory for the upload
+            self.resident_bytes += nbytes
+
+        # upload outside the lock. Uploads can wait for the release of other waveforms.
+        try:
+            wave_reference = upload_function()
+        except BaseException:
+            with self._lock:
+                self.resident_bytes -= nbytes
+                self._lock.notify_all()
+            raise
+
+        with self._lock:
+            resident = self._waveforms.get(key) if key is not None else None
+            if resident is not None:
+                # uploaded concurrently by another thread
+                duplicate = wave_reference
+                self.resident_bytes -= nbytes
+                self.hits += 1
+                self.bytes_saved += nbytes
+                self._lock.notify_all()
+            else:
+                duplicate = None
+                if key is None:
+                    key = ('unique', id(wave_reference))
+                resident = ResidentWaveform(wave_reference, nbytes)
+                self._waveforms[key] = resident
+                self._keys[id(wave_reference)] = key
+                self.uploads += 1
+                self.bytes_uploaded += nbytes
+            resident.ref_count += 1
+        if duplicate is not None:
+            duplicate.release()
+        return resident.wave_reference, duplicate is None
+
+
+    def release(self, wave_reference):
+        '''
+        Decrements the reference count of the waveform and releases the AWG memory when it is not used anymore.
+        Waveform references that are not in the registry are released directly.
+        '''
+        with self._lock:
+            key = self._keys.get(id(wave_reference))
+            if key is None:
+                resident = None
+            else:
+                resident = self._waveforms[key]
+                resident.ref_count -= 1
+                if resident.ref_count > 0:
+                    return
+                del self._waveforms[key]
+                del self._keys[id(wave_reference)]
+        wave_reference.release()
+        if resident is not None:
+            with self._lock:
+                self.resident_bytes -= resident.nbytes
+                self._lock.notify_all()
+
+
+    def get_statistics(self):
+        '''
+        Returns:
+            statistics (dict): number of resident waveforms and their size (including uploads in progress),
+                uploads, hits and bytes uploaded and saved.
+        '''
+        with self._lock:
+            return {
+                'n_waveforms' : len(self._waveforms),
+                'resident_bytes' : self.resident_bytes,
+                'uploads' : self.uploads,
+                'hits' : self.hits,
+                'bytes_uploaded' : self.bytes_uploaded,
+                'bytes_saved' : self.bytes_saved,
+                }
+
+
+    def _get_bytes(self, wave_references):
+        # bytes of the distinct resident waveforms in wave_references
+        keys = {self._keys.get(id(wave_reference)) for wave_reference in wave_references}
+        keys.discard(None)
+        return sum(self._waveforms[key].nbytes for key in keys)
@@ -1,5 +1,6 @@
 
 import time
+import asyncio
 import logging
 from pulse_lib.keysight.uploader_core.uploader import waveform_cache_container
 
@@ -35,8 +36,8 @@ class keysight_uploader():
 		self.upload_ready_to_start = []
 		self.upload_done = []
 
-	def create_job(self, sequence, index, seq_id, n_rep, prescaler=0, neutralize=True):
-		return upload_job(sequence, index, seq_id, n_rep, prescaler, neutralize)
+	def create_job(self, sequence, index, seq_id, n_rep, prescaler=0, neutralize=True, priority=0):
+		return upload_job(sequence, index, seq_id, n_rep, prescaler, neutralize, priority)
 
 	def add_upload_job(self, job):
 		'''
@@ -94,6 +95,36 @@ class keysight_uploader():
 		job =  self.__get_upload_data(seq_id, index)
 		self.wait_until_AWG_idle()
 
+		self.__start_playback(job, release)
+
+	async def upload_async(self, job):
+		'''
+		add a job to the uploader and await the upload. The upload runs in the default executor of the event loop.
+		Args:
+			job (upload_job) : upload_job object that defines what needs to be uploaded
+		'''
+		loop = asyncio.get_running_loop()
+		await loop.run_in_executor(None, self.add_upload_job, job)
+
+	async def play_async(self, seq_id, index, release = True):
+		"""
+		start playback of a sequence that has been uploaded. Awaits the end of the previous playback.
+		Args:
+			seq_id (uuid) : id of the sequence
+			index (tuple) : index that has to be played
+			release (bool) : release memory on AWG after done.
+		"""
+		job =  self.__get_upload_data(seq_id, index)
+		try:
+			await self.wait_idle_async()
+		except asyncio.CancelledError:
+			# return job to queue. It can be played later.
+			self.upload_ready_to_start.append(job)
+			raise
+
+		self.__start_playback(job, release)
+
+	def __start_playback(self, job, release):
 		# 1 + 2)
 		# flush the queue's
 		for channel_name, data in job.upload_data.items():
@@ -253,6 +284,19 @@ class keysight_uploader():
 		while awg.awg.AWGisRunning(channel):
 			time.sleep(0.001)
 
+	async def wait_idle_async(self, poll_interval=0.001):
+		'''
+		await till the AWG is done with playback. The wait can be cancelled.
+		Args:
+			poll_interval (float) : interval to check the AWG state in seconds.
+		'''
+		# assume all awg's are used and also all the channels
+		awg_name, channel = next(iter(self.channel_map.values()))
+		awg = self.AWGs[awg_name]
+
+		while awg.awg.AWGisRunning(channel):
+			await asyncio.sleep(poll_interval)
+
 
 class upload_job(object):
 	"""docstring for upload_job"""
@@ -0,0 +1,329 @@
+"""
+Process pool to render the waveforms of a sequence in worker processes.
+
+The pulse data of all segments and channels of the sequence is pickled in shared memory and loaded by the
+workers. When a segment is changed, a new snapshot of the pulse data is made before the next render.
+The workers write the waveforms in shared memory that is used without copy by the uploader.
+"""
+import os
+import time
+import pickle
+import logging
+import weakref
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+
+
+# pulse data of the sequence in the worker process: dict<channel name, list<data_container>>
+_worker_pulse_data = None
+# version of the snapshot of the pulse data loaded by the worker process
+_worker_version = None
+# float buffer of the worker process to copy the waveforms in before conversion to DAC codes
+_worker_render_buffer = np.empty(0)
+
+
+def _load_pulse_data(snapshot):
+    '''
+    Loads the pulse data of the snapshot (shm_name, nbytes, version) if the worker has another version.
+    '''
+    global _worker_pulse_data, _worker_version
+    shm_name, nbytes, version = snapshot
+    if version == _worker_version:
+        return
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        _worker_pulse_data = pickle.loads(bytes(shm.buf[:nbytes]))
+    finally:
+        shm.close()
+    _worker_version = version
+
+
+def _warm_up_worker(snapshot, sample_rate):
+    # render first index of every channel to import modules and compute breakpoint tables.
+    # The waveform cache is bypassed to get the same waveforms as rendered in-process.
+    start = time.perf_counter()
+    _load_pulse_data(snapshot)
+    for channel_data in _worker_pulse_data.values():
+        for data in channel_data:
+            data.flat[0]._render(sample_rate)
+    return time.perf_counter() - start
+
+
+def _render_channel(snapshot, channel_name, index, segment_delays, segment_offsets, sample_rate,
+                    shm_name, n_samples, scale, dac_codes):
+    '''
+    Renders the segments of one channel in shared memory.
+    '''
+    global _worker_render_buffer
+    start = time.perf_counter()
+    from pulse_lib.keysight.M3202A_uploader import to_dac_codes
+    _load_pulse_data(snapshot)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        waveform = np.ndarray((n_samples,), dtype=np.int16 if dac_codes else np.double, buffer=shm.buf)
+        for data, (pre_delay, post_delay), (offset, npt) in zip(_worker_pulse_data[channel_name], segment_delays, segment_offsets):
+            data_object = data.flat[np.ravel_multi_index(tuple(index), data.shape)]
+            if dac_codes:
+                if len(_worker_render_buffer) < npt:
+                    _worker_render_buffer = np.empty(npt)
+                wvf = data_object.render(pre_delay, post_delay, sample_rate, out=_worker_render_buffer[:npt])
+                wvf *= scale
+                to_dac_codes(wvf, out=waveform[offset:offset + npt])
+            else:
+                wvf = data_object.render(pre_delay, post_delay, sample_rate, out=waveform[offset:offset + npt])
+                wvf *= scale
+        del waveform
+    finally:
+        shm.close()
+    return time.perf_counter() - start
+
+
+def _render_indices(snapshot, channel_name, flat_indices, row_offset, pre_delay, post_delay, sample_rate, shm_name, shape):
+    '''
+    Renders a chunk of indices of one channel in rows of a 2D array in shared memory.
+    '''
+    start = time.perf_counter()
+    _load_pulse_data(snapshot)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        waveforms = np.ndarray(shape, dtype=np.double, buffer=shm.buf)
+        _render_rows(_worker_pulse_data[channel_name], flat_indices, waveforms[row_offset:row_offset + len(flat_indices)],
+                     pre_delay, post_delay, sample_rate)
+        del waveforms
+    finally:
+        shm.close()
+    return time.perf_counter() - start
+
+
+def _render_rows(channel_data, flat_indices, waveforms, pre_delay, post_delay, sample_rate):
+    '''
+    Renders the concatenated segments of the flat indices in the rows of waveforms.
+    The segments are rendered with a batch render per chunk of indices.
+    '''
+    offsets = np.zeros(len(flat_indices), dtype=int)
+    for j, data in enumerate(channel_data):
+        data_objects = [data.flat[flat_index] for flat_index in flat_indices]
+        seg_pre_delay = pre_delay if j == 0 else 0
+        seg_post_delay = post_delay if j == len(channel_data) - 1 else 0
+        batch = type(data_objects[0]).render_batch(data_objects, seg_pre_delay, seg_post_delay, sample_rate)
+        for i, data_object in enumerate(data_objects):
+            npt = data_object.get_waveform_npt(seg_pre_delay, seg_post_delay, sample_rate)
+            waveforms[i, offsets[i]:offsets[i] + npt] = batch[i, :npt]
+            offsets[i] += npt
+
+    for row, offset in zip(waveforms, offsets):
+        row[offset:] = row[offset-1] if offset > 0 else 0
+
+
+def _free_shared_memory(shm):
+    shm.close()
+    shm.unlink()
+
+
+class shared_waveform:
+    '''
+    numpy array in shared memory. The shared memory is freed after release(), when the array and
+    all views on it have been deleted.
+
+    Args:
+        shape (tuple) : shape of the array
+        dtype (np.dtype) : data type of the array
+    '''
+    def __init__(self, shape, dtype=np.double):
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.data = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        # numpy does not keep a buffer export on the shared memory, so closing it would invalidate views.
+        # Views reference self.data as base: free the memory when self.data is garbage collected.
+        self._finalizer = weakref.finalize(self.data, _free_shared_memory, self.shm)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def release(self):
+        '''
+        Releases the data. The shared memory is freed when no views on the data are in use anymore.
+        '''
+        self.data = None
+
+    def __del__(self):
+        self.release()
+
+
+class render_pool:
+    '''
+    Process pool to render the waveforms of a sequence.
+
+    Args:
+        sequence (list<segment_container>) : segments of the sequence (after sequencer.add_sequence).
+        channel_names (list<str>) : channels to render.
+        n_processes (int) : number of worker processes. If None the number of cores is used.
+        chunk_size (int) : number of indices per task in render_indices.
+        sample_rate (double) : sample rate used to warm up the workers.
+    Note:
+        The workers get a copy of the pulse data. Before every render the segments are checked for changes.
+        If a segment changed, a new copy of the pulse data is sent to the workers.
+    '''
+    def __init__(self, sequence, channel_names, n_processes=None, chunk_size=16, sample_rate=1e9):
+        self.sequence = sequence
+        self.channel_names = list(channel_names)
+        self.chunk_size = chunk_size
+        self.executor = None
+        self.task_timings = []
+        # pulse data objects of the snapshot and pickled snapshot in shared memory
+        self._pulse_data = None
+        self._snapshot_buffer = None
+        self._snapshot = None
+        self._version = 0
+
+        start = time.perf_counter()
+        if not self._take_snapshot():
+            return
+        nbytes = self._snapshot[1]
+
+        self.n_processes = n_processes if n_processes is not None else os.cpu_count()
+        if os.name == 'posix':
+            # the workers must share the resource tracker of this process. Otherwise the tracker of a worker
+            # unlinks the shared memory attached by the worker when the worker stops.
+            resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(self.n_processes)
+        # warm up: start all workers and let them render the first index.
+        try:
+            warm_up = [self.executor.submit(_warm_up_worker, self._snapshot, sample_rate) for i in range(self.n_processes)]
+            warm_up_time = max(future.result() for future in warm_up)
+        except Exception:
+            logging.warning('Render pool failed to start; rendering in-process.', exc_info=True)
+            self.shutdown()
+            return
+
+        duration = time.perf_counter() - start
+        logging.info(f'render pool started: {self.n_processes} processes, {nbytes} bytes pulse data, '
+                     f'warm up {warm_up_time*1000:6.1f} ms, total {duration*1000:6.1f} ms')
+
+    @property
+    def active(self):
+        return self.executor is not None
+
+    def update(self):
+        '''
+        Takes a new snapshot of the pulse data if a segment has been changed since the last snapshot.
+        The workers load the new snapshot on their next task.
+        Returns:
+            success (bool) : False if the pulse data cannot be pickled. The pool is then shut down.
+        '''
+        if not self.active:
+            return False
+        for channel_name, channel_data in self._pulse_data.items():
+            for seg, data in zip(self.sequence, channel_data):
+                # pulse_data_all is a new object when the segment or one of its references has been changed.
+                if getattr(seg, channel_name).pulse_data_all is not data:
+                    logging.info('segments changed; new snapshot of pulse data for render pool')
+                    if not self._take_snapshot():
+                        self.shutdown()
+                        return False
+                    return True
+        return True
+
+    def _take_snapshot(self):
+        try:
+            pulse_data = {channel_name:[getattr(seg, channel_name).pulse_data_all for seg in self.sequence]
+                          for channel_name in self.channel_names}
+            pulse_data_pickle = pickle.dumps(pulse_data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logging.warning('Pulse data cannot be pickled. Render pool disabled; rendering in-process.', exc_info=True)
+            return False
+
+        # tasks of older snapshots are all finished; workers that have not loaded a snapshot yet load the new one.
+        if self._snapshot_buffer is not None:
+            self._snapshot_buffer.release()
+        self._snapshot_buffer = shared_waveform((len(pulse_data_pickle),), np.uint8)
+        self._snapshot_buffer.data[:] = np.frombuffer(pulse_data_pickle, dtype=np.uint8)
+        self._version += 1
+        self._snapshot = (self._snapshot_buffer.name, len(pulse_data_pickle), self._version)
+        self._pulse_data = pulse_data
+        return True
+
+    def render_channels(self, tasks):
+        '''
+        Renders channel waveforms in shared memory.
+
+        Args:
+            tasks (list<tuple>) : (channel_name, index, segment_delays, segment_offsets, sample_rate, shm_name, n_samples, scale, dac_codes)
+        Returns:
+            success (bool) : False if the pool failed. The pool is shut down and the caller must render in-process.
+        '''
+        if not self.update():
+            return False
+        try:
+            futures = [self.executor.submit(_render_channel, self._snapshot, *task) for task in tasks]
+            for task, future in zip(tasks, futures):
+                self.task_timings.append((task[0], future.result()))
+        except Exception:
+            logging.error('Render pool failed; rendering in-process.', exc_info=True)
+            self.shutdown()
+            return False
+        return True
+
+    def render_indices(self, channel_name, indices=None, pre_delay=0, post_delay=0, sample_rate=1e9):
+        '''
+        Renders the concatenated segments of a channel for many indices.
+        The indices are distributed over the workers in chunks of chunk_size.
+
+        Args:
+            channel_name (str) : channel to render
+            indices (list<tuple>) : indices to render. If None, all indices are rendered (in C order).
+            pre_delay (double) : pre delay of the first segment
+            post_delay (double) : post delay of the last segment
+            sample_rate (double) : sample rate
+        Returns:
+            waveforms (shared_waveform) : 2D array (n_indices, n_samples) in shared memory.
+                Waveforms shorter than the longest one are padded with their last value.
+        '''
+        segments = [getattr(seg, channel_name) for seg in self.sequence]
+        shape = segments[0].pulse_data_all.shape
+        if indices is None:
+            flat_indices = list(range(int(np.prod(shape))))
+        else:
+            flat_indices = [np.ravel_multi_index(tuple(index), shape) for index in indices]
+
+        n_samples = 0
+        for flat_index in flat_indices:
+            index = np.unravel_index(flat_index, shape)
+            npt = 0
+            for j, seg in enumerate(segments):
+                seg_pre_delay = pre_delay if j == 0 else 0
+                seg_post_delay = post_delay if j == len(segments) - 1 else 0
+                npt += seg.get_segment_npt(index, seg_pre_delay, seg_post_delay, sample_rate)
+            n_samples = max(n_samples, npt)
+
+        waveforms = shared_waveform((len(flat_indices), n_samples))
+        chunks = [(flat_indices[i:i+self.chunk_size], i) for i in range(0, len(flat_indices), self.chunk_size)]
+        args = (pre_delay, post_delay, sample_rate, waveforms.name, waveforms.data.shape)
+
+        if self.update():
+            try:
+                futures = [self.executor.submit(_render_indices, self._snapshot, channel_name, chunk, row, *args)
+                           for chunk, row in chunks]
+                for future in futures:
+                    self.task_timings.append((channel_name, future.result()))
+                return waveforms
+            except Exception:
+                logging.error('Render pool failed; rendering in-process.', exc_info=True)
+                self.shutdown()
+
+        # in-process fallback
+        channel_data = [seg.pulse_data_all for seg in segments]
+        for chunk, row in chunks:
+            _render_rows(channel_data, chunk, waveforms.data[row:row + len(chunk)], pre_delay, post_delay, sample_rate)
+        return waveforms
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        if self._snapshot_buffer is not None:
+            self._snapshot_buffer.release()
+            self._snapshot_buffer = None
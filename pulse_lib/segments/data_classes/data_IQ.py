@@ -9,8 +9,76 @@ import copy
 import pulse_lib.segments.utility.segments_c_func as seg_func
 from pulse_lib.segments.utility.segments_c_func import py_calc_value_point_in_between, get_effective_point_number
 from pulse_lib.segments.data_classes.data_generic import parent_data, data_container
+from pulse_lib.segments.data_classes.lru_cache import LruCache
 from dataclasses import dataclass
 
+
+def cacheable_envelope(envelope_function):
+    """
+    Decorator for user defined envelope functions (or classes with a __call__ method) that always return
+    the same envelope for the same arguments. The envelopes of these functions are cached by envelope_generator.
+
+    The cache key is (function, delta_t, sample_rate), so the function object should be shared between pulses.
+    Instances of a decorated class share cache entries if they compare equal (e.g. a frozen dataclass).
+    """
+    envelope_function._cacheable_envelope = True
+    return envelope_function
+
+
+class envelope_lru_cache:
+    """
+    Least recently used cache for rendered envelopes with hit/miss statistics.
+    Cached envelopes are read-only.
+
+    Args:
+        max_size (int): maximum number of envelopes to cache.
+    """
+    def __init__(self, max_size):
+        self.cache = LruCache(max_size)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return self.cache.max_size
+
+    def get(self, key, render_function):
+        """
+        Returns the cached envelope for key, or renders and caches it.
+
+        Args:
+            key (tuple) : hashable key of the envelope.
+            render_function (function) : function without arguments that renders the envelope.
+        """
+        entry = self.cache[key]
+        envelope = entry.data
+        with self.cache._lock:
+            if envelope is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if envelope is None:
+            envelope = np.array(render_function(), dtype=np.double)
+            envelope.flags.writeable = False
+            entry.data = envelope
+        return envelope
+
+    def get_stats(self):
+        """
+        Returns:
+            stats (dict) : hits, misses, evictions, number of cached envelopes, bytes resident and maximum size.
+        """
+        cache_stats = self.cache.get_stats()
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'evictions' : cache_stats['evictions'],
+            'size' : cache_stats['entries'],
+            'bytes' : cache_stats['bytes'],
+            'max_size' : self.cache.max_size,
+            }
+
+
 class envelope_generator():
     """
     Object that handles envelope functions that can be used in spin qubit experiments.
@@ -18,7 +86,10 @@ class envelope_generator():
         * Makes sure average amplitude of the evelope is the one expressed
         * Executes some subsampling functions to give greater time resolution than the sample rate of the AWG.
         * Allows for plotting the FT of the envelope function.
+        * Caches rendered window envelopes and envelopes of functions decorated with @cacheable_envelope.
     """
+    envelope_cache = envelope_lru_cache(1000)
+
     def __init__(self, AM_envelope_function = None, PM_envelope_function = None):
         """
         define envelope funnctions.
@@ -30,6 +101,30 @@ class envelope_generator():
         self.AM_envelope_function = AM_envelope_function
         self.PM_envelope_function = PM_envelope_function
 
+    @classmethod
+    def set_envelope_cache_size(cls, size):
+        '''
+        Set the new (maximum) number of envelopes in the envelope cache.
+        The cache is cleared when its size changes.
+        '''
+        if size != cls.envelope_cache.max_size:
+            cls.envelope_cache = envelope_lru_cache(size)
+
+    @classmethod
+    def clear_envelope_cache(cls):
+        '''
+        Clears the envelope cache and its statistics.
+        '''
+        cls.envelope_cache = envelope_lru_cache(cls.envelope_cache.max_size)
+
+    @classmethod
+    def get_envelope_cache_stats(cls):
+        '''
+        Returns:
+            stats (dict) : hits, misses, number of cached envelopes and maximum size of the envelope cache.
+        '''
+        return cls.envelope_cache.get_stats()
+
     def get_AM_envelope(self, delta_t, sample_rate=1):
         """
         Render the envelope for the given waveshape (in init).
@@ -49,9 +144,9 @@ class envelope_generator():
         if self.AM_envelope_function is None:
             envelope = np.ones([int(n_points)]) #assume rectangular envelope
         elif isinstance(self.AM_envelope_function, tuple) or isinstance(self.AM_envelope_function, str):
-            envelope = signal.get_window(self.AM_envelope_function, int(n_points*10))[::10][:int(n_points)] #ugly fix
+            envelope = self._get_window(self.AM_envelope_function, n_points, True)
         else:
-            envelope = self.AM_envelope_function(delta_t, sample_rate) # user reponsible to do good subsampling him/herself.
+            envelope = self._call_envelope_function(self.AM_envelope_function, delta_t, sample_rate) # user reponsible to do good subsampling him/herself.
 
         return envelope
 
@@ -74,12 +169,39 @@ class envelope_generator():
         if self.PM_envelope_function is None:
             envelope = np.zeros([int(n_points)])
         elif isinstance(self.PM_envelope_function, tuple) or isinstance(self.PM_envelope_function, str):
-            envelope = signal.get_window(self.PM_envelope_function, int(n_points*10))[::10]
+            envelope = self._get_window(self.PM_envelope_function, n_points, False)
         else:
-            envelope = self.PM_envelope_function(delta_t, sample_rate) # user reponsible to do good subsampling him/herself.
+            envelope = self._call_envelope_function(self.PM_envelope_function, delta_t, sample_rate) # user reponsible to do good subsampling him/herself.
 
         return envelope
 
+    def _get_window(self, window, n_points, truncate):
+        '''
+        get window sampled with 1/10 of a sample resolution.
+        The result only depends on the point count and the sub-sample offset (in 1/10 sample),
+        so these are used as cache key, independent of the sample rate.
+        '''
+        n_oversampled = int(n_points*10)
+        n_truncated = int(n_points) if truncate else None
+
+        def render():
+            return signal.get_window(window, n_oversampled)[::10][:n_truncated] #ugly fix
+
+        try:
+            key = ('window', window, n_oversampled, n_truncated)
+            hash(key)
+        except TypeError:
+            return render()
+
+        return self.envelope_cache.get(key, render)
+
+    def _call_envelope_function(self, envelope_function, delta_t, sample_rate):
+        if not getattr(envelope_function, '_cacheable_envelope', False):
+            return envelope_function(delta_t, sample_rate)
+
+        return self.envelope_cache.get(('function', envelope_function, delta_t, sample_rate),
+                                       lambda: envelope_function(delta_t, sample_rate))
+
 def make_chirp(f_start, f_stop, time0, time1):
     '''
     Make a chirp.
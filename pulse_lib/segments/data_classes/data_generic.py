@@ -6,9 +6,24 @@ from abc import ABC, abstractmethod
 import numpy as np
 from pulse_lib.segments.utility.segments_c_func import get_effective_point_number
 from pulse_lib.segments.data_classes.lru_cache import LruCache
+from pulse_lib.segments.data_classes.disk_cache import DiskCache
 
 import copy
 
+def _get_effective_point_numbers(times, time_step):
+    '''
+    vectorized version of get_effective_point_number.
+    Args:
+        times (np.ndarray[ndim=1, dtype=double]) : times in ns
+        time_step (double) : time step of the AWG (ns)
+    Returns:
+        n_pt (np.ndarray[ndim=1, dtype=int64]) : number of points needed to get to the times.
+    '''
+    n_pt, mod = np.divmod(times, time_step)
+    n_pt += mod > time_step/2
+    return n_pt.astype(np.int64)
+
+
 class parent_data(ABC):
     """
         Abstract class hosting some functions that take care of rendering and caching of data and
@@ -18,6 +33,11 @@ class parent_data(ABC):
     software_marker_data = dict()
 
     waveform_cache = LruCache(100)
+    # key of the waveform cache: 'id' (data object) or 'content' (fingerprint of the pulse description)
+    waveform_cache_key = 'id'
+    waveform_cache_stats = {'renders' : 0, 'hits' : 0, 'shared_hits' : 0, 'disk_hits' : 0}
+    # optional persistent second tier of the waveform cache
+    waveform_disk_cache = None
 
     def __init__(self):
         self.id = uuid.uuid4()
@@ -29,7 +49,23 @@ class parent_data(ABC):
         The cache is cleared when its size changes.
         '''
         if size != cls.waveform_cache.max_size:
-            cls.waveform_cache = LruCache(size)
+            cls.waveform_cache = LruCache(size, cls.waveform_cache.max_bytes)
+
+    @classmethod
+    def set_waveform_cache_max_bytes(cls, max_bytes, max_size=None):
+        '''
+        Bound the waveform cache by the total size of the cached waveforms.
+        The cache is cleared.
+
+        Args:
+            max_bytes (int) : maximum number of bytes of cached waveforms.
+                If None, the cache is only bounded by the number of entries (default).
+            max_size (int) : maximum number of entries. If None, the number of entries is not limited
+                when max_bytes is set, otherwise the current maximum number of entries is kept.
+        '''
+        if max_bytes is None and max_size is None:
+            max_size = cls.waveform_cache.max_size
+        cls.waveform_cache = LruCache(max_size, max_bytes)
 
     @classmethod
     def clear_waveform_cache(cls):
@@ -37,7 +73,81 @@ class parent_data(ABC):
         Clears the waveform cache (freeing memory).
         '''
         # clear the cache by initializing a new one of the same size
-        cls.waveform_cache = LruCache(cls.waveform_cache.max_size)
+        cls.waveform_cache = LruCache(cls.waveform_cache.max_size, cls.waveform_cache.max_bytes)
+
+    @classmethod
+    def set_waveform_disk_cache(cls, directory, max_bytes=None):
+        '''
+        Set a persistent cache on disk behind the waveform cache.
+        Waveforms are stored as .npy files and memory-mapped when they are loaded after a restart.
+        The disk cache is only used with waveform cache key 'content' (see set_waveform_cache_key).
+
+        Args:
+            directory (str) : directory for the cache files. If None, the disk cache is disabled.
+            max_bytes (int) : maximum total size of the cache files. If None, the size is not limited.
+        '''
+        if directory is None:
+            parent_data.waveform_disk_cache = None
+        else:
+            parent_data.waveform_disk_cache = DiskCache(directory, max_bytes)
+
+    @classmethod
+    def set_waveform_cache_key(cls, key):
+        '''
+        Select the key of the waveform cache.
+        The cache is cleared when the key changes.
+
+        Args:
+            key (str) : 'id' (default) caches the waveform per data object.
+                'content' caches the waveform by a fingerprint of the pulse description and sample rate.
+                Data objects with identical pulses share the cached waveform, also between segments and sequences.
+                Data objects without fingerprint (see get_fingerprint) are cached per object.
+        '''
+        if key not in ('id', 'content'):
+            raise ValueError(f"Unknown waveform cache key '{key}'. Use 'id' or 'content'.")
+        if key != parent_data.waveform_cache_key:
+            parent_data.waveform_cache_key = key
+            parent_data.clear_waveform_cache()
+
+    @classmethod
+    def get_waveform_cache_stats(cls):
+        '''
+        Statistics of the waveform cache since the last reset.
+
+        Returns:
+            stats (dict) :
+                renders: number of waveforms rendered for the cache
+                hits: number of waveforms taken from the cache
+                shared_hits: hits on a waveform that was rendered for another data object
+                disk_hits: waveforms loaded from the disk cache instead of rendered
+                dedup_rate: shared_hits / (renders + hits + disk_hits)
+                evictions: number of entries evicted from the current cache
+                entries: number of entries in the cache
+                bytes: size of the waveforms in the cache
+                max_size, max_bytes: limits of the cache
+        '''
+        stats = dict(parent_data.waveform_cache_stats)
+        lookups = stats['renders'] + stats['hits'] + stats['disk_hits']
+        stats['dedup_rate'] = stats['shared_hits'] / lookups if lookups > 0 else 0.0
+        cache_stats = cls.waveform_cache.get_stats()
+        for key in ['evictions', 'entries', 'bytes', 'max_size', 'max_bytes']:
+            stats[key] = cache_stats[key]
+        return stats
+
+    @classmethod
+    def reset_waveform_cache_stats(cls):
+        for key in parent_data.waveform_cache_stats:
+            parent_data.waveform_cache_stats[key] = 0
+
+    def get_fingerprint(self):
+        '''
+        Hashable fingerprint of the pulse description, used as key for the waveform cache.
+        Data objects with equal fingerprints must render identical waveforms.
+
+        Returns:
+            fingerprint (hashable or None) : None if the data object cannot be fingerprinted.
+        '''
+        return None
 
     @abstractmethod
     def append():
@@ -105,6 +215,49 @@ class parent_data(ABC):
         '''
         raise NotImplemented
 
+    def get_waveform_npt(self, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        number of samples of the rendered waveform, without rendering it.
+        Args:
+            pre_delay (double) : amount of time to put before the sequence the rendering needs to start
+            post_delay (double) : to which point in time the rendering needs to go
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            n_pt (int) : number of samples returned by render()
+        '''
+        # express in Gs/s
+        sample_rate = sample_rate*1e-9
+        sample_time_step = 1/sample_rate
+
+        t_tot_pt = get_effective_point_number(self.total_time, sample_time_step) + 1
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+        post_delay_pt = get_effective_point_number(post_delay, sample_time_step)
+
+        return int(t_tot_pt + pre_delay_pt + post_delay_pt)
+
+    @classmethod
+    def get_waveform_npt_batch(cls, data_objects, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        number of samples of the rendered waveforms of a list of data objects (see get_waveform_npt).
+        Args:
+            data_objects (list<parent_data>) : data objects, e.g. all entries of a data_container.
+            pre_delay (double) : amount of time to put before the sequence the rendering needs to start
+            post_delay (double) : to which point in time the rendering needs to go
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            n_pt (np.ndarray[ndim=1, dtype=int64]) : number of samples returned by render() for every object
+        '''
+        # express in Gs/s
+        sample_rate = sample_rate*1e-9
+        sample_time_step = 1/sample_rate
+
+        total_times = np.array([data_object.total_time for data_object in data_objects], dtype=np.double)
+        t_tot_pt = _get_effective_point_numbers(total_times, sample_time_step) + 1
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+        post_delay_pt = get_effective_point_number(post_delay, sample_time_step)
+
+        return t_tot_pt + int(pre_delay_pt + post_delay_pt)
+
     def add_software_marker(self, marker_name, time):
         '''
         add a marker in software (used as arguments for HVI commands)
@@ -115,21 +268,23 @@ class parent_data(ABC):
         '''
         self.software_marker_data[marker_name] = time
 
-    def render(self, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+    def render(self, pre_delay = 0, post_delay = 0, sample_rate=1e9, out = None):
         '''
         renders pulse
         Args:
             pre_delay (double) : amount of time to put before the sequence the rendering needs to start
             post_delay (double) : to which point in time the rendering needs to go
             sample_rate (double) : rate at which the AWG will be run
+            out (np.ndarray) : optional array with get_waveform_npt() samples to copy the waveform in.
+                The waveform is cached as without out, so data objects shared by multiple indices are rendered once.
         returns
-            pulse (np.ndarray) : numpy array of the pulse
+            pulse (np.ndarray) : numpy array of the pulse (out if given)
         '''
+        cache_key = self._get_cache_key(sample_rate)
 
         # If no render performed, generate full waveform, we will cut out the right size if needed
-        cache_entry = self._get_cached_data_entry()
+        cache_entry = self.waveform_cache[cache_key]
         if cache_entry.data is None or cache_entry.data['sample_rate'] != sample_rate:
-
             pre_delay_wvf = pre_delay
             if pre_delay > 0:
                 pre_delay_wvf = 0
@@ -137,32 +292,108 @@ class parent_data(ABC):
             if post_delay < 0:
                 pre_delay_wvf = 0
 
+            disk_cache = parent_data.waveform_disk_cache
+            waveform = None
+            if disk_cache is not None and cache_key != self.id:
+                disk_key = DiskCache.make_key(cache_key[0], sample_rate, pre_delay_wvf, post_delay_wvf)
+                waveform = disk_cache.get(disk_key)
+
+            if waveform is None:
+                parent_data.waveform_cache_stats['renders'] += 1
+                waveform = self._render(sample_rate, pre_delay_wvf, post_delay_wvf)
+                if disk_cache is not None and cache_key != self.id:
+                    disk_cache.put(disk_key, waveform)
+            else:
+                parent_data.waveform_cache_stats['disk_hits'] += 1
+
             cache_entry.data = {
                 'sample_rate' : sample_rate,
-                'waveform' : self._render(sample_rate, pre_delay_wvf, post_delay_wvf),
+                'waveform' : waveform,
                 'pre_delay': pre_delay,
-                'post_delay' : post_delay
+                'post_delay' : post_delay,
+                'owner' : self.id
             }
+        else:
+            parent_data.waveform_cache_stats['hits'] += 1
+            if cache_entry.data['owner'] != self.id:
+                parent_data.waveform_cache_stats['shared_hits'] += 1
 
         # get the waveform
-        my_waveform = self.get_resized_waveform(pre_delay, post_delay)
+        my_waveform = self.get_resized_waveform(pre_delay, post_delay, cache_entry.data)
+
+        if out is not None:
+            if len(out) != len(my_waveform):
+                raise ValueError(f'Length of output array ({len(out)}) does not match length of waveform ({len(my_waveform)})')
+            out[:] = my_waveform
+            return out
 
         return my_waveform
 
+    @classmethod
+    def render_batch(cls, data_objects, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        renders a list of data objects into one 2D array.
+        Data classes can override this method with a vectorized implementation.
+        Args:
+            data_objects (list<parent_data>) : data objects to render, e.g. all entries of a data_container.
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            post_delay (double) : amount of time to put after the sequence (>= 0)
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            waveforms (np.ndarray[ndim=2, dtype=double]) : (len(data_objects), n_samples) array.
+                Waveforms shorter than the longest one are padded with their last value.
+        '''
+        rendered = [data._render(sample_rate, pre_delay, post_delay) for data in data_objects]
+        n_max = max([len(wvf) for wvf in rendered], default=0)
+
+        waveforms = np.zeros((len(rendered), n_max))
+        for i, wvf in enumerate(rendered):
+            waveforms[i,:len(wvf)] = wvf
+            if 0 < len(wvf) < n_max:
+                waveforms[i,len(wvf):] = wvf[-1]
+
+        return waveforms
+
+    @classmethod
+    def integrate_batch(cls, data_objects, pre_delay, post_delay, sample_rate):
+        '''
+        integrals of a list of data objects.
+        Data classes can override this method with a vectorized implementation.
+        Args:
+            data_objects (list<parent_data>) : data objects to integrate, e.g. all entries of a data_container.
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            post_delay (double or np.ndarray) : amount of time to put after the sequence, can be set per object.
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            integrals (np.ndarray[ndim=1, dtype=double]) : integrated value of every waveform (unit is mV/sec).
+        '''
+        post_delay = np.broadcast_to(post_delay, (len(data_objects),))
+        return np.array([data.integrate_waveform(pre_delay, post_delay[i], sample_rate)
+                         for i, data in enumerate(data_objects)], dtype=np.double)
+
     def _get_cached_data_entry(self):
         return self.waveform_cache[self.id]
 
+    def _get_cache_key(self, sample_rate):
+        if self.waveform_cache_key == 'content':
+            fingerprint = self.get_fingerprint()
+            if fingerprint is not None:
+                return (fingerprint, sample_rate)
+        return self.id
+
 
-    def get_resized_waveform(self, pre_delay, post_delay):
+    def get_resized_waveform(self, pre_delay, post_delay, cached_data=None):
         '''
         extend/shrink an existing waveform
         Args:
             pre_delay (double) : ns to add before
             post_delay (double) : ns to add after the waveform
+            cached_data (dict) : cached waveform data. If None, the cache entry of this object is used.
         Returns:
             waveform (np.ndarray[ndim=1, dtype=double])
         '''
-        cached_data = self._get_cached_data_entry().data
+        if cached_data is None:
+            cached_data = self._get_cached_data_entry().data
 
         sample_rate = cached_data['sample_rate']*1e-9
         sample_time_step = 1/sample_rate
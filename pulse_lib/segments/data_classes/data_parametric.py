@@ -0,0 +1,350 @@
+"""
+Parametric (lazy) representation of the data of swept segments.
+
+A data_container holds a copy of the pulse data for every index of the sweep. A parametric_data_container
+records the calls on the segment once, with their loop arguments, and materializes the pulse data of an index
+when it is accessed (e.g. for rendering). Memory scales with the number of pulses instead of the number of
+pulses times the size of the sweep.
+"""
+import copy
+import inspect
+import importlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from pulse_lib.segments.utility.looping import loop_obj
+from pulse_lib.segments.data_classes.data_generic import data_container
+
+
+def _get_loop_value(lp, index):
+    '''
+    value of the loop object at the index of the sweep. Loop axis n is index[-1-n].
+    '''
+    key = tuple(index[-1-axis] if n > 1 else 0 for axis, n in zip(lp.axis, lp.shape))
+    return lp.data[key]
+
+
+def _get_term_index(shape, index):
+    '''
+    index in an array with shape that is broadcast to the shape of index (right aligned, as numpy).
+    '''
+    index = index[len(index) - len(shape):]
+    return tuple(i if n > 1 else 0 for i, n in zip(index, shape))
+
+
+class _segment_stub:
+    '''
+    Replaces the segment in a recorded call. The segment methods called by the loop_controller only use data_tmp.
+    '''
+    def __init__(self, data_tmp):
+        self.data_tmp = data_tmp
+
+
+class _loop_call:
+    '''
+    Call of a segment method recorded by the loop_controller. Loop objects are replaced by their value at the index.
+    The segment method modifies the data object.
+    '''
+    in_place = True
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = [copy.copy(arg) if isinstance(arg, loop_obj) else arg for arg in args]
+        self.kwargs = kwargs
+
+    @property
+    def loop_axes(self):
+        return {axis
+                for arg in self.args if isinstance(arg, loop_obj)
+                for axis, n in zip(arg.axis, arg.shape) if n > 1}
+
+    def __call__(self, element, index):
+        args = [_get_loop_value(arg, index) if isinstance(arg, loop_obj) else arg for arg in self.args]
+        return self.func(_segment_stub(element), *args, **self.kwargs)
+
+    def __getstate__(self):
+        # the module attribute is the decorated method. Pickle the name of the undecorated function.
+        state = dict(self.__dict__)
+        state['func'] = (self.func.__module__, self.func.__qualname__)
+        return state
+
+    def __setstate__(self, state):
+        module_name, qualname = state['func']
+        class_name, name = qualname.rsplit('.', 1)
+        owner = importlib.import_module(module_name)
+        for attr in class_name.split('.'):
+            owner = getattr(owner, attr)
+        if name.startswith('__') and not name.endswith('__'):
+            # name mangling of private methods
+            name = f'_{owner.__name__.lstrip("_")}{name}'
+        state['func'] = inspect.unwrap(owner.__dict__[name])
+        self.__dict__.update(state)
+
+
+class _multiply:
+    def __init__(self, factor):
+        self.factor = factor
+
+    loop_axes = frozenset()
+    in_place = False
+
+    def __call__(self, element, index):
+        return element*self.factor
+
+
+class _add_constant:
+    def __init__(self, value):
+        self.value = value
+
+    loop_axes = frozenset()
+    in_place = False
+
+    def __call__(self, element, index):
+        return element + self.value
+
+
+class _map:
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    loop_axes = frozenset()
+    in_place = False
+
+    def __call__(self, element, index):
+        return self.func(element, *self.args)
+
+
+class _flat_accessor:
+    def __init__(self, container):
+        self.container = container
+
+    def __getitem__(self, flat_index):
+        return self.container.get_item(np.unravel_index(flat_index, self.container.shape))
+
+
+class parametric_data_container:
+    '''
+    Lazy replacement of a data_container.
+
+    The data object of an index is the sum of the data objects of the terms at that index (broadcast as numpy),
+    followed by the operations in order. The operations are recorded segment calls with loop arguments,
+    multiplications, additions of constants and conversions (see map).
+
+    The materialized data objects are cached per container for the indices that are varied by the sweep.
+    Only the methods needed for composition and rendering are supported. Other access falls back to
+    a full data_container (see materialize).
+
+    Args:
+        terms (list<data_container/parametric_data_container>) : data that is added.
+        shape (tuple) : shape of the sweep.
+        operations (list) : operations on the data object of an index.
+    '''
+    # number of materialized data objects cached per container. Larger than the typical length of an inner sweep axis.
+    cache_size = 256
+    # numpy defers the arithmetic with a data_container to the operators of this class.
+    __array_ufunc__ = None
+
+    def __init__(self, terms, shape, operations=None):
+        self.terms = list(terms)
+        self.shape = tuple(shape)
+        self.operations = list(operations) if operations is not None else []
+        self._clear_cache()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def flat(self):
+        return _flat_accessor(self)
+
+    @property
+    def total_time(self):
+        return self._get_attribute_array('total_time')
+
+    @property
+    def start_time(self):
+        return self._get_attribute_array('start_time')
+
+    def add_operation(self, func, args, kwargs):
+        '''
+        Records a call of a segment method (see loop_controller).
+        Args:
+            func (function) : undecorated segment method. It operates on data_tmp of the segment.
+            args (list) : arguments without the segment. loop_obj arguments are evaluated per index.
+            kwargs (dict) : keyword arguments
+        '''
+        self.operations.append(_loop_call(func, args, kwargs))
+        self._clear_cache()
+
+    def broadcast_to(self, shape):
+        cpy = copy.copy(self)
+        cpy.shape = tuple(shape)
+        return cpy
+
+    def map(self, func, *args):
+        '''
+        Lazy conversion of the data objects.
+        Args:
+            func (Callable) : function (data object, *args) that returns a new data object. It must not modify its input.
+        '''
+        return self._with_operation(_map(func, args))
+
+    def get_item(self, index):
+        '''
+        Returns the (cached) data object of the index. The object must not be modified.
+        '''
+        key = self._get_key(index)
+        with self._lock:
+            item = self._cache.get(key)
+            if item is not None:
+                self._cache.move_to_end(key)
+                return item
+
+        item = self._evaluate(index)
+
+        with self._lock:
+            self._cache[key] = item
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return item
+
+    def materialize(self):
+        '''
+        Returns a data_container with a new data object for every index.
+        '''
+        data = data_container(shape=self.shape)
+        for index in np.ndindex(*self.shape):
+            data[index] = copy.copy(self._evaluate(index))
+        return data
+
+    def __getitem__(self, key):
+        '''
+        Returns a copy of the data object of an index, or a data_container with copies of the selected data objects.
+        Only the selected indices are materialized.
+        '''
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) == self.ndim and all(isinstance(i, (int, np.integer)) for i in key):
+            index = []
+            for i, n in zip(key, self.shape):
+                if not -n <= i < n:
+                    raise IndexError(f'index {i} is out of bounds for axis with size {n}')
+                index.append(int(i) % n)
+            return copy.copy(self.get_item(tuple(index)))
+
+        flat_indices = np.arange(self.size).reshape(self.shape)[key]
+        data = data_container(shape=flat_indices.shape)
+        for index, flat_index in np.ndenumerate(flat_indices):
+            data[index] = copy.copy(self._evaluate(np.unravel_index(flat_index, self.shape)))
+        return data
+
+    def __add__(self, other):
+        if isinstance(other, (parametric_data_container, data_container)):
+            shape = np.broadcast_shapes(self.shape, other.shape)
+            terms = self.terms if len(self.operations) == 0 else [copy.copy(self)]
+            return parametric_data_container(terms + [_snapshot(other)], shape)
+        return self._with_operation(_add_constant(other))
+
+    def __radd__(self, other):
+        if isinstance(other, data_container):
+            shape = np.broadcast_shapes(self.shape, other.shape)
+            return parametric_data_container([_snapshot(other), copy.copy(self)], shape)
+        return self.__add__(other)
+
+    def __mul__(self, other):
+        return self._with_operation(_multiply(other))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __copy__(self):
+        cpy = parametric_data_container(self.terms, self.shape, self.operations)
+        # the copy has the same data objects. The cache is shared till one of them is modified.
+        cpy._varying_axes = self._varying_axes
+        cpy._cache = self._cache
+        cpy._attribute_cache = self._attribute_cache
+        cpy._lock = self._lock
+        return cpy
+
+    def __getstate__(self):
+        return {'terms':self.terms, 'shape':self.shape, 'operations':self.operations}
+
+    def __setstate__(self, state):
+        self.__init__(state['terms'], state['shape'], state['operations'])
+
+    def _with_operation(self, operation):
+        if any(op.in_place for op in self.operations):
+            # keep the recorded segment calls in a separate term. Their results are cached and shared.
+            return parametric_data_container([copy.copy(self)], self.shape, [operation])
+        return parametric_data_container(self.terms, self.shape, self.operations + [operation])
+
+    def _evaluate(self, index):
+        element = None
+        for term in self.terms:
+            if isinstance(term, parametric_data_container):
+                term_element = term.get_item(index)
+            else:
+                term_element = term[_get_term_index(term.shape, index)]
+            element = term_element if element is None else element + term_element
+        # the element of a single term is shared with the term. Only copy it before it is modified.
+        owned = len(self.terms) > 1
+        for operation in self.operations:
+            if operation.in_place and not owned:
+                element = copy.copy(element)
+            element = operation(element, index)
+            owned = True
+        return element
+
+    def _get_varying_axes(self):
+        '''
+        loop axes on which the data objects differ.
+        '''
+        if self._varying_axes is None:
+            axes = set()
+            for term in self.terms:
+                if isinstance(term, parametric_data_container):
+                    axes |= term._get_varying_axes()
+                else:
+                    axes |= {len(term.shape) - 1 - i for i, n in enumerate(term.shape) if n > 1}
+            for operation in self.operations:
+                axes |= operation.loop_axes
+            self._varying_axes = axes
+        return self._varying_axes
+
+    def _get_key(self, index):
+        return tuple(index[-1-axis] for axis in sorted(self._get_varying_axes()))
+
+    def _get_attribute_array(self, attribute):
+        # evaluate only the indices that differ and broadcast the result
+        axes = self._get_varying_axes()
+        reduced_shape = tuple(n if self.ndim - 1 - i in axes else 1 for i, n in enumerate(self.shape))
+        values = self._attribute_cache.get((attribute, reduced_shape))
+        if values is None:
+            values = np.empty(reduced_shape)
+            for index in np.ndindex(*reduced_shape):
+                values[index] = getattr(self.get_item(index), attribute)
+            self._attribute_cache[(attribute, reduced_shape)] = values
+        return np.array(np.broadcast_to(values, self.shape))
+
+    def _clear_cache(self):
+        # new objects, because the cache can be shared with copies
+        self._cache = OrderedDict()
+        self._attribute_cache = {}
+        self._varying_axes = None
+        self._lock = threading.Lock()
+
+
+def _snapshot(data):
+    '''
+    copy of a term, so that later modifications of data do not change the sum.
+    A data_container is copied with its data objects, like the result of an eager addition.
+    '''
+    return copy.copy(data)
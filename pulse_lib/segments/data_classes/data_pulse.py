@@ -3,11 +3,13 @@ data class to make pulses.
 """
 import numpy as np
 import copy
+import hashlib
+from dataclasses import dataclass
 
 
 import pulse_lib.segments.utility.segments_c_func as seg_func
 from pulse_lib.segments.utility.segments_c_func import py_calc_value_point_in_between, get_effective_point_number
-from pulse_lib.segments.data_classes.data_generic import parent_data, data_container
+from pulse_lib.segments.data_classes.data_generic import parent_data, data_container, _get_effective_point_numbers
 from pulse_lib.segments.data_classes.data_IQ import envelope_generator
 from pulse_lib.segments.data_classes.data_pulse_core import pulse_data_single_sequence, base_pulse_element
 
@@ -16,15 +18,80 @@ class pulse_data(parent_data):
     """
     class defining base (utility) operations for baseband and microwave pulses.
     """
+    # renderer used for the baseband (piecewise linear) part of the waveform, 'vectorized' or 'loop'.
+    baseband_renderer = 'vectorized'
+    MW_renderer = 'vectorized'
+
     def __init__(self):
         super().__init__()
-        self.baseband_pulse_data = pulse_data_single_sequence()
-        self.MW_pulse_data = list()
+        self._baseband_pulse_data = pulse_data_single_sequence()
+        self._MW_pulse_data = list()
+        # number of repetitions of the baseband pulse data (see repeat).
+        self._repeat_count = 1
 
         self.start_time = 0
         self.MW_end_time = 0
         self.global_phase = 0
 
+    @property
+    def baseband_pulse_data(self):
+        '''
+        breakpoint table of the baseband pulses. A symbolic repetition is materialized.
+        '''
+        self._materialize_repeat()
+        return self._baseband_pulse_data
+
+    @baseband_pulse_data.setter
+    def baseband_pulse_data(self, baseband_pulse_data):
+        self._baseband_pulse_data = baseband_pulse_data
+        self._repeat_count = 1
+
+    @property
+    def MW_pulse_data(self):
+        '''
+        list with the MW pulses. A symbolic repetition is materialized, because MW pulses can be added to the list.
+        '''
+        self._materialize_repeat()
+        return self._MW_pulse_data
+
+    @MW_pulse_data.setter
+    def MW_pulse_data(self, MW_pulse_data):
+        self._materialize_repeat()
+        self._MW_pulse_data = MW_pulse_data
+
+    @property
+    def repeat_count(self):
+        '''
+        number of times the baseband pulse data is repeated symbolically. 1 if there is no symbolic repetition.
+        '''
+        return self._repeat_count
+
+    @classmethod
+    def set_baseband_renderer(cls, renderer):
+        '''
+        Select the renderer for the baseband part of the waveform.
+        Both renderers give bit-identical output.
+
+        Args:
+            renderer (str) : 'vectorized' (default) or 'loop' (one np.linspace per breakpoint).
+        '''
+        if renderer not in ('vectorized', 'loop'):
+            raise ValueError(f"Unknown baseband renderer '{renderer}'. Use 'vectorized' or 'loop'.")
+        cls.baseband_renderer = renderer
+
+    @classmethod
+    def set_MW_renderer(cls, renderer):
+        '''
+        Select the renderer for the MW pulses.
+        Both renderers give bit-identical output.
+
+        Args:
+            renderer (str) : 'vectorized' (default, all pulses in one pass) or 'loop' (one pulse at a time).
+        '''
+        if renderer not in ('vectorized', 'loop'):
+            raise ValueError(f"Unknown MW renderer '{renderer}'. Use 'vectorized' or 'loop'.")
+        cls.MW_renderer = renderer
+
     def add_pulse_data(self, my_input):
         self.baseband_pulse_data.add_pulse(my_input)
 
@@ -47,10 +114,11 @@ class pulse_data(parent_data):
         Returns:
             total_time (float) : total time of the segment.
         '''
-        if self.baseband_pulse_data.total_time < self.MW_end_time:
+        baseband_time = self._baseband_pulse_data.total_time*self._repeat_count
+        if baseband_time < self.MW_end_time:
             return self.MW_end_time
 
-        return self.baseband_pulse_data.total_time
+        return baseband_time
 
     def reset_time(self, time,  extend_only = False):
         '''
@@ -62,8 +130,10 @@ class pulse_data(parent_data):
         if time is None:
             time = self.total_time
 
-        pulse = base_pulse_element(0,time,0,0)
-        self.add_pulse_data(pulse)
+        if self._repeat_count == 1 or time > self.total_time:
+            pulse = base_pulse_element(0,time,0,0)
+            self.add_pulse_data(pulse)
+        # else: a zero pulse within a symbolic repetition does not change the waveform.
 
         if extend_only == False:
             self.start_time = time
@@ -106,7 +176,14 @@ class pulse_data(parent_data):
         repeat n times
         Args
             n (int) : number of times to repeat
+
+        Baseband only data is repeated symbolically: the breakpoints are stored once with a repeat count.
+        The repetition is materialized when the pulse data is accessed via baseband_pulse_data or MW_pulse_data.
         """
+        if len(self._MW_pulse_data) == 0 and self._can_repeat_symbolic():
+            self._repeat_count *= n + 1
+            return
+
         time = self.total_time
         new_MW_pulse_data =  copy.copy(self.MW_pulse_data)
 
@@ -121,6 +198,97 @@ class pulse_data(parent_data):
         self.baseband_pulse_data.repeat(n)
 
 
+    def _can_repeat_symbolic(self):
+        # pulses without stop time (constant offsets) are not shifted by repeat. They are added once per repetition.
+        return all(pulse['stop'] != -1. for pulse in self._baseband_pulse_data.localdata)
+
+    def _materialize_repeat(self):
+        if self._repeat_count > 1:
+            self._baseband_pulse_data.repeat(self._repeat_count - 1)
+            self._repeat_count = 1
+
+    def _get_baseband_table(self):
+        '''
+        breakpoint table (times, voltages, starts) of the baseband pulses, including the repetitions.
+        starts flags the points after the start of a pulse (see _get_point_numbers).
+        A symbolic repetition is materialized in a copy.
+        '''
+        baseband_pulse_data = self._baseband_pulse_data
+        if self._repeat_count > 1:
+            baseband_pulse_data = copy.copy(self._baseband_pulse_data)
+            baseband_pulse_data.repeat(self._repeat_count - 1)
+        times, voltages = baseband_pulse_data.pulse_data
+        return times, voltages, baseband_pulse_data.pulse_starts
+
+    def get_repeat_info(self, pre_delay = 0, sample_rate = 1e9):
+        '''
+        position of the symbolic repetition in the rendered waveform.
+        Args:
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            (start_pt, unit_npt, count) : first sample, number of samples and number of repetitions of the
+                repeated waveform, or None if the repetition is not symbolic or not a whole number of samples.
+        '''
+        if self._repeat_count == 1:
+            return None
+        sample_time_step = 1/(sample_rate*1e-9)
+        unit_time = self._baseband_pulse_data.total_time
+        unit_npt = get_effective_point_number(unit_time, sample_time_step)
+        if unit_npt == 0 or abs(unit_npt*sample_time_step - unit_time) > 1e-6*sample_time_step:
+            return None
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+        return pre_delay_pt, unit_npt, self._repeat_count
+
+    def get_constant_intervals(self, pre_delay = 0, sample_rate = 1e9, min_npt = 1):
+        '''
+        sample ranges of the rendered waveform where the voltage is constant, derived from the breakpoint table.
+        The ranges exclude the samples at the breakpoints and the MW pulses.
+        Args:
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            sample_rate (double) : rate at which the AWG will be run
+            min_npt (int) : minimum number of samples of a range
+        Returns:
+            intervals (list<tuple<int, int>>) : (start_pt, stop_pt) of the constant ranges. stop_pt is exclusive.
+        '''
+        sample_time_step = 1/(sample_rate*1e-9)
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+
+        times, voltages, starts = self._get_baseband_table()
+        times = np.asarray(times)
+        voltages = np.asarray(voltages)
+        constant = (voltages[1:] == voltages[:-1]) & (times[1:] > times[:-1])
+
+        intervals = []
+        i = 0
+        n = len(constant)
+        while i < n:
+            if not constant[i]:
+                i += 1
+                continue
+            # merge consecutive constant spans with the same voltage
+            j = i
+            while j + 1 < n and constant[j + 1] and voltages[j + 2] == voltages[i]:
+                j += 1
+            start_pt = get_effective_point_number(times[i], sample_time_step) + 1 + pre_delay_pt
+            stop_pt = get_effective_point_number(times[j + 1], sample_time_step) + pre_delay_pt
+            intervals.append((start_pt, stop_pt))
+            i = j + 1
+
+        for IQ_data_single_object in self._MW_pulse_data:
+            mw_start = get_effective_point_number(IQ_data_single_object.start, sample_time_step) - 1 + pre_delay_pt
+            mw_stop = get_effective_point_number(IQ_data_single_object.stop, sample_time_step) + 2 + pre_delay_pt
+            clipped = []
+            for start_pt, stop_pt in intervals:
+                if stop_pt <= mw_start or start_pt >= mw_stop:
+                    clipped.append((start_pt, stop_pt))
+                    continue
+                clipped.append((start_pt, mw_start))
+                clipped.append((mw_stop, stop_pt))
+            intervals = clipped
+
+        return [(start_pt, stop_pt) for start_pt, stop_pt in intervals if stop_pt - start_pt >= min_npt]
+
     def slice_time(self, start, end):
         '''
         slice the pulse
@@ -135,27 +303,158 @@ class pulse_data(parent_data):
     Properties of the waveform
     '''
 
-    def get_vmax(self,sample_rate = 1e9):
+    def get_fingerprint(self):
         '''
-        calculate the maximum voltage in the current segment_single.
+        Hashable fingerprint of the breakpoint table, total time and MW pulses.
+        MW pulses with user envelope functions can only be fingerprinted if the functions are decorated with @cacheable_envelope.
 
-        If sine waves included, will take the maximum of the total render. If not, it just takes the max of the pulse data.
+        Returns:
+            fingerprint (tuple or None) : digest of the numeric data and the envelope specs, None if not possible.
         '''
-        if len(self.MW_pulse_data) == 0:
-            return self.baseband_pulse_data.v_max
-        else:
-            return np.max(self.render(sample_rate=1e9))
+        times, voltages = self._baseband_pulse_data.pulse_data
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.asarray(times).tobytes())
+        digest.update(np.asarray(voltages).tobytes())
+        digest.update(np.double(self.total_time).tobytes())
+        digest.update(np.int64(self._repeat_count).tobytes())
+
+        envelope_specs = []
+        for IQ_data_single_object in self._MW_pulse_data:
+            digest.update(np.array([IQ_data_single_object.start, IQ_data_single_object.stop, IQ_data_single_object.amplitude,
+                                    IQ_data_single_object.frequency, IQ_data_single_object.start_phase]).tobytes())
+            envelope = IQ_data_single_object.envelope
+            if envelope is None:
+                # rendered as envelope_generator()
+                envelope_specs.append((None, None))
+                continue
+            for envelope_function in [envelope.AM_envelope_function, envelope.PM_envelope_function]:
+                if (callable(envelope_function)
+                        and not getattr(envelope_function, '_cacheable_envelope', False)):
+                    return None
+            envelope_specs.append((envelope.AM_envelope_function, envelope.PM_envelope_function))
+
+        fingerprint = (digest.digest(), tuple(envelope_specs))
+        try:
+            hash(fingerprint)
+        except TypeError:
+            return None
+        return fingerprint
 
-    def get_vmin(self,sample_rate = 1e9):
+
+    def get_vmax(self,sample_rate = 1e9, limit = None, tolerance = 0.0):
         '''
         calculate the maximum voltage in the current segment_single.
 
-        If sine waves included, will take the minimum of the total render. If not, it just takes the min of the pulse data.
+        If sine waves included and limit is None, it takes the maximum of the total render.
+        If limit is given, it returns an upper bound: the maximum of the pulse data plus the largest sum of the peak
+        amplitudes of MW pulses that overlap in time. The waveform is only rendered to get the exact maximum if the bound
+        comes within tolerance of limit. If there are no sine waves, it just takes the max of the pulse data.
+        Args:
+            sample_rate (double) : rate at which the AWG will be run
+            limit (double) : maximum output voltage of the channel. If None, the exact maximum is returned.
+            tolerance (double) : margin in mV below limit where the exact maximum is rendered.
+        '''
+        v_max = self._baseband_pulse_data.v_max
+        if len(self._MW_pulse_data) == 0:
+            return v_max
+
+        if limit is not None:
+            bound = v_max + self._get_MW_peak_amplitude(sample_rate)
+            if bound < limit - tolerance:
+                return bound
+        # render without waveform cache. The cache is used by the upload, possibly with another sample rate.
+        return np.max(self._render(sample_rate))
+
+    def get_vmin(self,sample_rate = 1e9, limit = None, tolerance = 0.0):
+        '''
+        calculate the minimum voltage in the current segment_single.
+
+        If sine waves included and limit is None, it takes the minimum of the total render.
+        If limit is given, it returns a lower bound: the minimum of the pulse data minus the largest sum of the peak
+        amplitudes of MW pulses that overlap in time. The waveform is only rendered to get the exact minimum if the bound
+        comes within tolerance of limit. If there are no sine waves, it just takes the min of the pulse data.
+        Args:
+            sample_rate (double) : rate at which the AWG will be run
+            limit (double) : minimum output voltage of the channel. If None, the exact minimum is returned.
+            tolerance (double) : margin in mV above limit where the exact minimum is rendered.
         '''
-        if len(self.MW_pulse_data) == 0:
-            return self.baseband_pulse_data.v_min
-        else:
-            return np.min(self.render(sample_rate=1e9))
+        v_min = self._baseband_pulse_data.v_min
+        if len(self._MW_pulse_data) == 0:
+            return v_min
+
+        if limit is not None:
+            bound = v_min - self._get_MW_peak_amplitude(sample_rate)
+            if bound > limit + tolerance:
+                return bound
+        return np.min(self._render(sample_rate))
+
+    def _get_MW_peak_amplitude(self, sample_rate):
+        '''
+        largest sum of the peak amplitudes of the MW pulses that overlap in time. Only the AM envelopes are evaluated.
+        Args:
+            sample_rate (double) : rate at which the AWG will be run (Hz)
+        '''
+        sample_rate = sample_rate*1e-9
+        sample_time_step = 1/sample_rate
+        # (sample, change of the summed peak amplitude). Pulses occupy the same samples as in _get_MW_samples.
+        events = []
+        for IQ_data_single_object in self._MW_pulse_data:
+            envelope = IQ_data_single_object.envelope
+            if envelope is None:
+                envelope = envelope_generator()
+            AM_envelope = envelope.get_AM_envelope(IQ_data_single_object.stop - IQ_data_single_object.start, sample_rate)
+            peak = abs(IQ_data_single_object.amplitude)*np.max(np.abs(AM_envelope))
+            start_pt = get_effective_point_number(IQ_data_single_object.start, sample_time_step)
+            events.append((start_pt, peak))
+            events.append((start_pt + len(AM_envelope), -peak))
+
+        # at equal sample numbers the end of a pulse is handled before the start of the next one.
+        max_peak = 0
+        peak = 0
+        for _, change in sorted(events):
+            peak += change
+            max_peak = max(max_peak, peak)
+        return max_peak
+
+    @classmethod
+    def get_extrema_batch(cls, data_objects, sample_rate = 1e9, limits = (None, None), tolerance = 0.0):
+        '''
+        minimum and maximum voltage of a list of pulse_data objects (see get_vmin and get_vmax).
+        The extrema of the breakpoint tables are computed in a single vectorized pass.
+        Args:
+            data_objects (list<pulse_data>) : pulse data, e.g. all entries of a data_container.
+            sample_rate (double) : rate at which the AWG will be run
+            limits (tuple<double>) : (minimum, maximum) output voltage of the channel.
+                If a limit is None, the exact extrema of the waveforms with MW pulses are rendered.
+            tolerance (double) : margin in mV on the limits where the exact extrema are rendered.
+        Returns:
+            v_min, v_max (np.ndarray[ndim=1, dtype=double]) : (bounds of the) extrema of every waveform.
+        '''
+        n = len(data_objects)
+        if n == 0:
+            return np.zeros([0]), np.zeros([0])
+
+        voltage_tables = [np.asarray(data._baseband_pulse_data.pulse_data[1]) for data in data_objects]
+        first = np.concatenate(([0], np.cumsum([len(voltages) for voltages in voltage_tables])[:-1]))
+        voltages = np.concatenate(voltage_tables)
+        v_min = np.minimum.reduceat(voltages, first)
+        v_max = np.maximum.reduceat(voltages, first)
+
+        limit_min, limit_max = limits
+        for i, data in enumerate(data_objects):
+            if len(data._MW_pulse_data) == 0:
+                continue
+            peak = data._get_MW_peak_amplitude(sample_rate)
+            v_min[i] -= peak
+            v_max[i] += peak
+            if (limit_min is None or limit_max is None
+                    or v_min[i] <= limit_min + tolerance or v_max[i] >= limit_max - tolerance):
+                waveform = data._render(sample_rate)
+                v_min[i] = np.min(waveform)
+                v_max[i] = np.max(waveform)
+
+        return v_min, v_max
 
     def integrate_waveform(self, pre_delay, post_delay, sample_rate):
         '''
@@ -167,31 +466,102 @@ class pulse_data(parent_data):
         Returns:
             integrate (double) : the integrated value of the waveform (unit is mV/sec).
         '''
-        integrated_value = 0
-        # if len(self.sin_data) == 0 and pre_delay <= 0 and post_delay>= 0:
-
         if sample_rate is None:
             sample_rate = self.waveform_cache['sample_rate']*1e-9
         sample_time_step = 1/sample_rate
         pre_delay_eff = get_effective_point_number(pre_delay, sample_time_step)*sample_time_step
         post_delay_eff = get_effective_point_number(post_delay, sample_time_step)*sample_time_step
 
-        # TODO upgrade to new format -- put in the cython part for better performance..
-        times, voltages = self.baseband_pulse_data.pulse_data
-        baseband_pulse = np.empty([len(times), 2])
-        baseband_pulse[:,0] = times
-        baseband_pulse[:,1] = voltages
+        times, voltages = self._baseband_pulse_data.pulse_data
+        times = np.asarray(times)
+        voltages = np.asarray(voltages)
+
+        integrated_value = 0.0
+        if len(times) > 0:
+            # trapezoid rule is exact for the piecewise linear baseband signal.
+            integrated_value = np.dot(voltages[1:] + voltages[:-1], np.diff(times))/2*self._repeat_count
+            integrated_value += pre_delay_eff*voltages[0] + post_delay_eff*voltages[-1]
+            integrated_value *= 1e-9
 
-        for i in range(len(baseband_pulse)-1):
-            integrated_value += (baseband_pulse[i,1] + baseband_pulse[i+1,1])/2*(baseband_pulse[i+1,0] - baseband_pulse[i,0])
-        integrated_value += pre_delay_eff*baseband_pulse[0,1] +post_delay_eff*baseband_pulse[-1,1]
-        integrated_value *= 1e-9
-        # else: # slow way ...
-        #     wvf = self.render(pre_delay, post_delay, sample_rate, clear_cache_on_exit = False)
-        #     integrated_value = np.trapz(wvf, dx=1/sample_rate)
+        if len(self._MW_pulse_data) > 0:
+            integrated_value += self._integrate_MW(sample_rate, pre_delay)
 
         return integrated_value
 
+    def _integrate_MW(self, sample_rate, pre_delay):
+        '''
+        integral of the MW pulses as they are rendered by _render_MW (sum of the samples times the sample period).
+        Rectangular envelopes are integrated in closed form, other envelopes are only evaluated on the samples of the pulse.
+        Args:
+            sample_rate (double) : rate at which the AWG will be run (Hz)
+            pre_delay (double) : amount of time to put before the sequence (<= 0), determines the phase of the samples.
+        Returns:
+            integrate (double) : the integrated value of the MW pulses (unit is mV/sec).
+        '''
+        # express in Gs/s
+        sample_rate = sample_rate*1e-9
+        sample_time_step = 1/sample_rate
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+
+        integrated_value = 0
+        for IQ_data_single_object in self._MW_pulse_data:
+            envelope = IQ_data_single_object.envelope
+            if envelope is None or (envelope.AM_envelope_function is None and envelope.PM_envelope_function is None):
+                integrated_value += _sum_rectangular_MW_samples(IQ_data_single_object, sample_rate, pre_delay_pt)
+            else:
+                start_pt, samples = self._get_MW_samples(IQ_data_single_object, sample_rate, pre_delay_pt)
+                integrated_value += np.sum(samples)
+
+        return integrated_value*sample_time_step*1e-9
+
+    @classmethod
+    def integrate_batch(cls, data_objects, pre_delay, post_delay, sample_rate):
+        '''
+        integrals of a list of pulse_data objects, computed in a single vectorized pass over the breakpoint tables.
+        Args:
+            data_objects (list<pulse_data>) : pulse data to integrate, e.g. all entries of a data_container.
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            post_delay (double or np.ndarray) : amount of time to put after the sequence, can be set per object.
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            integrals (np.ndarray[ndim=1, dtype=double]) : integrated value of every waveform (unit is mV/sec).
+        '''
+        n = len(data_objects)
+        if n == 0:
+            return np.zeros([0])
+
+        sample_time_step = 1/sample_rate
+        pre_delay_eff = get_effective_point_number(pre_delay, sample_time_step)*sample_time_step
+        post_delay_eff = _get_effective_point_numbers(np.broadcast_to(np.asarray(post_delay, dtype=np.double), (n,)),
+                                                      sample_time_step)*sample_time_step
+
+        tables = [data._get_baseband_table() for data in data_objects]
+        lengths = np.array([len(table[0]) for table in tables], dtype=np.int64)
+        times = np.concatenate([np.asarray(table[0]) for table in tables])
+        voltages = np.concatenate([np.asarray(table[1]) for table in tables])
+
+        integrals = np.zeros(n)
+        # objects with an empty breakpoint table (e.g. after slice_time) have no baseband contribution.
+        non_empty = np.flatnonzero(lengths > 0)
+        if len(non_empty) > 0:
+            first = np.cumsum(lengths)[non_empty] - lengths[non_empty]
+            last = first + lengths[non_empty] - 1
+
+            # trapezoids over all consecutive breakpoints; the ones that cross two tables are masked out.
+            trapezoids = (voltages[1:] + voltages[:-1])*np.diff(times)/2
+            trapezoids[last[:-1]] = 0
+            segment_id = np.repeat(np.arange(n), lengths)[:-1]
+            integrals += np.bincount(segment_id, weights=trapezoids, minlength=n)
+
+            integrals[non_empty] += pre_delay_eff*voltages[first] + post_delay_eff[non_empty]*voltages[last]
+            integrals *= 1e-9
+
+        for i, data in enumerate(data_objects):
+            if len(data._MW_pulse_data) > 0:
+                integrals[i] += data._integrate_MW(sample_rate, pre_delay)
+
+        return integrals
+
     '''
     details of pulse data methods
     '''
@@ -282,8 +652,9 @@ class pulse_data(parent_data):
     '''
     def __copy__(self):
         my_copy = pulse_data()
-        my_copy.baseband_pulse_data = copy.copy(self.baseband_pulse_data)
-        my_copy.MW_pulse_data = copy.deepcopy(self.MW_pulse_data)
+        my_copy._baseband_pulse_data = copy.copy(self._baseband_pulse_data)
+        my_copy._MW_pulse_data = copy.deepcopy(self._MW_pulse_data)
+        my_copy._repeat_count = self._repeat_count
         my_copy.start_time = copy.copy(self.start_time)
         my_copy.software_marker_data = copy.copy(self.software_marker_data)
         return my_copy
@@ -324,10 +695,11 @@ class pulse_data(parent_data):
         if type(other) is pulse_data:
             raise NotImplemented
         elif type(other) == int or type(other) == float or type(other) == np.float64:
-            new_data.baseband_pulse_data = copy.copy(self.baseband_pulse_data)
-            new_data.baseband_pulse_data *= other
+            new_data._baseband_pulse_data = copy.copy(self._baseband_pulse_data)
+            new_data._baseband_pulse_data *= other
+            new_data._repeat_count = self._repeat_count
 
-            for IQ_data_single_object in self.MW_pulse_data:
+            for IQ_data_single_object in self._MW_pulse_data:
                 IQ_data_single_object_cpy = copy.copy(IQ_data_single_object)
                 IQ_data_single_object_cpy.amplitude *=other
                 new_data.MW_pulse_data.append(IQ_data_single_object_cpy)
@@ -355,69 +727,492 @@ class pulse_data(parent_data):
         post_delay_pt = get_effective_point_number(post_delay, sample_time_step)
 
         my_sequence = np.zeros([int(t_tot_pt + pre_delay_pt + post_delay_pt)])
+        if self._repeat_count > 1 and self._render_repeated(my_sequence, sample_rate*1e9, pre_delay):
+            return my_sequence
+
         # start rendering pulse data
+        times, voltages, starts = self._get_baseband_table()
+        if self.baseband_renderer == 'loop':
+            _render_baseband_loop(my_sequence, np.asarray(times), np.asarray(voltages), t_tot, sample_time_step, pre_delay_pt,
+                                  np.asarray(starts))
+        else:
+            _render_baseband_vectorized(my_sequence, np.asarray(times), np.asarray(voltages), t_tot, sample_time_step, pre_delay_pt,
+                                        np.asarray(starts))
 
-        # TODO upgrade to new format -- put in the cython part for better performance..
-        times, voltages = self.baseband_pulse_data.pulse_data
-        baseband_pulse = np.empty([len(times), 2])
-        baseband_pulse[:,0] = times
-        baseband_pulse[:,1] = voltages
-
-        for i in range(0,len(baseband_pulse)-1):
-            t0_pt = get_effective_point_number(baseband_pulse[i,0], sample_time_step)
-            t1_pt = get_effective_point_number(baseband_pulse[i+1,0], sample_time_step) + 1
-            t0 = t0_pt*sample_time_step
-            t1 = t1_pt*sample_time_step
-            if t0 > t_tot:
-                continue
-            elif t1 > t_tot + sample_time_step:
-                if baseband_pulse[i,1] == baseband_pulse[i+1,1]:
-                    my_sequence[t0_pt + pre_delay_pt: t_tot_pt + pre_delay_pt] = baseband_pulse[i,1]
-                else:
-                    val = py_calc_value_point_in_between(baseband_pulse[i,:], baseband_pulse[i+1,:], t_tot)
-                    my_sequence[t0_pt + pre_delay_pt: t_tot_pt + pre_delay_pt] = np.linspace(
-                        baseband_pulse[i,1],
-                        val, t_tot_pt-t0_pt)
-            else:
-                if baseband_pulse[i,1] == baseband_pulse[i+1,1]:
-                    my_sequence[t0_pt + pre_delay_pt: t1_pt + pre_delay_pt] = baseband_pulse[i,1]
-                else:
-                    my_sequence[t0_pt + pre_delay_pt: t1_pt + pre_delay_pt] = np.linspace(baseband_pulse[i,1], baseband_pulse[i+1,1], t1_pt-t0_pt)
-        # top off the sequence -- default behavior, extend the last value
-        if len(baseband_pulse) > 1:
-            pt = get_effective_point_number(baseband_pulse[i+1,0], sample_time_step)
-            my_sequence[pt + pre_delay_pt:] = baseband_pulse[i+1,1]
-
-        # render MW pulses.
-        for IQ_data_single_object in self.MW_pulse_data:
-            # start stop time of MW pulse
+        self._render_MW(my_sequence, sample_rate, pre_delay_pt)
+
+        return my_sequence
+
+    def _render_repeated(self, my_sequence, sample_rate, pre_delay):
+        '''
+        render the symbolically repeated baseband data by rendering it once and copying it.
+        Returns:
+            rendered (bool) : False if the repetition is not a whole number of samples.
+        '''
+        repeat_info = self.get_repeat_info(pre_delay, sample_rate)
+        if repeat_info is None:
+            return False
+        start_pt, unit_npt, count = repeat_info
+
+        sample_time_step = 1/(sample_rate*1e-9)
+        unit = np.zeros(unit_npt + 1)
+        times, voltages = self._baseband_pulse_data.pulse_data
+        starts = np.asarray(self._baseband_pulse_data.pulse_starts)
+        unit_time = self._baseband_pulse_data.total_time
+        if self.baseband_renderer == 'loop':
+            _render_baseband_loop(unit, np.asarray(times), np.asarray(voltages), unit_time, sample_time_step, 0, starts)
+        else:
+            _render_baseband_vectorized(unit, np.asarray(times), np.asarray(voltages), unit_time, sample_time_step, 0, starts)
+
+        stop_pt = start_pt + count*unit_npt
+        my_sequence[start_pt:stop_pt].reshape(count, unit_npt)[:] = unit[:unit_npt]
+        my_sequence[stop_pt:] = unit[unit_npt]
+        return True
+
+    def _render_MW(self, my_sequence, sample_rate, pre_delay_pt):
+        '''
+        add the MW pulses to a rendered waveform.
+        Args:
+            my_sequence (np.ndarray[ndim=1, dtype=double]) : rendered baseband waveform
+            sample_rate (double) : sample rate in GS/s
+            pre_delay_pt (int) : number of points before the start of the segment
+        '''
+        if self.MW_renderer == 'loop':
+            for IQ_data_single_object in self._MW_pulse_data:
+                start_pt, samples = self._get_MW_samples(IQ_data_single_object, sample_rate, pre_delay_pt)
+                # add up the sin pulse.
+                my_sequence[start_pt:start_pt + len(samples)] += samples
+        else:
+            _render_MW_vectorized(my_sequence, self._MW_pulse_data, sample_rate, pre_delay_pt)
 
-            start_pulse = IQ_data_single_object.start
-            stop_pulse = IQ_data_single_object.stop
+    @staticmethod
+    def _get_MW_samples(IQ_data_single_object, sample_rate, pre_delay_pt):
+        '''
+        render a single MW pulse.
+        Args:
+            IQ_data_single_object (IQ_data_single) : MW pulse
+            sample_rate (double) : sample rate in GS/s
+            pre_delay_pt (int) : number of points before the start of the segment
+        Returns:
+            start_pt (int) : index of the first sample in the rendered waveform
+            samples (np.ndarray[ndim=1, dtype=double]) : samples of the MW pulse
+        '''
+        sample_time_step = 1/sample_rate
 
-            # max amp, freq and phase.
-            amp  =  IQ_data_single_object.amplitude
-            freq =  IQ_data_single_object.frequency
-            phase = IQ_data_single_object.start_phase
+        # start stop time of MW pulse
+        start_pulse = IQ_data_single_object.start
+        stop_pulse = IQ_data_single_object.stop
 
-            # evelope data of the pulse
-            if IQ_data_single_object.envelope is None:
-                IQ_data_single_object.envelope = envelope_generator()
+        # max amp, freq and phase.
+        amp  =  IQ_data_single_object.amplitude
+        freq =  IQ_data_single_object.frequency
+        phase = IQ_data_single_object.start_phase
 
-            amp_envelope = IQ_data_single_object.envelope.get_AM_envelope((stop_pulse - start_pulse), sample_rate)
-            phase_envelope = IQ_data_single_object.envelope.get_PM_envelope((stop_pulse - start_pulse), sample_rate)
+        # evelope data of the pulse
+        if IQ_data_single_object.envelope is None:
+            IQ_data_single_object.envelope = envelope_generator()
 
-            #self.baseband_pulse_data[-1,0] convert to point numbers
-            n_pt = len(amp_envelope)
-            start_pt = get_effective_point_number(start_pulse, sample_time_step) + pre_delay_pt
-            stop_pt = start_pt + n_pt
+        amp_envelope = IQ_data_single_object.envelope.get_AM_envelope((stop_pulse - start_pulse), sample_rate)
+        phase_envelope = IQ_data_single_object.envelope.get_PM_envelope((stop_pulse - start_pulse), sample_rate)
 
-            # add up the sin pulse.
-            my_sequence[start_pt:stop_pt] += amp*amp_envelope*np.sin(
-                    np.linspace(start_pt/sample_rate*1e-9, (start_pt+n_pt)/sample_rate*1e-9, n_pt)*freq*2*np.pi
-                    + phase + phase_envelope )
+        #self.baseband_pulse_data[-1,0] convert to point numbers
+        n_pt = len(amp_envelope)
+        start_pt = get_effective_point_number(start_pulse, sample_time_step) + pre_delay_pt
 
-        return my_sequence
+        samples = amp*amp_envelope*np.sin(
+                np.linspace(start_pt/sample_rate*1e-9, (start_pt+n_pt)/sample_rate*1e-9, n_pt)*freq*2*np.pi
+                + phase + phase_envelope )
+
+        return start_pt, samples
+
+    @classmethod
+    def render_batch(cls, data_objects, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        renders a list of pulse_data objects in a single vectorized pass.
+        The waveforms are not cached.
+        Args:
+            data_objects (list<pulse_data>) : pulse data to render, e.g. all entries of a data_container.
+            pre_delay (double) : amount of time to put before the sequence (<= 0)
+            post_delay (double) : amount of time to put after the sequence (>= 0)
+            sample_rate (double) : rate at which the AWG will be run
+        Returns:
+            waveforms (np.ndarray[ndim=2, dtype=double]) : (len(data_objects), n_samples) array.
+                Waveforms shorter than the longest one are padded with their last baseband voltage.
+        '''
+        # express in Gs/s
+        sample_rate = sample_rate*1e-9
+        sample_time_step = 1/sample_rate
+
+        pre_delay_pt = - get_effective_point_number(pre_delay, sample_time_step)
+        post_delay_pt = get_effective_point_number(post_delay, sample_time_step)
+
+        spans_list = []
+        n_samples = []
+        for data in data_objects:
+            t_tot = data.total_time
+            t_tot_pt = get_effective_point_number(t_tot, sample_time_step) + 1
+            n_samples.append(int(t_tot_pt + pre_delay_pt + post_delay_pt))
+            times, voltages, starts = data._get_baseband_table()
+            spans_list.append(_get_baseband_spans(np.asarray(times), np.asarray(voltages), t_tot, sample_time_step,
+                                                  np.asarray(starts)))
+
+        n_samples = np.array(n_samples, dtype=np.int64)
+        n_max = int(n_samples.max()) if len(n_samples) > 0 else 0
+        waveforms = np.zeros((len(data_objects), n_max))
+        row_offsets = np.arange(len(data_objects))*n_max
+
+        _fill_baseband_spans(waveforms.reshape(-1), spans_list, row_offsets + pre_delay_pt,
+                             row_offsets, row_offsets + n_samples)
+
+        # top off the sequences and pad to the common length -- extend the last value
+        for i, spans in enumerate(spans_list):
+            if spans is not None:
+                waveforms[i, min(spans.top_off_pt + pre_delay_pt, n_samples[i]):] = spans.top_off_voltage
+
+        for i, data in enumerate(data_objects):
+            if len(data._MW_pulse_data) > 0:
+                data._render_MW(waveforms[i,:n_samples[i]], sample_rate, pre_delay_pt)
+
+        return waveforms
+
+
+def _get_point_numbers(times, sample_time_step, starts=None):
+    '''
+    sample numbers of the breakpoints. A breakpoint on exactly half a sample is rounded to the next sample
+    if it follows the start of a pulse, and to the previous sample otherwise (like get_effective_point_number).
+    Args:
+        times (np.ndarray[ndim=1, dtype=double]) : times of the breakpoints (ns)
+        sample_time_step (double) : time step of the AWG (ns)
+        starts (np.ndarray[ndim=1, dtype=uint8]) : flags of the breakpoints after a pulse start, or None.
+    Returns:
+        n_pt (np.ndarray[ndim=1, dtype=int64]) : sample numbers of the breakpoints.
+    '''
+    n_pt, mod = np.divmod(times, sample_time_step)
+    n_pt += mod > sample_time_step/2
+    if starts is not None:
+        n_pt += (mod == sample_time_step/2) & (starts != 0)
+    return n_pt.astype(np.int64)
+
+def _render_baseband_loop(my_sequence, times, voltages, t_tot, sample_time_step, pre_delay_pt, starts=None):
+    '''
+    render the breakpoint table in my_sequence, one np.linspace per pair of breakpoints.
+    Args:
+        my_sequence (np.ndarray[ndim=1, dtype=double]) : output, zero initialized.
+        times (np.ndarray[ndim=1, dtype=double]) : times of the breakpoints (ns)
+        voltages (np.ndarray[ndim=1, dtype=double]) : voltages of the breakpoints
+        t_tot (double) : total time of the segment
+        sample_time_step (double) : time step of the AWG (ns)
+        pre_delay_pt (int) : number of points before the start of the segment
+        starts (np.ndarray[ndim=1, dtype=uint8]) : flags of the breakpoints after a pulse start (see _get_point_numbers)
+    '''
+    baseband_pulse = np.empty([len(times), 2])
+    baseband_pulse[:,0] = times
+    baseband_pulse[:,1] = voltages
+    pts = _get_point_numbers(times, sample_time_step, starts)
+    t_tot_pt = get_effective_point_number(t_tot, sample_time_step) + 1
+
+    for i in range(0,len(baseband_pulse)-1):
+        t0_pt = pts[i]
+        t1_pt = pts[i+1] + 1
+        t0 = t0_pt*sample_time_step
+        t1 = t1_pt*sample_time_step
+        if t0 > t_tot:
+            continue
+        elif t1 > t_tot + sample_time_step:
+            if baseband_pulse[i,1] == baseband_pulse[i+1,1]:
+                my_sequence[t0_pt + pre_delay_pt: t_tot_pt + pre_delay_pt] = baseband_pulse[i,1]
+            elif baseband_pulse[i,0] == baseband_pulse[i+1,0]:
+                # discontinuity
+                my_sequence[t0_pt + pre_delay_pt: t_tot_pt + pre_delay_pt] = np.linspace(
+                    baseband_pulse[i,1],
+                    baseband_pulse[i+1,1], t_tot_pt-t0_pt)
+            else:
+                val = py_calc_value_point_in_between(baseband_pulse[i,:], baseband_pulse[i+1,:], t_tot)
+                my_sequence[t0_pt + pre_delay_pt: t_tot_pt + pre_delay_pt] = np.linspace(
+                    baseband_pulse[i,1],
+                    val, t_tot_pt-t0_pt)
+        else:
+            if baseband_pulse[i,1] == baseband_pulse[i+1,1]:
+                my_sequence[t0_pt + pre_delay_pt: t1_pt + pre_delay_pt] = baseband_pulse[i,1]
+            else:
+                my_sequence[t0_pt + pre_delay_pt: t1_pt + pre_delay_pt] = np.linspace(baseband_pulse[i,1], baseband_pulse[i+1,1], t1_pt-t0_pt)
+    # top off the sequence -- default behavior, extend the last value
+    if len(baseband_pulse) > 1:
+        my_sequence[pts[-1] + pre_delay_pt:] = baseband_pulse[-1,1]
+
+def _sum_rectangular_MW_samples(IQ_data_single_object, sample_rate, pre_delay_pt):
+    '''
+    closed form of np.sum(samples) for the samples of a MW pulse with a rectangular envelope (see pulse_data._get_MW_samples).
+    Args:
+        IQ_data_single_object (IQ_data_single) : MW pulse without AM and PM envelope
+        sample_rate (double) : sample rate in GS/s
+        pre_delay_pt (int) : number of points before the start of the segment
+    Returns:
+        sum (double) : sum of the samples
+    '''
+    sample_time_step = 1/sample_rate
+    n_points = (IQ_data_single_object.stop - IQ_data_single_object.start)*sample_rate
+    if n_points < 1:
+        return 0
+    n_pt = int(n_points)
+
+    start_pt = get_effective_point_number(IQ_data_single_object.start, sample_time_step) + pre_delay_pt
+    omega = IQ_data_single_object.frequency*2*np.pi
+    phase_0 = start_pt/sample_rate*1e-9*omega + IQ_data_single_object.start_phase
+    if n_pt == 1:
+        return IQ_data_single_object.amplitude*np.sin(phase_0)
+
+    # phase step of the samples, same as the step of the np.linspace in _get_MW_samples.
+    d_phase = n_pt/(n_pt - 1)/sample_rate*1e-9*omega
+    # sum_k sin(phase_0 + k*d_phase), k = 0 .. n_pt-1
+    denominator = np.sin(d_phase/2)
+    if abs(denominator) < 1e-12:
+        # phase step is a multiple of 2 pi.
+        total = n_pt*np.sin(phase_0)
+    else:
+        total = np.sin(phase_0 + (n_pt - 1)*d_phase/2)*np.sin(n_pt*d_phase/2)/denominator
+
+    return IQ_data_single_object.amplitude*total
+
+def _render_MW_vectorized(my_sequence, MW_pulse_data, sample_rate, pre_delay_pt):
+    '''
+    add all MW pulses to a rendered waveform in one pass.
+    The samples of all pulses are concatenated and evaluated at once. Envelopes are rendered once
+    for all pulses with the same envelope functions and duration.
+    Gives bit-identical output to pulse_data._get_MW_samples applied pulse by pulse.
+    Args:
+        my_sequence (np.ndarray[ndim=1, dtype=double]) : rendered baseband waveform
+        MW_pulse_data (list<IQ_data_single>) : MW pulses
+        sample_rate (double) : sample rate in GS/s
+        pre_delay_pt (int) : number of points before the start of the segment
+    '''
+    n_pulses = len(MW_pulse_data)
+    if n_pulses == 0:
+        return
+
+    sample_time_step = 1/sample_rate
+
+    start = np.empty(n_pulses)
+    n_pt = np.zeros(n_pulses, dtype=np.int64)
+    amp = np.empty(n_pulses)
+    freq = np.empty(n_pulses)
+    phase = np.empty(n_pulses)
+    shaped = []
+    envelopes = dict()
+
+    for i, IQ_data_single_object in enumerate(MW_pulse_data):
+        start[i] = IQ_data_single_object.start
+        amp[i] = IQ_data_single_object.amplitude
+        freq[i] = IQ_data_single_object.frequency
+        phase[i] = IQ_data_single_object.start_phase
+
+        if IQ_data_single_object.envelope is None:
+            IQ_data_single_object.envelope = envelope_generator()
+        envelope = IQ_data_single_object.envelope
+
+        delta_t = IQ_data_single_object.stop - IQ_data_single_object.start
+        if delta_t*sample_rate < 1:
+            # envelope is [0]: nothing to add.
+            continue
+
+        if envelope.AM_envelope_function is None and envelope.PM_envelope_function is None:
+            n_pt[i] = int(delta_t*sample_rate)
+            continue
+
+        key = (envelope.AM_envelope_function, envelope.PM_envelope_function, delta_t)
+        try:
+            envelope_data = envelopes.get(key)
+        except TypeError:
+            # unhashable envelope specification
+            key = None
+            envelope_data = None
+        if envelope_data is None:
+            envelope_data = (envelope.get_AM_envelope(delta_t, sample_rate), envelope.get_PM_envelope(delta_t, sample_rate))
+            if key is not None:
+                envelopes[key] = envelope_data
+
+        n_pt[i] = len(envelope_data[0])
+        shaped.append((i, envelope_data))
+
+    n_total = int(np.sum(n_pt))
+    if n_total == 0:
+        return
+
+    start_pt = _get_effective_point_numbers(start, sample_time_step) + pre_delay_pt
+    first = np.cumsum(n_pt) - n_pt
+    k = np.arange(n_total) - np.repeat(first, n_pt)
+
+    # time axis with the same arithmetic as np.linspace(t_start, t_stop, n_pt) per pulse
+    t_start = start_pt/sample_rate*1e-9
+    t_stop = (start_pt + n_pt)/sample_rate*1e-9
+    step = np.zeros(n_pulses)
+    multi = n_pt > 1
+    step[multi] = (t_stop[multi] - t_start[multi])/(n_pt[multi] - 1)
+    t = k*np.repeat(step, n_pt) + np.repeat(t_start, n_pt)
+    last = first[multi] + n_pt[multi] - 1
+    t[last] = t_stop[multi]
+
+    amp_envelope = np.repeat(amp, n_pt)
+    argument = t*np.repeat(freq, n_pt)*2*np.pi + np.repeat(phase, n_pt)
+    for i, (AM_envelope, PM_envelope) in shaped:
+        pulse_slice = slice(first[i], first[i] + n_pt[i])
+        amp_envelope[pulse_slice] = amp[i]*AM_envelope
+        argument[pulse_slice] += PM_envelope
+
+    samples = amp_envelope*np.sin(argument)
+    index = np.repeat(start_pt, n_pt) + k
+
+    # add up the sin pulses. Overlapping pulses need unbuffered addition.
+    non_empty = n_pt > 0
+    order = np.argsort(start_pt[non_empty], kind='stable')
+    sorted_start = start_pt[non_empty][order]
+    sorted_stop = sorted_start + n_pt[non_empty][order]
+    if np.all(sorted_start[1:] >= sorted_stop[:-1]):
+        my_sequence[index] += samples
+    else:
+        np.add.at(my_sequence, index, samples)
+
+@dataclass
+class _baseband_spans:
+    '''
+    spans of a breakpoint table that are written to the output, in sample points relative to the start of the segment.
+    '''
+    t0_pt : np.ndarray
+    n_write : np.ndarray
+    n_pt : np.ndarray
+    v_start : np.ndarray
+    v_stop : np.ndarray
+    constant : np.ndarray
+    top_off_pt : int
+    top_off_voltage : float
+
+def _get_baseband_spans(times, voltages, t_tot, sample_time_step, starts=None):
+    '''
+    convert the breakpoint table to the spans that are written by the loop renderer.
+    A span is written from t0_pt up to the start of the next span (n_write points), the
+    value of the points is the one of np.linspace(v_start, v_stop, n_pt).
+    Args:
+        times (np.ndarray[ndim=1, dtype=double]) : times of the breakpoints (ns)
+        voltages (np.ndarray[ndim=1, dtype=double]) : voltages of the breakpoints
+        t_tot (double) : total time of the segment
+        sample_time_step (double) : time step of the AWG (ns)
+        starts (np.ndarray[ndim=1, dtype=uint8]) : flags of the breakpoints after a pulse start (see _get_point_numbers)
+    Returns:
+        spans (_baseband_spans) : spans to render, None if there is nothing to render.
+    '''
+    if len(times) < 2:
+        return None
+
+    t_tot_pt = get_effective_point_number(t_tot, sample_time_step) + 1
+    pts = _get_point_numbers(times, sample_time_step, starts)
+
+    v_start = voltages[:-1]
+    v_stop = voltages[1:].copy()
+    t0_pt = pts[:-1]
+    end_pt = pts[1:] + 1
+
+    # spans starting after the end of the segment are skipped, the span crossing the end is truncated.
+    valid = t0_pt*sample_time_step <= t_tot
+    truncated = valid & (end_pt*sample_time_step > t_tot + sample_time_step)
+    if np.any(truncated):
+        i_trunc = np.flatnonzero(truncated)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (voltages[i_trunc+1] - voltages[i_trunc])/(times[i_trunc+1] - times[i_trunc])
+            offset = voltages[i_trunc] - slope*times[i_trunc]
+            v_stop[i_trunc] = slope*t_tot + offset
+        end_pt[i_trunc] = t_tot_pt
+    n_pt = end_pt - t0_pt
+    valid &= n_pt > 0
+
+    t0_pt = t0_pt[valid]
+    n_pt = n_pt[valid]
+    # the last point of a span is overwritten by the next span.
+    n_write = n_pt.copy()
+    n_write[:-1] = np.minimum(n_pt[:-1], t0_pt[1:] - t0_pt[:-1])
+
+    return _baseband_spans(t0_pt, n_write, n_pt, v_start[valid], v_stop[valid],
+                           (v_start == voltages[1:])[valid], pts[-1], voltages[-1])
+
+def _fill_baseband_spans(output, spans_list, offsets, lower_limits, upper_limits):
+    '''
+    write the spans in the (flat) output array in a single pass.
+    Args:
+        output (np.ndarray[ndim=1, dtype=double]) : output array
+        spans_list (list<_baseband_spans>) : spans to write
+        offsets (list<int>) : position in output of point 0 of the spans
+        lower_limits, upper_limits (list<int>) : range in output where the spans may be written
+    '''
+    items = [(spans, offset, lower, upper) for spans, offset, lower, upper
+             in zip(spans_list, offsets, lower_limits, upper_limits) if spans is not None]
+    if len(items) == 0:
+        return
+
+    pos0 = np.concatenate([spans.t0_pt + offset for spans, offset, _, _ in items])
+    start = np.maximum(pos0, np.concatenate([np.full(len(spans.t0_pt), lower) for spans, _, lower, _ in items]))
+    stop = np.minimum(pos0 + np.concatenate([spans.n_write for spans, _, _, _ in items]),
+                      np.concatenate([np.full(len(spans.t0_pt), upper) for spans, _, _, upper in items]))
+    n_sample = stop - start
+    written = n_sample > 0
+    if not np.any(written):
+        return
+
+    pos0 = pos0[written]
+    start = start[written]
+    stop = stop[written]
+    n_sample = n_sample[written]
+    n_pt = np.concatenate([spans.n_pt for spans, _, _, _ in items])[written]
+    v_start = np.concatenate([spans.v_start for spans, _, _, _ in items])[written]
+    v_stop = np.concatenate([spans.v_stop for spans, _, _, _ in items])[written]
+    constant = np.concatenate([spans.constant for spans, _, _, _ in items])[written]
+
+    # constant value for every sample, ramps are overwritten below.
+    values = np.repeat(v_start, n_sample)
+    first_sample = np.cumsum(n_sample) - n_sample
+
+    ramps = np.flatnonzero(~constant)
+    if len(ramps) > 0:
+        # same arithmetic as np.linspace(v_start, v_stop, n_pt)
+        n_ramp = n_sample[ramps]
+        span = np.repeat(ramps, n_ramp)
+        local = np.arange(len(span)) - np.repeat(np.cumsum(n_ramp) - n_ramp, n_ramp)
+        k_int = local + (start - pos0)[span]
+
+        div = n_pt[ramps] - 1
+        delta = v_stop[ramps] - v_start[ramps]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(div > 0, delta/np.maximum(div, 1), delta)
+        step_zero = (step == 0) & (delta != 0)
+        ramp_index = np.repeat(np.arange(len(ramps)), n_ramp)
+        k = k_int.astype(np.double)
+        ramp_values = k*step[ramp_index]
+        if np.any(step_zero):
+            zero_span = step_zero[ramp_index]
+            ramp_values[zero_span] = k[zero_span]/div[ramp_index][zero_span]*delta[ramp_index][zero_span]
+        ramp_values += v_start[span]
+        is_last = (k_int == div[ramp_index]) & (div[ramp_index] > 0)
+        ramp_values[is_last] = v_stop[span][is_last]
+
+        values[first_sample[span] + local] = ramp_values
+
+    # copy contiguous runs of samples to the output
+    run_starts = np.concatenate([[0], np.flatnonzero(start[1:] != stop[:-1]) + 1])
+    run_stops = np.concatenate([run_starts[1:], [len(start)]])
+    for first, last in zip(run_starts, run_stops):
+        output[start[first]:stop[last-1]] = values[first_sample[first]:first_sample[last-1] + n_sample[last-1]]
+
+def _render_baseband_vectorized(my_sequence, times, voltages, t_tot, sample_time_step, pre_delay_pt, starts=None):
+    '''
+    render the breakpoint table in my_sequence without a python loop over the breakpoints.
+    Gives bit-identical output to _render_baseband_loop (same arguments).
+    '''
+    spans = _get_baseband_spans(times, voltages, t_tot, sample_time_step, starts)
+    if spans is None:
+        return
+
+    _fill_baseband_spans(my_sequence, [spans], [pre_delay_pt], [0], [len(my_sequence)])
+
+    # top off the sequence -- default behavior, extend the last value
+    my_sequence[spans.top_off_pt + pre_delay_pt:] = spans.top_off_voltage
 
 if __name__ == '__main__':
     """
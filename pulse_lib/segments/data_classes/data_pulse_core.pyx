@@ -26,6 +26,15 @@ cdef struct s_pulse_info:
 
 ctypedef s_pulse_info pulse_info
 
+cdef inline (double, double) _neumaier_add(double total, double compensation, double value) nogil:
+	# returns (compensation, total) after adding value to total.
+	cdef double new_total = total + value
+	if abs(total) >= abs(value):
+		compensation += (total - new_total) + value
+	else:
+		compensation += (value - new_total) + total
+	return compensation, new_total
+
 cdef class base_pulse_element:
 	cdef pulse_info my_pulse_info
 
@@ -44,6 +53,7 @@ cdef class pulse_data_single_sequence():
 	cdef public bool re_render
 	cdef double[:] voltage_data
 	cdef double[:] time_data
+	cdef np.uint8_t[:] start_data
 	def __init__(self):
 		# add empty pulse around 0 to make sure the pulse starts at that point
 		pulse_init = base_pulse_element(0,3e-6,0,0)
@@ -53,6 +63,7 @@ cdef class pulse_data_single_sequence():
 		self.re_render = True
 		self.voltage_data = np.empty([0])
 		self.time_data = np.empty([0])
+		self.start_data = np.empty([0], dtype = np.uint8)
 
 	def add_pulse(self, base_pulse_element pulse):
 		self.localdata.push_back(pulse.my_pulse_info)
@@ -134,6 +145,8 @@ cdef class pulse_data_single_sequence():
 		for i in other.localdata:
 			self.localdata.push_back(i)
 
+		self.re_render = True
+
 	def __sub__(self, other):
 		return self + other*(-1)
 
@@ -158,6 +171,117 @@ cdef class pulse_data_single_sequence():
 		self.re_render = True
 
 	cdef __local_render(self):
+		# sweep-line over the start and stop events of the pulses.
+		# Every pulse adds a jump (v_start) and a slope at its start and removes them at its stop.
+		# The events are sorted once (timsort, close to O(n) as pulses are mostly added in time order),
+		# and accumulated in a single pass. A discontinuity is stored as points with the same time:
+		# the value before the event, the value after the stops and the value after the starts.
+		# The points after a start are flagged. The renderer rounds them to the next sample when they are
+		# on exactly half a sample, other points to the previous sample (see pulse_data.pulse_starts).
+		cdef int n_pulses = self.localdata.size()
+		cdef double[:] event_time = np.empty([2*n_pulses], dtype = np.double)
+		cdef double[:] event_jump = np.zeros([2*n_pulses], dtype = np.double)
+		cdef double[:] event_slope = np.zeros([2*n_pulses], dtype = np.double)
+		cdef int[:] event_count = np.zeros([2*n_pulses], dtype = np.intc)
+
+		cdef double start, stop, slope
+		cdef int j = 0
+		cdef vector[pulse_info].iterator it_localdata = self.localdata.begin()
+
+		while(it_localdata != self.localdata.end()):
+			start = dereference(it_localdata).start
+			stop = dereference(it_localdata).stop
+			if stop == -1.:
+				stop = self._total_time
+
+			event_time[j] = start
+			event_time[j + 1] = stop
+			if stop > start:
+				slope = (dereference(it_localdata).v_stop - dereference(it_localdata).v_start)/(stop - start)
+				event_jump[j] = dereference(it_localdata).v_start
+				event_slope[j] = slope
+				event_count[j] = 1
+				event_jump[j + 1] = -dereference(it_localdata).v_stop
+				event_slope[j + 1] = -slope
+				event_count[j + 1] = -1
+			j += 2
+
+			postincrement(it_localdata)
+
+		cdef long[:] order = np.argsort(event_time, kind='stable').astype(np.int_)
+
+		cdef double[:] new_data_time = np.empty([3*len(order)])
+		cdef double[:] new_data_voltage = np.empty([3*len(order)])
+		cdef np.uint8_t[:] new_data_start = np.zeros([3*len(order)], dtype = np.uint8)
+
+		# running voltage and slope with (Neumaier) compensated summation of the jumps.
+		cdef double voltage = 0, voltage_comp = 0
+		cdef double total_slope = 0, slope_comp = 0
+		cdef double t, t_prev = 0, v_left, v_new
+		cdef int n_active = 0
+		cdef int n_starts
+		cdef int n_events = len(order)
+		cdef int i = 0
+		cdef int i_group
+		cdef int k = 0
+		cdef int e
+
+		# the accumulation releases the GIL, so channels can be rendered in parallel threads.
+		with nogil:
+			while i < n_events:
+				t = event_time[order[i]]
+				if k > 0:
+					voltage_comp, voltage = _neumaier_add(voltage, voltage_comp, (total_slope + slope_comp)*(t - t_prev))
+				v_left = voltage + voltage_comp
+				new_data_time[k] = t
+				new_data_voltage[k] = v_left
+				k += 1
+
+				# the stops of the events at t, then the starts.
+				i_group = i
+				while i < n_events and event_time[order[i]] == t:
+					e = order[i]
+					if event_count[e] != 1:
+						voltage_comp, voltage = _neumaier_add(voltage, voltage_comp, event_jump[e])
+						slope_comp, total_slope = _neumaier_add(total_slope, slope_comp, event_slope[e])
+						n_active += event_count[e]
+					i += 1
+
+				if n_active == 0:
+					# no drift when no pulse is active.
+					voltage = 0
+					voltage_comp = 0
+					total_slope = 0
+					slope_comp = 0
+
+				v_new = voltage + voltage_comp
+				if v_new != v_left:
+					new_data_time[k] = t
+					new_data_voltage[k] = v_new
+					k += 1
+
+				n_starts = 0
+				while i_group < i:
+					e = order[i_group]
+					if event_count[e] == 1:
+						voltage_comp, voltage = _neumaier_add(voltage, voltage_comp, event_jump[e])
+						slope_comp, total_slope = _neumaier_add(total_slope, slope_comp, event_slope[e])
+						n_starts += 1
+					i_group += 1
+				if n_starts > 0:
+					# also stored without jump: a ramp that starts on half a sample starts at the next sample.
+					n_active += n_starts
+					new_data_time[k] = t
+					new_data_voltage[k] = voltage + voltage_comp
+					new_data_start[k] = 1
+					k += 1
+				t_prev = t
+
+		self.re_render = False
+		return new_data_time[:k], new_data_voltage[:k], new_data_start[:k]
+
+	cdef __local_render_unique(self):
+		# previous kernel, kept as reference for the benchmark of __local_render.
 		# relatively opimised..
 		# tested for 1M pulses elements
 		# --> ~156ms needed for full rendering on I9 cpu (note using c++ vectors gave significant speedup compared to python list due to typed index in localdata[i].start_index..)
@@ -260,6 +384,7 @@ cdef class pulse_data_single_sequence():
 		cdef vector[pulse_info].iterator it_localdata
 
 		self._total_time = 0.
+		self.re_render = True
 		it_localdata = self.localdata.begin()
 		while(it_localdata != self.localdata.end()):
 			
@@ -284,12 +409,40 @@ cdef class pulse_data_single_sequence():
 
 		return cpy
 
+	def __reduce__(self):
+		# compact pickle: the pulses as (n, 4) array with start, stop, v_start, v_stop.
+		cdef double[:,:] pulses = np.empty([self.localdata.size(), 4], dtype = np.double)
+		cdef int j
+		for j in range(self.localdata.size()):
+			pulses[j, 0] = self.localdata[j].start
+			pulses[j, 1] = self.localdata[j].stop
+			pulses[j, 2] = self.localdata[j].v_start
+			pulses[j, 3] = self.localdata[j].v_stop
+		return (_restore_pulse_data_single_sequence, (self._total_time, np.asarray(pulses)))
+
 	@property
 	def pulse_data(self):
 		if self.re_render == True:
-			self.time_data, self.voltage_data = self.__local_render()
+			self.time_data, self.voltage_data, self.start_data = self.__local_render()
 		return (self.time_data, self.voltage_data)
 
+	@property
+	def pulse_starts(self):
+		'''
+		flags of the points of pulse_data that follow the start of a pulse (np.uint8, 1 at a start).
+		A start on exactly half a sample is rendered from the next sample, other points from the previous one.
+		'''
+		if self.re_render == True:
+			self.time_data, self.voltage_data, self.start_data = self.__local_render()
+		return self.start_data
+
+	@property
+	def pulse_data_unique(self):
+		'''
+		breakpoint table rendered with the previous kernel (np.unique on shifted time stamps). Only used for benchmarking.
+		'''
+		return self.__local_render_unique()
+
 	@property
 	def total_time(self):
 		return self._total_time
@@ -300,4 +453,23 @@ cdef class pulse_data_single_sequence():
 
 	@property
 	def v_min(self):
-		return np.min(self.pulse_data[1])
\ No newline at end of file
+		return np.min(self.pulse_data[1])
+
+
+def _restore_pulse_data_single_sequence(double total_time, double[:,:] pulses):
+	cdef pulse_data_single_sequence data = pulse_data_single_sequence()
+	cdef pulse_info info
+	cdef int j
+	data.localdata.clear()
+	data.localdata.reserve(pulses.shape[0])
+	info.index_start = 0
+	info.index_stop = 0
+	for j in range(pulses.shape[0]):
+		info.start = pulses[j, 0]
+		info.stop = pulses[j, 1]
+		info.v_start = pulses[j, 2]
+		info.v_stop = pulses[j, 3]
+		data.localdata.push_back(info)
+	data._total_time = total_time
+	data.re_render = True
+	return data
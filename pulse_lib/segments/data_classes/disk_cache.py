@@ -0,0 +1,193 @@
+"""
+Persistent cache of rendered waveforms on local disk.
+
+The waveforms are stored as .npy files and are memory-mapped when read, so a warm start does not copy
+or re-render the waveforms. The cache is keyed by the content fingerprint of the data objects
+(see parent_data.get_fingerprint) and is therefore only used with the 'content' waveform cache key.
+"""
+import os
+import logging
+import hashlib
+import tempfile
+import numpy as np
+
+# Version of the rendering. Increment when a change of the render kernels changes the rendered waveforms.
+# Files of other versions are ignored and removed on cleanup.
+RENDER_VERSION = 1
+
+
+class DiskCache:
+    '''
+    Size bounded cache of waveforms in .npy files.
+
+    Files are written to a temporary file in the cache directory and atomically renamed,
+    so concurrent writers (e.g. multiple kernels) never expose partially written files.
+    The least recently used files are removed when the total size exceeds max_bytes.
+
+    Args:
+        directory (str) : directory of the cache. Files are stored in a sub-directory per render version.
+        max_bytes (int) : maximum total size of the files in the cache. None for no limit.
+    '''
+    def __init__(self, directory, max_bytes=None):
+        self.root = directory
+        self.directory = os.path.join(directory, f'v{RENDER_VERSION}')
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # estimate of the size of the cache. Recalculated when the cache is checked for eviction.
+        self.nbytes = sum(size for _, _, size in self._list_files())
+
+
+    def get(self, key):
+        '''
+        Returns the memory-mapped waveform, or None if the waveform is not in the cache.
+        Args:
+            key (str) : key of the waveform (see make_key)
+        '''
+        path = self._get_path(key)
+        try:
+            waveform = np.load(path, mmap_mode='r')
+            # update access time for least recently used eviction
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return waveform
+
+
+    def put(self, key, waveform):
+        '''
+        Stores the waveform in the cache.
+        Args:
+            key (str) : key of the waveform (see make_key)
+            waveform (np.ndarray) : waveform to store
+        '''
+        path = self._get_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                np.save(fp, waveform)
+            # atomic replace. The last writer wins, but all writers store the same waveform.
+            os.replace(tmp_path, path)
+        except OSError:
+            logging.warning(f'Failed to write waveform to disk cache {self.directory}', exc_info=True)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self.writes += 1
+        self.nbytes += waveform.nbytes
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self._check_size()
+
+
+    def clear(self):
+        '''
+        Removes all files from the cache, including files of other render versions.
+        '''
+        for version_dir in os.listdir(self.root):
+            path = os.path.join(self.root, version_dir)
+            if not version_dir.startswith('v') or not os.path.isdir(path):
+                continue
+            for filename in os.listdir(path):
+                if filename.endswith('.npy') or filename.endswith('.tmp'):
+                    self._remove(os.path.join(path, filename))
+        self.nbytes = 0
+
+
+    def get_stats(self):
+        '''
+        Returns:
+            stats (dict): hits, misses, writes, evictions, bytes on disk and the limit of the cache.
+        '''
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'writes' : self.writes,
+            'evictions' : self.evictions,
+            'bytes' : self.nbytes,
+            'max_bytes' : self.max_bytes,
+            }
+
+
+    @staticmethod
+    def make_key(fingerprint, sample_rate, pre_delay, post_delay):
+        '''
+        Key of a waveform that is stable between processes.
+        Args:
+            fingerprint (tuple) : fingerprint of the data object (see parent_data.get_fingerprint)
+            sample_rate (double) : sample rate of the waveform
+            pre_delay (double) : pre delay of the rendered waveform
+            post_delay (double) : post delay of the rendered waveform
+        Returns:
+            key (str) : hex digest
+        '''
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(_stable_repr((fingerprint, sample_rate, pre_delay, post_delay)).encode())
+        return digest.hexdigest()
+
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+
+    def _list_files(self):
+        files = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # removed by another process
+                        continue
+                    files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+
+    def _check_size(self):
+        files = self._list_files()
+        self.nbytes = sum(size for _, _, size in files)
+        if self.nbytes <= self.max_bytes:
+            return
+        # evict till 90% of max size to avoid a directory scan on every write.
+        target = 0.9 * self.max_bytes
+        files.sort(key=lambda f:f[1])
+        for path, _, size in files:
+            if self.nbytes <= target:
+                break
+            if self._remove(path):
+                self.evictions += 1
+            self.nbytes -= size
+
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # removed by another process or still mapped (Windows)
+            return False
+
+
+def _stable_repr(obj):
+    '''
+    Representation of keys that does not depend on the memory address of objects.
+    '''
+    if isinstance(obj, bytes):
+        return obj.hex()
+    if isinstance(obj, (tuple, list)):
+        return '(' + ','.join(_stable_repr(item) for item in obj) + ')'
+    if callable(obj):
+        return f'{getattr(obj, "__module__", "")}.{getattr(obj, "__qualname__", repr(obj))}'
+    if isinstance(obj, float):
+        return obj.hex()
+    return repr(obj)
@@ -1,41 +1,80 @@
+import sys
+import threading
+
 
 class LruCache:
     '''
     Least recently used cache.
+    The cache is bounded by the number of entries and/or by the total size of the cached data.
+    The cache can be used from multiple threads.
 
     Args:
-        max_size (int): maximum number of entries to cache.
+        max_size (int): maximum number of entries to cache. None for no limit.
+        max_bytes (int): maximum total size in bytes of the cached data. None for no limit.
     '''
-    def __init__(self, max_size):
+    def __init__(self, max_size, max_bytes=None):
         self.max_size = max_size
+        self.max_bytes = max_bytes
         # all items in the cache
         self.items = dict()
         # linked list with least recently used entry at the first position.
         self.first = None
         self.last = None
 
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
 
     def __getitem__(self, key):
         '''
         Returns the cached item, or an empty cache entry when the item is not yet cached.
         '''
-        if key in self.items:
-            entry = self.items[key]
-            # remove from linked list
-            prev = entry.prev
-            nxt = entry.nxt
-            self._link(prev, nxt)
-            # add to entry end
-            self._append(entry)
-        else:
-            entry = _LruEntry(key)
-            self.items[key] = entry
-            self._append(entry)
-            self._check_size()
+        with self._lock:
+            if key in self.items:
+                entry = self.items[key]
+                if entry.data is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                # remove from linked list
+                prev = entry.prev
+                nxt = entry.nxt
+                self._link(prev, nxt)
+                # add to entry end
+                self._append(entry)
+            else:
+                self.misses += 1
+                entry = _LruEntry(key, self)
+                self.items[key] = entry
+                self._append(entry)
+                self._check_size()
 
         return entry
 
 
+    def __contains__(self, key):
+        return key in self.items
+
+
+    def get_stats(self):
+        '''
+        Returns:
+            stats (dict): hits, misses, evictions, number of entries, bytes resident and the limits of the cache.
+        '''
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'evictions' : self.evictions,
+            'entries' : len(self.items),
+            'bytes' : self.nbytes,
+            'max_size' : self.max_size,
+            'max_bytes' : self.max_bytes,
+            }
+
+
     def _link(self, prev, nxt):
         if prev is None:
             self.first = nxt
@@ -54,21 +93,69 @@ class LruCache:
         self.last = entry
 
 
+    def _update_size(self, entry, nbytes):
+        with self._lock:
+            if entry.key not in self.items or self.items[entry.key] is not entry:
+                # entry has already been evicted
+                return
+
+            self.nbytes += nbytes - entry.nbytes
+            entry.nbytes = nbytes
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                # data does not fit in the cache. Do not evict other entries for it.
+                self._remove(entry)
+                return
+            self._check_size()
+
+
+    def _remove(self, entry):
+        self.items.pop(entry.key)
+        self._link(entry.prev, entry.nxt)
+        self.nbytes -= entry.nbytes
+        entry.nbytes = 0
+        self.evictions += 1
+
+
     def _check_size(self):
-        if len(self.items) <= self.max_size:
-            return
-        # remove first entry
-        first = self.first
-        self.items.pop(first.key)
-        self._link(None, first.nxt)
+        while self.first is not None and (
+                (self.max_size is not None and len(self.items) > self.max_size)
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            # remove first entry
+            self._remove(self.first)
 
 
 class _LruEntry:
     '''
     Entry in last recently used cache.
     '''
-    def __init__(self, key):
+    def __init__(self, key, cache):
         self.prev = None
         self.nxt = None
         self.key = key
-        self.data = None
+        self.nbytes = 0
+        self._cache = cache
+        self._data = None
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._cache._update_size(self, _get_size(value))
+
+
+def _get_size(data):
+    '''
+    Returns size in bytes of the data of an entry: the sum of the numpy arrays in the data.
+    '''
+    if data is None:
+        return 0
+    if hasattr(data, 'nbytes'):
+        return data.nbytes
+    if isinstance(data, dict):
+        return sum(_get_size(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return sum(_get_size(value) for value in data)
+    return sys.getsizeof(data)
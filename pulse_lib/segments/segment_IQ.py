@@ -26,6 +26,7 @@ from pulse_lib.segments.data_classes.data_pulse import pulse_data
 from pulse_lib.segments.data_classes.data_IQ import envelope_generator, IQ_data_single, make_chirp
 from pulse_lib.segments.data_classes.data_markers import marker_data
 from pulse_lib.segments.data_classes.data_generic import data_container
+from pulse_lib.segments.data_classes.data_parametric import parametric_data_container
 
 
 
@@ -34,6 +35,8 @@ class segment_IQ(segment_base):
     Standard single segment for IQ purposes
     todo --> add global phase and time shift in the data class instead of this one (cleaner and more generic).
     """
+    _supports_parametric_loops = True
+
     def __init__(self, name, HVI_variable_data = None,):
         '''
         Args: 
@@ -113,12 +116,13 @@ class segment_IQ(segment_base):
         if image == '-':
             phase_shift += np.pi
 
+        if isinstance(self.data, parametric_data_container):
+            return self.data.map(_get_IQ_data, phase_shift, LO)
+
         local_data = copy.copy(self.data).flatten()
         # downconvert the sigal saved in the data object, so later on, in the real MW source, it can be upconverted again.
         for i in range(len(local_data)):
-            local_data[i] = copy.copy(self.data.flat[i])
-            local_data[i].shift_MW_phases(phase_shift)
-            local_data[i].shift_MW_frequency(LO)
+            local_data[i] = _get_IQ_data(self.data.flat[i], phase_shift, LO)
         
         local_data = local_data.reshape(self.data.shape)
 
@@ -128,6 +132,9 @@ class segment_IQ(segment_base):
         '''
         generate markers for the PM of the IQ modulation
         '''
+        if isinstance(self.data, parametric_data_container):
+            return self.data.map(_get_marker_data, pre_delay, post_delay)
+
         my_marker_data = update_dimension(data_container(marker_data()), self.shape)
         my_marker_data = my_marker_data.flatten()
         
@@ -144,6 +151,19 @@ class segment_IQ(segment_base):
 
 
 
+def _get_IQ_data(data, phase_shift, LO):
+    IQ_data = copy.copy(data)
+    IQ_data.shift_MW_phases(phase_shift)
+    IQ_data.shift_MW_frequency(LO)
+    return IQ_data
+
+def _get_marker_data(data, pre_delay, post_delay):
+    my_marker_data = marker_data()
+    for MW_pulse_info in data.MW_pulse_data:
+        my_marker_data.add_marker(MW_pulse_info.start - pre_delay, MW_pulse_info.stop + post_delay)
+    return my_marker_data
+
+
 if __name__ == '__main__':
     import matplotlib.pyplot as plt
 
@@ -7,6 +7,7 @@ from dataclasses import dataclass
 
 from pulse_lib.segments.utility.data_handling_functions import loop_controller, get_union_of_shapes, update_dimension, find_common_dimension
 from pulse_lib.segments.data_classes.data_generic import data_container
+from pulse_lib.segments.data_classes.data_parametric import parametric_data_container
 from pulse_lib.segments.utility.looping import loop_obj
 from pulse_lib.segments.utility.setpoint_mgr import setpoint_mgr
 from functools import wraps
@@ -41,6 +42,10 @@ class segment_base():
 
     For an example, look in the data classes files.
     '''
+    # record calls with loop arguments instead of copying the data for every sweep index (see set_parametric_loops)
+    parametric_loops = False
+    _supports_parametric_loops = False
+
     def __init__(self, name, data_object, HVI_variable_data = None ,segment_type = 'render'):
         '''
         Args:
@@ -73,6 +78,19 @@ class segment_base():
         # setpoints of the loops (with labels and units)
         self._setpoints = setpoint_mgr()
 
+    @staticmethod
+    def set_parametric_loops(enable):
+        '''
+        Store swept pulses parametrically. The pulses are stored once with their loop arguments and the data
+        of a sweep index is only materialized when it is rendered (see parametric_data_container).
+        Memory and construction time then scale with the number of pulses instead of pulses times sweep size.
+        Only pulse and IQ segments are stored parametrically. Segments made before the change are not affected.
+
+        Args:
+            enable (bool) : store swept pulses parametrically
+        '''
+        segment_base.parametric_loops = enable
+
     def _copy(self, cpy):
         cpy.type = copy.copy(self.type)
         cpy.data = copy.copy(self.data)
@@ -141,7 +159,7 @@ class segment_base():
             new_shape = get_union_of_shapes(shape1, shape2)
             other.data = update_dimension(other.data, new_shape)
             new_segment.data= update_dimension(new_segment.data, new_shape)
-            new_segment.data += other.data
+            new_segment.data = new_segment.data + other.data
 
         elif type(other) == int or type(other) == float:
             new_segment.data += other
@@ -193,8 +211,11 @@ class segment_base():
         A time reset will be done after the other segment is added.
         TODO: transfer of units
         '''
+        other_data = other.data
+        if isinstance(other_data, parametric_data_container):
+            other_data = other_data.materialize()
         other_loopobj = loop_obj()
-        other_loopobj.add_data(other.data, axis=list(range(other.data.ndim -1,-1,-1)))
+        other_loopobj.add_data(other_data, axis=list(range(other_data.ndim -1,-1,-1)))
         self._setpoints += other._setpoints
         self.__append(other_loopobj, time)
 
@@ -304,7 +325,7 @@ class segment_base():
         else:
             return self.pulse_data_all.start_time
 
-    def get_segment(self, index, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+    def get_segment(self, index, pre_delay = 0, post_delay = 0, sample_rate=1e9, out=None):
         '''
         get the numpy output of as segment
 
@@ -313,22 +334,160 @@ class segment_base():
             pre_delay (int) : number of points to push before the sequence
             post_delay (int) : number of points to push after the sequence.
             sample_rate (float) : #/s (number of samples per second)
+            out (np.ndarray) : optional array to copy the waveform in (length as returned by get_segment_npt)
 
         Returns:
             A numpy array that contains the points for each ns
             points is the expected lenght.
         '''
-        wvf = self._generate_segment(index, pre_delay, post_delay, sample_rate)
+        wvf = self._generate_segment(index, pre_delay, post_delay, sample_rate, out)
         return wvf
 
+    def get_segment_npt(self, index, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        get the number of samples of the numpy output of a segment, without rendering it.
+
+        Args:
+            index of segment (list) : which segment (e.g. [0] if dimension is 1 or [2,5,10] if dimension is 3)
+            pre_delay (int) : number of points to push before the sequence
+            post_delay (int) : number of points to push after the sequence.
+            sample_rate (float) : #/s (number of samples per second)
+
+        Returns:
+            n_pt (int) : number of samples returned by get_segment
+        '''
+        flat_index = np.ravel_multi_index(tuple(index), self.pulse_data_all.shape)
+        return self.pulse_data_all.flat[flat_index].get_waveform_npt(pre_delay, post_delay, sample_rate)
+
+    def get_segment_npt_batch(self, indices = None, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        get the number of samples of the numpy output of many indices of the segment at once, without rendering them.
+
+        Args:
+            indices (list<tuple>) : indices of the concerning waveforms. If None, all the indices are used (in C order).
+            pre_delay (int) : number of points to push before the sequence
+            post_delay (int) : number of points to push after the sequence.
+            sample_rate (float) : #/s (number of samples per second)
+
+        Returns:
+            n_pt (np.ndarray[ndim=1, dtype=int64]) : number of samples returned by get_segment for every index
+        '''
+        data = self.pulse_data_all
+        if indices is None:
+            flat_indices = range(data.size)
+        else:
+            flat_indices = [np.ravel_multi_index(tuple(index), data.shape) for index in indices]
+
+        data_objects = [data.flat[i] for i in flat_indices]
+        if len(data_objects) == 0:
+            return np.zeros([0], dtype=np.int64)
+        if not hasattr(data_objects[0], 'get_waveform_npt_batch'):
+            return np.array([data_object.get_waveform_npt(pre_delay, post_delay, sample_rate)
+                             for data_object in data_objects], dtype=np.int64)
+
+        return type(data_objects[0]).get_waveform_npt_batch(data_objects, pre_delay, post_delay, sample_rate)
+
+    def get_repeat_info(self, index, pre_delay = 0, sample_rate=1e9):
+        '''
+        get the position of a symbolic repetition (see pulse_data.repeat) in the numpy output of a segment.
+
+        Args:
+            index of segment (list) : which segment (e.g. [0] if dimension is 1 or [2,5,10] if dimension is 3)
+            pre_delay (int) : number of points to push before the sequence
+            sample_rate (float) : #/s (number of samples per second)
+
+        Returns:
+            (start_pt, unit_npt, count) : first sample, number of samples and number of repetitions of the
+                repeated waveform, or None if there is no symbolic repetition.
+        '''
+        flat_index = np.ravel_multi_index(tuple(index), self.pulse_data_all.shape)
+        data = self.pulse_data_all.flat[flat_index]
+        if not hasattr(data, 'get_repeat_info'):
+            return None
+        return data.get_repeat_info(pre_delay, sample_rate)
+
+    def get_constant_intervals(self, index, pre_delay = 0, sample_rate=1e9, min_npt=1):
+        '''
+        get the sample ranges with a constant voltage in the numpy output of a segment, without rendering it.
+
+        Args:
+            index of segment (list) : which segment (e.g. [0] if dimension is 1 or [2,5,10] if dimension is 3)
+            pre_delay (int) : number of points to push before the sequence
+            sample_rate (float) : #/s (number of samples per second)
+            min_npt (int) : minimum number of samples of a range
+
+        Returns:
+            intervals (list<tuple<int, int>>) : (start_pt, stop_pt) of the constant ranges.
+        '''
+        flat_index = np.ravel_multi_index(tuple(index), self.pulse_data_all.shape)
+        data = self.pulse_data_all.flat[flat_index]
+        if not hasattr(data, 'get_constant_intervals'):
+            return []
+        return data.get_constant_intervals(pre_delay, sample_rate, min_npt)
+
+    def get_segment_batch(self, indices = None, pre_delay = 0, post_delay = 0, sample_rate=1e9):
+        '''
+        get the numpy output of many indices of the segment, rendered in a single vectorized pass.
+
+        Args:
+            indices (list<tuple>) : indices to render (e.g. [(0,0), (0,1)]). If None, all the indices are rendered (in C order).
+            pre_delay (int) : number of points to push before the sequence
+            post_delay (int) : number of points to push after the sequence.
+            sample_rate (float) : #/s (number of samples per second)
+
+        Returns:
+            waveforms (np.ndarray[ndim=2, dtype=double]) : array with shape (n_indices, n_samples).
+                Waveforms shorter than the longest one are padded with their last value.
+        '''
+        data = self.pulse_data_all
+        if indices is None:
+            flat_indices = range(data.size)
+        else:
+            flat_indices = [np.ravel_multi_index(tuple(index), data.shape) for index in indices]
+
+        data_objects = [data.flat[i] for i in flat_indices]
+        if len(data_objects) == 0:
+            return np.zeros((0, 0))
+
+        return type(data_objects[0]).render_batch(data_objects, pre_delay, post_delay, sample_rate)
+
     def v_max(self, index, sample_rate = 1e9):
         index = np.ravel_multi_index(tuple(index), self.pulse_data_all.shape)
 
-        return self.pulse_data_all.flat[index].get_vmax()
+        return self.pulse_data_all.flat[index].get_vmax(sample_rate)
 
     def v_min(self, index, sample_rate = 1e9):
         index = np.ravel_multi_index(tuple(index), self.pulse_data_all.shape)
-        return self.pulse_data_all.flat[index].get_vmin()
+        return self.pulse_data_all.flat[index].get_vmin(sample_rate)
+
+    def v_min_max_batch(self, indices = None, sample_rate = 1e9, limits = (None, None), tolerance = 0.0):
+        '''
+        Get the minimum and maximum voltage of the waveforms of many indices at once (e.g. to check the output range of a full sweep)
+
+        Args:
+            indices (list<tuple>) : indices of the concerning waveforms. If None, all the indices are used (in C order).
+            sample_rate (double) : rate at which to render the pulse
+            limits (tuple<double>) : (minimum, maximum) output voltage of the channel. The waveforms with MW pulses are
+                only rendered if the bounds on the extrema come within tolerance of the limits, or if a limit is None.
+            tolerance (double) : margin in mV on the limits
+
+        Returns:
+            v_min, v_max (np.ndarray[ndim=1, dtype=double]) : (bounds of the) minimum and maximum voltage for every index
+        '''
+        data = self.pulse_data_all
+        if indices is None:
+            flat_indices = range(data.size)
+        else:
+            flat_indices = [np.ravel_multi_index(tuple(index), data.shape) for index in indices]
+
+        data_objects = [data.flat[i] for i in flat_indices]
+        if len(data_objects) == 0:
+            return np.zeros([0]), np.zeros([0])
+        if not hasattr(data_objects[0], 'get_extrema_batch'):
+            return (np.array([data_object.get_vmin(sample_rate) for data_object in data_objects]),
+                    np.array([data_object.get_vmax(sample_rate) for data_object in data_objects]))
+
+        return type(data_objects[0]).get_extrema_batch(data_objects, sample_rate, limits, tolerance)
 
     def integrate(self, index, pre_delay = 0, post_delay = 0, sample_rate = 1e9):
         '''
@@ -349,6 +508,33 @@ class segment_base():
         total_time = pulse_data_all_curr_seg.total_time
         return pulse_data_all_curr_seg.integrate_waveform(pre_delay, total_time + post_delay, sample_rate)
 
+    def integrate_batch(self, indices = None, pre_delay = 0, post_delay = 0, sample_rate = 1e9):
+        '''
+        Get the integral values of the waveforms of many indices at once (e.g. to plan the compensation of a full sweep)
+
+        Args:
+            indices (list<tuple>) : indices of the concerning waveforms. If None, all the indices are integrated (in C order).
+            pre_delay (double) : ns to delay before the pulse
+            post_delay (double) : ns to delay after the pulse
+            sample_rate (double) : rate at which to render the pulse
+
+        Returns:
+            integrals (np.ndarray[ndim=1, dtype=double]) : integral of the pulse for every index
+        '''
+        data = self.pulse_data_all
+        if indices is None:
+            flat_indices = range(data.size)
+        else:
+            flat_indices = [np.ravel_multi_index(tuple(index), data.shape) for index in indices]
+
+        data_objects = [data.flat[i] for i in flat_indices]
+        if len(data_objects) == 0:
+            return np.zeros([0])
+
+        # same post delay as integrate()
+        post_delays = np.array([data_object.total_time for data_object in data_objects]) + post_delay
+        return type(data_objects[0]).integrate_batch(data_objects, pre_delay, post_delays, sample_rate)
+
     @property
     def pulse_data_all(self):
         '''
@@ -362,17 +548,17 @@ class segment_base():
                 self._pulse_data_all = update_dimension(self._pulse_data_all, my_shape)
                 ref_chan.data = update_dimension(ref_chan.segment.data, my_shape)
 
-                self._pulse_data_all += ref_chan.segment.data*ref_chan.multiplication_factor
+                self._pulse_data_all = self._pulse_data_all + ref_chan.segment.data*ref_chan.multiplication_factor
                 ref_chan.segment._last_edit = last_edit.Rendered
             for ref_chan in self.IQ_ref_channels:
                 # todo -- update dim functions
                 my_shape = find_common_dimension(self._pulse_data_all.shape, ref_chan.virtual_channel_pointer.shape)# Luca modification
                 self._pulse_data_all = update_dimension(self._pulse_data_all, my_shape) # Luca modification
-                self._pulse_data_all += ref_chan.virtual_channel_pointer.get_IQ_data(ref_chan.LO, ref_chan.IQ_render_option, ref_chan.image_render_option)
+                self._pulse_data_all = self._pulse_data_all + ref_chan.virtual_channel_pointer.get_IQ_data(ref_chan.LO, ref_chan.IQ_render_option, ref_chan.image_render_option)
             for ref_chan in self.references_markers:
                 my_shape = find_common_dimension(self._pulse_data_all.shape, ref_chan.IQ_channel_ptr.shape)# Luca modification
                 self._pulse_data_all = update_dimension(self._pulse_data_all, my_shape) # Luca modification
-                self._pulse_data_all += ref_chan.IQ_channel_ptr.get_marker_data(ref_chan.pre_delay, ref_chan.post_delay)
+                self._pulse_data_all = self._pulse_data_all + ref_chan.IQ_channel_ptr.get_marker_data(ref_chan.pre_delay, ref_chan.post_delay)
 
             self._last_edit = last_edit.Rendered
 
@@ -392,7 +578,7 @@ class segment_base():
 
         return self._last_edit
 
-    def _generate_segment(self, index, pre_delay = 0, post_delay = 0, sample_rate = 1e9):
+    def _generate_segment(self, index, pre_delay = 0, post_delay = 0, sample_rate = 1e9, out = None):
         '''
         Generate numpy array of the segment
 
@@ -401,6 +587,7 @@ class segment_base():
             pre_delay (int): predelay of the pulse (in ns) (e.g. for compensation of diffent coax length's)
             post_delay (int): extend the pulse for x ns
             sample rate (double) : sample rate of the pulse to be rendered at.
+            out (np.ndarray) : optional array to copy the waveform in.
         '''
 
         # get object with the concerning data
@@ -409,7 +596,7 @@ class segment_base():
 
         total_time = pulse_data_all_curr_seg.total_time
 
-        my_sequence = pulse_data_all_curr_seg.render(pre_delay, post_delay, sample_rate)
+        my_sequence = pulse_data_all_curr_seg.render(pre_delay, post_delay, sample_rate, out)
         return my_sequence
 
     def plot_segment(self, index = [0], render_full = True, sample_rate = 1e9):
@@ -274,7 +274,7 @@ class segment_container():
             segment = getattr(self, i)
             segment.reset_time(loop_obj, False)
 
-    def get_waveform(self, channel, index = [0], pre_delay=0, post_delay = 0, sample_rate=1e9):
+    def get_waveform(self, channel, index = [0], pre_delay=0, post_delay = 0, sample_rate=1e9, out=None):
         '''
         function to get the raw data of a waveform,
         inputs:
@@ -282,10 +282,37 @@ class segment_container():
             index (tuple) :
             pre_delay (int) : extra offset in from of the waveform (start at negative time) (for a certain channel, as defined in channel delays)
             post_delay (int) : time gets appended to the waveform (for a certain channel)
+            out (np.ndarray) : optional array to copy the waveform in. Length must match get_waveform_npt.
         returns:
             np.ndarray[ndim=1, dtype=double] : waveform as a numpy array
         '''
-        return getattr(self, channel).get_segment(index, pre_delay, post_delay, sample_rate)
+        return getattr(self, channel).get_segment(index, pre_delay, post_delay, sample_rate, out)
+
+    def get_waveform_npt(self, channel, index = [0], pre_delay=0, post_delay = 0, sample_rate=1e9):
+        '''
+        function to get the number of samples of a waveform without rendering it,
+        inputs:
+            channel (str) : channel name of the waveform you want
+            index (tuple) :
+            pre_delay (int) : extra offset in from of the waveform (start at negative time) (for a certain channel, as defined in channel delays)
+            post_delay (int) : time gets appended to the waveform (for a certain channel)
+        returns:
+            int : number of samples of the waveform
+        '''
+        return getattr(self, channel).get_segment_npt(index, pre_delay, post_delay, sample_rate)
+
+    def get_waveform_batch(self, channel, indices = None, pre_delay=0, post_delay = 0, sample_rate=1e9):
+        '''
+        function to get the raw data of the waveforms of many indices at once,
+        inputs:
+            channel (str) : channel name of the waveform you want
+            indices (list<tuple>) : indices to render. If None, all indices are rendered (in C order).
+            pre_delay (int) : extra offset in from of the waveform (start at negative time) (for a certain channel, as defined in channel delays)
+            post_delay (int) : time gets appended to the waveform (for a certain channel)
+        returns:
+            np.ndarray[ndim=2, dtype=double] : waveforms with shape (n_indices, n_samples), padded to a common length.
+        '''
+        return getattr(self, channel).get_segment_batch(indices, pre_delay, post_delay, sample_rate)
 
     def extend_dim(self, shape=None, ref = False):
         '''
@@ -30,6 +30,8 @@ class segment_pulse(segment_base):
     '''
     Class defining single segments for one sequence.
     '''
+    _supports_parametric_loops = True
+
     def __init__(self, name, HVI_variable_data = None,segment_type = 'render'):
         '''
         Args:
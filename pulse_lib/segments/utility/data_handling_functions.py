@@ -1,5 +1,6 @@
 from pulse_lib.segments.utility.looping import loop_obj
 from pulse_lib.segments.data_classes.data_generic import data_container
+from pulse_lib.segments.data_classes.data_parametric import parametric_data_container
 from pulse_lib.segments.utility.setpoint_mgr import setpoint
 from functools import wraps
 import numpy as np
@@ -54,6 +55,8 @@ def update_dimension(data, new_dimension_info, use_ref = False):
     Returns:
         data (np.ndarray[dtype = object]) : same as input data, but with new_dimension_info.
     '''
+    if isinstance(data, parametric_data_container):
+        return data.broadcast_to(find_common_dimension(data.shape, new_dimension_info))
 
     new_dimension_info = np.array(new_dimension_info)
 
@@ -186,6 +189,9 @@ def loop_controller(func):
         * loop over the data and add called function
 
     if no loop, just apply func on all data (easy)
+
+    With parametric loops (see segment_base.set_parametric_loops) the call is recorded in a
+    parametric_data_container instead, and applied when the data of an index is materialized.
     '''
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -201,6 +207,12 @@ def loop_controller(func):
             if isinstance(kwargs[key], loop_obj):
                 loop_info_kwargs.append(_get_loop_info(kwargs[key], key))
 
+        parametric = (getattr(obj, 'parametric_loops', False) and getattr(obj, '_supports_parametric_loops', False)
+                      and len(loop_info_kwargs) == 0
+                      and (len(loop_info_args) > 0 or isinstance(obj.data, parametric_data_container)))
+        if parametric and not isinstance(obj.data, parametric_data_container):
+            obj.data = parametric_data_container([obj.data], obj.data.shape)
+
         for lp in loop_info_args:
             for i in range(len(lp['axis'])-1,-1,-1):
                 new_dim, axis = get_new_dim_loop(obj.data.shape, lp['axis'][i], lp['shape'][i])
@@ -211,6 +223,10 @@ def loop_controller(func):
                     lp['setpnt'][i].axis = axis
                     obj._setpoints += lp['setpnt'][i]
 
+        if parametric:
+            obj.data.add_operation(func, args[1:], kwargs)
+            return
+
         # todo update : (not used atm, but just to be generaric.)
         for lp in loop_info_kwargs:
             new_dim = get_new_dim_loop(obj.data.shape, lp)
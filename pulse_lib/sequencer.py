@@ -6,12 +6,15 @@ from pulse_lib.segments.utility.looping import loop_obj
 from pulse_lib.keysight.uploader import convert_prescaler_to_sample_rate
 from pulse_lib.segments.data_classes.data_HVI_variables import marker_HVI_variable
 from pulse_lib.segments.data_classes.data_generic import data_container, parent_data
+from pulse_lib.render_pool import render_pool
 
 from si_prefix import si_format
 
 import numpy as np
 import uuid
 import logging
+import itertools
+import collections
 
 class sequencer():
     """
@@ -41,6 +44,9 @@ class sequencer():
 
         # arguments of post processing the might be needed during rendering.
         self.neutralize = True
+        # pad all indices of the sweep to the same length with a sweep-wide DC compensation (see set_uniform_length).
+        self.uniform_length = False
+        self._uniform_length_plan = None
 
         # HVI if needed..
         self.HVI = None
@@ -52,6 +58,7 @@ class sequencer():
         self.prescaler = 0
         self._sample_rate = 1e9
         self._HVI_variables = None
+        self.render_pool = None
 
     @property
     def sweep_index(self):
@@ -137,12 +144,14 @@ class sequencer():
 
         # Set the waveform cache equal to the the sum of the length of all axis of all channels.
         # The cache will than be big enough for 1D iterations along every axis. This gives best performance
-        total_axis_length = 0
-        for seg_container in self.sequence:
-            for channel_name in seg_container.channels:
-                shape = getattr(seg_container, channel_name).data.shape
-                total_axis_length += sum(shape)
-        parent_data.set_waveform_cache_size(total_axis_length)
+        # A cache bounded by bytes (parent_data.set_waveform_cache_max_bytes) is not resized.
+        if parent_data.waveform_cache.max_bytes is None:
+            total_axis_length = 0
+            for seg_container in self.sequence:
+                for channel_name in seg_container.channels:
+                    shape = getattr(seg_container, channel_name).data.shape
+                    total_axis_length += sum(shape)
+            parent_data.set_waveform_cache_size(total_axis_length)
 
         self._shape = tuple(self._shape)
         self._sweep_index = [0]*self.ndim
@@ -170,6 +179,23 @@ class sequencer():
             self.params.append(set_param)
             setattr(self, par_name, set_param)
 
+    def set_render_pool(self, n_processes=None, chunk_size=16):
+        '''
+        Render the waveforms of the uploads in a pool of worker processes.
+        The pulse data of the sequence is copied to the workers. When segments are changed afterwards,
+        the pulse data is copied again before the next upload. If the pool fails, the waveforms are rendered in-process.
+        Args:
+            n_processes (int) : number of worker processes. If None the number of cores is used. If 0 the pool is stopped.
+            chunk_size (int) : number of indices per worker task in render_pool.render_indices.
+        '''
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+
+        if n_processes != 0:
+            self.render_pool = render_pool(self.sequence, self.uploader.channel_names, n_processes,
+                                           chunk_size, self.sample_rate)
+
     def voltage_compenstation(self, compenstate):
         '''
         add a voltage compenstation at the end of the sequence
@@ -178,6 +204,31 @@ class sequencer():
         '''
         self.neutralize = compenstate
 
+    def set_uniform_length(self, uniform=True):
+        '''
+        Uploads all indices of the sweep with the same length. The DC compensation and zero padding
+        are planned for the whole sweep (see preflight), so the playback time and the waveform size are
+        equal for all indices and AWG memory slots and HVI settings can be reused.
+        Args:
+            uniform (bool) : pad all indices to the same length
+        '''
+        self.uniform_length = uniform
+        self._uniform_length_plan = None
+
+    def get_uniform_length(self):
+        '''
+        Sweep-wide number of samples of the DC compensation and of the uploaded waveform.
+        The plan is computed with preflight on first use and recomputed when the sample rate or compensation changes.
+        Returns:
+            (compensation_npt, upload_npt) : number of samples of the compensation and of the waveform.
+        '''
+        plan_key = (self.sample_rate, self.neutralize)
+        if self._uniform_length_plan is None or self._uniform_length_plan[0] != plan_key:
+            report = self.preflight()
+            self._uniform_length_plan = (plan_key, report.get_uniform_length())
+            logging.info(f'uniform length: {self._uniform_length_plan[1]}')
+        return self._uniform_length_plan[1]
+
     def add_HVI(self, HVI_ID ,HVI_to_load, compile_function, start_function, **kwargs):
         '''
         Add HVI code to the AWG.
@@ -199,27 +250,163 @@ class sequencer():
         self.HVI_start_function = start_function
         self.HVI_kwargs = kwargs
 
-    def upload(self, index):
+    def preflight(self, indices=None, max_compensation_time=None, raise_on_violation=False):
+        '''
+        Checks the AWG output amplitude and the DC compensation of all indices of the sweep before the first upload.
+        The waveforms are not rendered. The report also gives the number of samples per index to plan the AWG memory.
+        Args:
+            indices (list<tuple>) : indices to check. If None, all indices of the sweep are checked.
+            max_compensation_time (double) : maximum duration of the DC compensation in ns. If None, it is not checked.
+            raise_on_violation (bool) : raise a ValueError if a limit is exceeded.
+        Returns:
+            report (PreflightReport) : npt, compensation, integral and extrema per index and the violations of the limits.
+        '''
+        if not hasattr(self.uploader, 'preflight'):
+            raise NotImplementedError(f'{type(self.uploader).__name__} does not support preflight')
+
+        report = self.uploader.preflight(self.sequence, self.shape, indices, self.sample_rate, self.neutralize,
+                                         max_compensation_time)
+        if not report.ok:
+            first = report.violations[0]
+            message = (f'Preflight: {len(report.violations)} violations. First: index {first.index} '
+                       f'{first.channel_name} {first.kind} {first.value:.1f} (limit {first.limit:.1f})')
+            if raise_on_violation:
+                raise ValueError(message)
+            logging.warning(message)
+        return report
+
+    def upload(self, index, background=False, priority=0):
         '''
         Sends the sequence with the provided index to the uploader module. Once he is done, the play function can do its work.
         Args:
             index (tuple) : index if wich you wannt to upload. This index should fit into the shape of the sequence being played.
+            background (bool) : upload in a background thread. play() waits till the upload is done.
+            priority (int) : priority of a background upload. Jobs with a higher priority are uploaded first.
 
         Remark that upload and play can run at the same time and it is best to
         start multiple uploads at once (during upload you can do playback, when the first one is finihsed)
         (note that this is only possible if you AWG supports upload while doing playback)
         '''
 
-        upload_job = self.uploader.create_job(self.sequence, index, self.id, self.n_rep ,self.prescaler, self.neutralize)
+        upload_job = self._create_upload_job(index, priority)
+
+        if background and hasattr(self.uploader, 'add_upload_job_async'):
+            self.uploader.add_upload_job_async(upload_job)
+        else:
+            self.uploader.add_upload_job(upload_job)
+
+        return upload_job
+
+
+    def upload_indices(self, indices, priority=-1):
+        '''
+        Submits the uploads of many indices at once to the background upload (e.g. a full sweep).
+        The default low priority lets uploads with default priority (e.g. calibrations) pass the queued uploads.
+        Args:
+            indices (iterable<tuple>) : indices to upload.
+            priority (int) : priority of the uploads.
+        Returns:
+            jobs (list<upload_job>) : the submitted jobs.
+        '''
+        return [self.upload(index, background=True, priority=priority) for index in indices]
+
+
+    def _create_upload_job(self, index, priority=0):
+        upload_job = self.uploader.create_job(self.sequence, index, self.id, self.n_rep ,self.prescaler, self.neutralize, priority)
+        upload_job.render_pool = self.render_pool
+        if self.uniform_length:
+            upload_job.compensation_npt, upload_job.upload_npt = self.get_uniform_length()
 
         if self.HVI is not None:
             upload_job.add_HVI(self.HVI, self.HVI_compile_function, self.HVI_start_function, **{**self.HVI_kwargs, **self._HVI_variables.item(tuple(index)).HVI_markers})
 
-        self.uploader.add_upload_job(upload_job)
+        return upload_job
 
+
+    async def upload_async(self, index):
+        '''
+        Awaitable upload of the sequence with the provided index.
+        Rendering and upload run outside the event loop, so other tasks (e.g. digitizer readout) continue.
+        Args:
+            index (tuple) : index if wich you wannt to upload. This index should fit into the shape of the sequence being played.
+        '''
+        upload_job = self._create_upload_job(index)
+        await self.uploader.upload_async(upload_job)
         return upload_job
 
 
+    async def play_async(self, index, release= True):
+        '''
+        Awaitable playback of an uploaded index. Awaits the upload and the end of the previous playback.
+        Args:
+            index (tuple) : index if wich you wannt to upload. This index should fit into the shape of the sequence being played.
+            release (bool) : release memory on the AWG after the element has been played.
+        '''
+        await self.uploader.play_async(self.id, index, release)
+
+
+    async def wait_idle_async(self):
+        '''
+        Await till the AWG is done with playback. The wait can be cancelled.
+        '''
+        await self.uploader.wait_idle_async()
+
+
+    def prefetch(self, indices, lookahead=2):
+        '''
+        Iterates over the indices while the next indices are uploaded in the background.
+        The rendering and upload of the next `lookahead` indices overlaps with the playback of the current index.
+        The memory used on the AWG can be bounded with the max_upload_bytes of the uploader.
+
+        Example:
+            for index in seq.prefetch(indices):
+                seq.play(index)
+                # acquire data
+
+        Args:
+            indices (iterable<tuple>) : indices to upload and play in this order. An index can occur multiple times.
+                A new upload of an index replaces the upload that is waiting to be played, so a repeated index
+                is only uploaded after the previous occurrence has been played.
+            lookahead (int) : number of indices uploaded ahead of the index that is played.
+        Yields:
+            index (tuple) : the next index to play.
+        '''
+        indices = iter(indices)
+        # [index, uploaded] of the indices to play
+        pending = collections.deque()
+
+        def add(index):
+            uploaded = all(tuple(entry[0]) != tuple(index) for entry in pending)
+            if uploaded:
+                self.upload(index, background=True)
+            pending.append([index, uploaded])
+
+        try:
+            for index in itertools.islice(indices, lookahead + 1):
+                add(index)
+
+            while len(pending) > 0:
+                index = pending[0][0]
+                yield index
+                pending.popleft()
+
+                # upload the next occurrence of the played index
+                for entry in pending:
+                    if tuple(entry[0]) == tuple(index):
+                        self.upload(entry[0], background=True)
+                        entry[1] = True
+                        break
+
+                next_index = next(indices, None)
+                if next_index is not None:
+                    add(next_index)
+        finally:
+            # release the uploads that are not played, e.g. when the loop is stopped.
+            for index, uploaded in pending:
+                if uploaded:
+                    self.release_memory(index)
+
+
     def play(self, index, release= True):
         '''
         Playback a certain index, assuming the index is provided.
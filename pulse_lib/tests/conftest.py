@@ -0,0 +1,146 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from qcodes.instrument.base import Instrument
+
+from pulse_lib.keysight.M3202A_uploader import M3202A_Uploader
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.segment_container import segment_container
+import pulse_lib.segments.utility.looping as lp
+from pulse_lib.tests.mock_m3202a import MockM3202A
+
+
+@pytest.fixture(autouse=True)
+def clear_waveform_cache():
+    pulse_data.clear_waveform_cache()
+    pulse_data.reset_waveform_cache_stats()
+    yield
+    pulse_data.clear_waveform_cache()
+
+
+@pytest.fixture
+def awgs():
+    Instrument.close_all()
+    awgs = {'AWG1': MockM3202A('AWG1', 0, 2)}
+    yield awgs
+    Instrument.close_all()
+
+
+@pytest.fixture
+def uploader(awgs):
+    '''
+    uploader for channels P1 and P2 on AWG1.
+    '''
+    channels = ['P1', 'P2']
+    channel_map = {channel:('AWG1', i+1) for i, channel in enumerate(channels)}
+    delays = {channel:(0, 0) for channel in channels}
+    limits = {channel:(-1000, 1000) for channel in channels}
+    attenuation = {channel:1.0 for channel in channels}
+    uploader = M3202A_Uploader(awgs, channels, channel_map, delays, limits, attenuation)
+    yield uploader
+    uploader.release_jobs()
+
+
+@pytest.fixture
+def make_sequence():
+    '''
+    function that makes a sequence of segments with channels P1 and P2, swept along axis 0 with the amplitude of P1:
+        * segment 1: P1 block with the swept amplitude, P2 ramp from 0 to 150 mV and an optional MW pulse.
+        * segment 2: P1 ramp from -100 to 100 mV, P2 block of -200 mV from 10 to 50 ns.
+        * segment 3 (optional): P1 block of 20 mV, P2 block of -20 mV.
+
+    Args:
+        amplitude (tuple) : (start, stop, n_points) of the amplitude of the block on P1 in segment 1 (mV)
+        duration (tuple) : (start, stop, n_points) of the duration of the block on P1, swept along axis 1.
+            If None, the duration of the block is t_seg1.
+        t_seg1 (double) : duration of segment 1 (ns)
+        t_seg2 (double) : duration of segment 2 (ns)
+        mw_amplitude (double) : amplitude of a MW pulse on P2 from 20 to 80 ns in segment 1. If None, there is no MW pulse.
+        repeat (int) : number of times segment 2 is repeated
+        t_seg3 (double) : duration of segment 3 (ns). If None, there is no segment 3.
+    Returns:
+        sequence (list<segment_container>)
+    '''
+    def make_sequence(amplitude=(100, 400, 4), duration=None, t_seg1=100, t_seg2=77, mw_amplitude=None, repeat=1,
+                      t_seg3=None):
+        amplitude = lp.linspace(*amplitude, axis=0, name='amp', unit='mV')
+        shape = (amplitude.shape[0],)
+        if duration is not None:
+            t_block = lp.linspace(*duration, axis=1, name='t', unit='ns')
+            shape = (t_block.shape[0],) + shape
+        else:
+            t_block = t_seg1
+
+        seg1 = segment_container(['P1', 'P2'])
+        seg1.P1.add_block(0, t_block, amplitude)
+        seg1.P2.add_ramp_ss(0, t_seg1, 0, 150)
+        if mw_amplitude is not None:
+            seg1.P2.add_sin(20, 80, mw_amplitude, 2e7)
+        seg2 = segment_container(['P1', 'P2'])
+        seg2.P1.add_ramp_ss(0, t_seg2, -100, 100)
+        seg2.P2.add_block(10, 50, -200)
+        if repeat > 1:
+            seg2.reset_time()
+            seg2.P1.repeat(repeat)
+            seg2.P2.repeat(repeat)
+        sequence = [seg1, seg2]
+        if t_seg3 is not None:
+            seg3 = segment_container(['P1', 'P2'])
+            seg3.P1.add_block(0, t_seg3, 20)
+            seg3.P2.add_block(0, t_seg3, -20)
+            sequence.append(seg3)
+
+        for seg in sequence:
+            seg.reset_time()
+            seg.extend_dim(shape, ref=True)
+        return sequence
+    return make_sequence
+
+
+@pytest.fixture
+def play(awgs, uploader):
+    '''
+    function that uploads and plays an index and returns the played waveforms of P1 and P2 (in V)
+    and the number of waveforms in the AWG queue per channel.
+    '''
+    def play(sequence, index):
+        job = uploader.create_job(sequence, index, 'seq', 1)
+        job.add_HVI(object(), None, lambda *args, **kwargs: None)
+        uploader.add_upload_job(job)
+        n_queued = {channel_name:len(queue) for channel_name, queue in job.channel_queues.items()}
+        uploader.play('seq', index)
+        played = {channel_name:np.concatenate(awgs['AWG1'].get_data(i+1))
+                  for i, channel_name in enumerate(['P1', 'P2'])}
+        return played, n_queued
+    return play
+
+
+@pytest.fixture
+def pulse(awgs, monkeypatch):
+    '''
+    pulselib with the M3202A backend and channel P1 on AWG2, compensation limits (-1000, 1000) mV.
+    The legacy keysight uploader is a compiled extension that is not used by this backend.
+    It is replaced by an empty module when it is not built.
+    '''
+    legacy_module = 'pulse_lib.keysight.uploader_core.uploader'
+    try:
+        __import__(legacy_module)
+    except ImportError:
+        stub = types.ModuleType(legacy_module)
+        stub.keysight_upload_module = None
+        stub.waveform_cache_container = None
+        monkeypatch.setitem(sys.modules, legacy_module, stub)
+        # modules importing the legacy uploader are imported again without the stub after the test
+        for module in ['pulse_lib.keysight.uploader', 'pulse_lib.sequencer', 'pulse_lib.base_pulse']:
+            monkeypatch.delitem(sys.modules, module, raising=False)
+    from pulse_lib.base_pulse import pulselib
+
+    pulse = pulselib('M3202A')
+    pulse.add_awgs('AWG2', MockM3202A('AWG2', 0, 3))
+    pulse.define_channel('P1', 'AWG2', 1)
+    pulse.add_channel_compenstation_limit('P1', (-1000, 1000))
+    pulse.finish_init()
+    return pulse
@@ -1,31 +1,18 @@
 
 import logging
 from dataclasses import dataclass
+import numpy as np
 
 from qcodes.instrument.base import Instrument
 from typing import List
 
-class MemoryManager:
-    def __init__(self):
-        self._free_slots = [i for i in range(50)]
-        self._used_slots = {}
-
-    def allocate(self, size):
-        slot = self._free_slots.pop(0)
-        self._used_slots[slot] = size
-        logging.info(f'allocated {slot}: {size}')
-        return slot
-
-    def free(self, slot):
-        size = self._used_slots.pop(slot)
-        self._free_slots.append(slot)
-        logging.info(f'freed {slot}: {size}')
+from pulse_lib.keysight.awg_memory import AwgMemoryAllocator
 
 @dataclass
 class WaveformReference:
     wave_number: int
     size: int
-    memory_manager: MemoryManager
+    memory_manager: AwgMemoryAllocator
     waveform: List
 
     def release(self):
@@ -35,12 +22,15 @@ class WaveformReference:
 
 # mock for M3202A / SD_AWG_Async
 class MockM3202A(Instrument):
+    # upload_waveform accepts np.int16 DAC codes (see M3202A_Uploader.upload_dac_codes)
+    supports_dac_codes = True
 
     def __init__(self, name, chassis, slot):
         super().__init__(name)
         self._slot_number = slot
         self._chassis_numnber = chassis
-        self.memory_manager = MemoryManager()
+        # M3202A: 2 GB waveform memory, 2 bytes per sample
+        self.memory_manager = AwgMemoryAllocator(2**30)
         self.channel_data = {}
         self.amplitudes = {}
         for i in range(4):
@@ -57,6 +47,9 @@ class MockM3202A(Instrument):
 
     def upload_waveform(self, wave) -> WaveformReference:
         size = len(wave)
+        if wave.dtype == np.int16:
+            # DAC codes, convert to normalized output
+            wave = wave / 32767
         slot = self.memory_manager.allocate(size)
         logging.info(f'{self.name}.upload_waveform({slot}, {size})')
         return WaveformReference(slot, size, self.memory_manager, wave)
@@ -77,7 +70,8 @@ class MockM3202A(Instrument):
 
     def awg_queue_waveform(self, channel, waveform_ref, trigger_mode, start_delay, cycles, prescaler):
         logging.info(f'{self.name}.awg_queue_waveform({channel}, {waveform_ref.wave_number}, {trigger_mode}, {start_delay}, {cycles}, {prescaler})')
-        self.channel_data[channel].append(waveform_ref.waveform * self.amplitudes[channel])
+        for i in range(cycles):
+            self.channel_data[channel].append(waveform_ref.waveform * self.amplitudes[channel])
 
     def awg_is_running(self, channel):
         return False
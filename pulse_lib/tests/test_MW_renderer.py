@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+from pulse_lib.segments.data_classes.data_IQ import IQ_data_single, envelope_generator
+
+
+@pytest.fixture
+def restore_renderer():
+    yield
+    pulse_data.set_MW_renderer('vectorized')
+
+
+def make_MW_pulse(start, stop, amplitude, frequency, phase, envelope=None):
+    MW_pulse = IQ_data_single()
+    MW_pulse.start = start
+    MW_pulse.stop = stop
+    MW_pulse.amplitude = amplitude
+    MW_pulse.frequency = frequency
+    MW_pulse.start_phase = phase
+    if envelope is not None:
+        MW_pulse.envelope = envelope
+    return MW_pulse
+
+
+def render(data, renderer, sample_rate):
+    pulse_data.set_MW_renderer(renderer)
+    pulse_data.clear_waveform_cache()
+    return data.render(-10, 20, sample_rate)
+
+
+@pytest.mark.parametrize('sample_rate', [1e8, 1e9])
+@pytest.mark.parametrize('overlapping', [False, True])
+def test_vectorized_identical_to_loop(restore_renderer, sample_rate, overlapping):
+    rng = np.random.default_rng(7)
+    envelopes = [None, envelope_generator('blackman'), envelope_generator(('tukey', 0.5))]
+    for i in range(20):
+        data = pulse_data()
+        data.add_pulse_data(base_pulse_element(0, 100, 10.0, 30.0))
+        t = 0.0
+        for j in range(rng.integers(1, 10)):
+            duration = rng.uniform(0.5, 60)
+            start = rng.uniform(0, 200) if overlapping else t
+            t = start + duration + rng.uniform(0, 10)
+            data.add_MW_data(make_MW_pulse(start, start + duration, rng.uniform(1, 100), rng.uniform(1e6, 2e8),
+                                           rng.uniform(0, 2*np.pi), envelopes[j % 3]))
+        expected = render(data, 'loop', sample_rate)
+        result = render(data, 'vectorized', sample_rate)
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_short_pulse_adds_nothing(restore_renderer):
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 20, 0.0, 0.0))
+    data.add_MW_data(make_MW_pulse(5, 5.5, 50, 1e8, 0.0))
+    np.testing.assert_array_equal(render(data, 'vectorized', 1e9), 0.0)
+    np.testing.assert_array_equal(render(data, 'loop', 1e9), 0.0)
+
+
+def test_unknown_renderer():
+    with pytest.raises(ValueError):
+        pulse_data.set_MW_renderer('fast')
@@ -0,0 +1,60 @@
+import asyncio
+import numpy as np
+import pytest
+
+
+def create_job(uploader, sequence, index, started):
+    job = uploader.create_job(sequence, index, 'seq', 1)
+    job.add_HVI(object(), None, lambda HVI, AWGs, channel_map, playback_time, n_rep, **kwargs: started.append(index))
+    return job
+
+
+def test_upload_and_play_async(awgs, uploader, make_sequence):
+    sequence = make_sequence()
+    started = []
+
+    async def run():
+        for i in range(4):
+            job = create_job(uploader, sequence, (i,), started)
+            await uploader.upload_async(job)
+            assert job.upload_future.done()
+            await uploader.play_async('seq', (i,))
+            # the waveform is scaled with the channel amplitude by the mock: output in V.
+            assert np.max(awgs['AWG1'].get_data(1)[0]) == pytest.approx(0.1*(i + 1))
+
+    asyncio.run(run())
+    assert started == [(0,), (1,), (2,), (3,)]
+    assert len(uploader.jobs) == 0
+
+
+def test_cancelled_play_async_keeps_job_playable(awgs, uploader, make_sequence):
+    sequence = make_sequence()
+    started = []
+    running = [True]
+    awgs['AWG1'].awg_is_running = lambda channel: running[0]
+
+    async def run():
+        job = create_job(uploader, sequence, (1,), started)
+        uploader.add_upload_job_async(job)
+        task = asyncio.create_task(uploader.play_async('seq', (1,)))
+        await asyncio.sleep(0.05)
+        # still waiting for the end of the previous playback
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert started == []
+        job.upload_future.result(timeout=2.0)
+
+        running[0] = False
+        await uploader.play_async('seq', (1,))
+
+    asyncio.run(run())
+    assert started == [(1,)]
+
+
+def test_wait_idle_async(awgs, uploader):
+    states = [True, True, True, False]
+    awgs['AWG1'].awg_is_running = lambda channel: states.pop(0)
+
+    asyncio.run(uploader.wait_idle_async(poll_interval=0.001))
+    assert states == []
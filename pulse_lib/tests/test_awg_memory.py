@@ -0,0 +1,75 @@
+import pytest
+
+from pulse_lib.keysight.awg_memory import AwgMemoryAllocator
+
+
+def test_best_fit_and_coalesce():
+    allocator = AwgMemoryAllocator(1000, alignment=10)
+    a = allocator.allocate(100)
+    b = allocator.allocate(95)
+    c = allocator.allocate(200)
+    d = allocator.allocate(100)
+    assert [allocator.allocations[w].offset for w in [a, b, c, d]] == [0, 100, 200, 400]
+    assert allocator.allocations[b].size == 100
+
+    allocator.free(a)
+    allocator.free(c)
+    stats = allocator.get_statistics()
+    assert stats['n_free_extents'] == 3
+    assert stats['largest_free'] == 500
+
+    # best fit: smallest free extent that fits
+    e = allocator.allocate(100)
+    assert allocator.allocations[e].offset == 0
+    f = allocator.allocate(150)
+    assert allocator.allocations[f].offset == 200
+
+    # free b merges with the previous and next extents
+    allocator.free(e)
+    allocator.free(f)
+    allocator.free(b)
+    stats = allocator.get_statistics()
+    assert stats['n_free_extents'] == 2
+    assert stats['largest_free'] == 500
+    allocator.free(d)
+    stats = allocator.get_statistics()
+    assert stats['n_free_extents'] == 1
+    assert stats['free'] == 1000
+    assert stats['fragmentation'] == 0.0
+
+
+def test_out_of_memory():
+    allocator = AwgMemoryAllocator(1000, alignment=10)
+    waves = [allocator.allocate(200) for i in range(5)]
+    allocator.free(waves[1])
+    allocator.free(waves[3])
+    assert allocator.get_statistics()['fragmentation'] == 0.5
+    with pytest.raises(MemoryError):
+        allocator.allocate(300)
+    assert allocator.get_statistics()['n_failed'] == 1
+
+
+def test_compact():
+    allocator = AwgMemoryAllocator(1000, alignment=10)
+    waves = [allocator.allocate(200) for i in range(5)]
+    allocator.free(waves[0])
+    allocator.free(waves[2])
+    moves = []
+    n_moved = allocator.compact(lambda *args: moves.append(args))
+    assert n_moved == 3
+    assert moves == [(waves[1], 200, 0, 200), (waves[3], 600, 200, 200), (waves[4], 800, 400, 200)]
+    stats = allocator.get_statistics()
+    assert stats['n_free_extents'] == 1
+    assert stats['largest_free'] == 400
+    allocator.allocate(400)
+    assert allocator.get_statistics()['free'] == 0
+
+
+def test_wave_numbers():
+    allocator = AwgMemoryAllocator(1000, alignment=10, max_waveforms=3)
+    waves = [allocator.allocate(10) for i in range(3)]
+    assert waves == [0, 1, 2]
+    with pytest.raises(MemoryError):
+        allocator.allocate(10)
+    allocator.free(1)
+    assert allocator.allocate(10) == 1
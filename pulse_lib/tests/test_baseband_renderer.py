@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+
+
+@pytest.fixture
+def restore_renderer():
+    yield
+    pulse_data.set_baseband_renderer('vectorized')
+
+
+def render(data, renderer, pre_delay, post_delay, sample_rate):
+    pulse_data.set_baseband_renderer(renderer)
+    pulse_data.clear_waveform_cache()
+    return data.render(pre_delay, post_delay, sample_rate)
+
+
+@pytest.mark.parametrize('sample_rate', [1e8, 2e8, 1e9])
+@pytest.mark.parametrize('pre_delay, post_delay', [(0, 0), (-10, 20), (-3.3, 7.7)])
+def test_vectorized_identical_to_loop(restore_renderer, sample_rate, pre_delay, post_delay):
+    rng = np.random.default_rng(1)
+    for i in range(50):
+        data = pulse_data()
+        for j in range(rng.integers(1, 8)):
+            start = rng.uniform(0, 200)
+            stop = start + rng.uniform(0.2, 100)
+            data.add_pulse_data(base_pulse_element(start, stop, rng.uniform(-100, 100), rng.uniform(-100, 100)))
+        if i % 3 == 0:
+            data.slice_time(0, rng.uniform(50, 250))
+        expected = render(data, 'loop', pre_delay, post_delay, sample_rate)
+        result = render(data, 'vectorized', pre_delay, post_delay, sample_rate)
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_empty_data(restore_renderer):
+    data = pulse_data()
+    data.slice_time(0, 10)
+    np.testing.assert_array_equal(render(data, 'vectorized', 0, 0, 1e9), render(data, 'loop', 0, 0, 1e9))
+
+
+def test_unknown_renderer():
+    with pytest.raises(ValueError):
+        pulse_data.set_baseband_renderer('fast')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.segment_container import segment_container
+
+
+def get_intervals(seg, channel_name, index, min_npt):
+    return getattr(seg, channel_name).get_constant_intervals(index, 0, 1e9, min_npt)
+
+
+def test_constant_intervals(make_sequence):
+    seg = segment_container(['P1'])
+    seg.P1.add_block(0, 2500, -20)
+    seg.P1.add_sin(1200, 1300, 50, 1e8)
+    waveform = seg.P1.get_segment((0,))
+    intervals = get_intervals(seg, 'P1', (0,), 1)
+    # the MW pulse is excluded
+    assert len(intervals) == 2
+    assert intervals[0][1] < 1200 and intervals[1][0] > 1300
+    for start_pt, stop_pt in intervals:
+        assert np.ptp(waveform[start_pt:stop_pt]) == 0
+
+    seg1, _, _ = make_sequence(t_seg1=1000, t_seg3=2500)
+    assert get_intervals(seg1, 'P1', (2,), 500) == [(1, 1000)]
+    assert get_intervals(seg1, 'P1', (2,), 1000) == []
+
+
+@pytest.mark.parametrize('per_segment', [False, True])
+def test_constant_runs_equal_to_plain_upload(uploader, play, make_sequence, per_segment):
+    sequence = make_sequence(t_seg1=1000, mw_amplitude=50, t_seg3=2500)
+    uploader.upload_per_segment = per_segment
+    for index in [(0,), (3,)]:
+        uploader.min_constant_npt = None
+        expected, _ = play(sequence, index)
+
+        uploader.min_constant_npt = 200
+        job = uploader.create_job(sequence, index, 'seq', 1)
+        uploader.add_upload_job(job)
+        for queue in job.channel_queues.values():
+            assert max(queue_item.cycles for queue_item in queue) > 1
+            assert sum(len(queue_item.wave_reference.waveform) for queue_item in queue) < len(expected['P1'])
+        job.release()
+
+        played, _ = play(sequence, index)
+        for channel_name in ['P1', 'P2']:
+            np.testing.assert_array_equal(played[channel_name], expected[channel_name])
+
+
+def test_constant_run_statistics(uploader, make_sequence):
+    sequence = make_sequence(t_seg1=1000, t_seg3=2500)
+    assert uploader.get_constant_run_statistics() == {'runs':0, 'samples_saved':0}
+
+    job = uploader.create_job(sequence, (1,), 'seq', 1)
+    uploader.add_upload_job(job)
+    assert uploader.get_constant_run_statistics() == {'runs':0, 'samples_saved':0}
+    total_npt = sum(len(queue_item.wave_reference.waveform) for queue_item in job.channel_queues['P1'])
+
+    uploader.min_constant_npt = 200
+    job = uploader.create_job(sequence, (1,), 'seq', 1)
+    uploader.add_upload_job(job)
+    statistics = uploader.get_constant_run_statistics()
+    assert statistics['runs'] >= 4
+    uploaded_npt = sum(len(queue_item.wave_reference.waveform)
+                       for queue in job.channel_queues.values() for queue_item in queue)
+    assert uploaded_npt + statistics['samples_saved'] == 2*total_npt
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+from pulse_lib.segments.data_classes.data_IQ import IQ_data_single, envelope_generator, cacheable_envelope
+
+
+@pytest.fixture
+def content_key():
+    pulse_data.set_waveform_cache_key('content')
+    yield
+    pulse_data.set_waveform_cache_key('id')
+
+
+def make_data(amplitude=10.0, envelope=None):
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 100, amplitude, amplitude))
+    MW_pulse = IQ_data_single()
+    MW_pulse.start = 10
+    MW_pulse.stop = 60
+    MW_pulse.amplitude = 20
+    MW_pulse.frequency = 1e8
+    MW_pulse.start_phase = 0.0
+    MW_pulse.envelope = envelope if envelope is not None else envelope_generator('blackman')
+    data.add_MW_data(MW_pulse)
+    return data
+
+
+def test_equal_data_shares_waveform(content_key):
+    data1 = make_data()
+    data2 = make_data()
+    assert data1.get_fingerprint() == data2.get_fingerprint()
+    wvf1 = data1.render(0, 0, 1e9)
+    wvf2 = data2.render(0, 0, 1e9)
+    np.testing.assert_array_equal(wvf1, wvf2)
+    stats = pulse_data.get_waveform_cache_stats()
+    assert stats['renders'] == 1
+    assert stats['hits'] == 1
+    assert stats['shared_hits'] == 1
+    assert stats['dedup_rate'] == 0.5
+
+
+def test_different_data_is_rendered(content_key):
+    data1 = make_data(10.0)
+    data2 = make_data(10.5)
+    assert data1.get_fingerprint() != data2.get_fingerprint()
+    assert not np.array_equal(data1.render(0, 0, 1e9), data2.render(0, 0, 1e9))
+    assert pulse_data.get_waveform_cache_stats()['renders'] == 2
+
+
+def test_sample_rate_is_part_of_key(content_key):
+    data = make_data()
+    data.render(0, 0, 1e9)
+    data.render(0, 0, 1e8)
+    assert pulse_data.get_waveform_cache_stats()['renders'] == 2
+
+
+def test_user_envelope_needs_decorator(content_key):
+    def AM_function(delta_t, sample_rate):
+        return np.ones(int(delta_t*sample_rate))
+
+    data = make_data(envelope=envelope_generator(AM_function))
+    assert data.get_fingerprint() is None
+    # cached per object
+    data.render(0, 0, 1e9)
+    make_data(envelope=envelope_generator(AM_function)).render(0, 0, 1e9)
+    assert pulse_data.get_waveform_cache_stats()['renders'] == 2
+
+    cacheable_envelope(AM_function)
+    data1 = make_data(envelope=envelope_generator(AM_function))
+    data2 = make_data(envelope=envelope_generator(AM_function))
+    assert data1.get_fingerprint() is not None
+    assert data1.get_fingerprint() == data2.get_fingerprint()
+
+
+def test_id_key_renders_per_object():
+    make_data().render(0, 0, 1e9)
+    make_data().render(0, 0, 1e9)
+    stats = pulse_data.get_waveform_cache_stats()
+    assert stats['renders'] == 2
+    assert stats['shared_hits'] == 0
+
+
+def test_unknown_key():
+    with pytest.raises(ValueError):
+        pulse_data.set_waveform_cache_key('hash')
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from pulse_lib.keysight.M3202A_uploader import UploadAggregator, Job, AwgConfig, to_dac_codes
+
+
+channels = ['P1', 'P2']
+
+
+def render(sequence, index, dac_codes, executor=None):
+    limits = {'P1':(-1000, 1000), 'P2':(-1000, 1000)}
+    aggregator = UploadAggregator(channels, {'P1':1.0, 'P2':0.5}, limits, {'P1':(0, 0), 'P2':(-3, 5)},
+                                  dac_codes=dac_codes, executor=executor)
+    job = Job([], sequence, index, None, 1)
+    waveforms = {}
+    aggregator.upload_job(job, lambda channel_name, waveform: waveforms.setdefault(channel_name, waveform.copy()))
+    job.released = True
+    return waveforms
+
+
+def test_to_dac_codes():
+    waveform = np.array([0.0, 0.5/32767, 1.5/32767, -0.49/32767, 1.0, -1.0, 1.2, -3.0, 0.25])
+    expected = np.array([0, 0, 2, 0, 32767, -32767, 32767, -32767, 8192], dtype=np.int16)
+    dac_codes = to_dac_codes(waveform.copy())
+    assert dac_codes.dtype == np.int16
+    np.testing.assert_array_equal(dac_codes, expected)
+
+    out = np.zeros(len(waveform), dtype=np.int16)
+    assert to_dac_codes(waveform.copy(), out=out) is out
+    np.testing.assert_array_equal(out, expected)
+
+
+@pytest.mark.parametrize('n_threads', [1, 4])
+@pytest.mark.parametrize('index', [(0,), (2,), (4,)])
+def test_dac_codes_equal_to_rounded_float_waveform(index, n_threads, make_sequence):
+    # P1 close to the AWG range of 1500 mV, P2 exceeds the range with the attenuation of 0.5
+    sequence = make_sequence(amplitude=(-1499.9, 1499.9, 5), mw_amplitude=1000)
+    executor = ThreadPoolExecutor(n_threads) if n_threads > 1 else None
+    try:
+        float_waveforms = render(sequence, index, False)
+        dac_waveforms = render(sequence, index, True, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for channel in channels:
+        wvf = float_waveforms[channel]
+        dac_codes = dac_waveforms[channel]
+        assert dac_codes.dtype == np.int16
+        expected = np.clip(np.rint(wvf*AwgConfig.MAX_DAC_CODE), -AwgConfig.MAX_DAC_CODE, AwgConfig.MAX_DAC_CODE)
+        np.testing.assert_array_equal(dac_codes, expected)
+    # P2 exceeds the AWG range and is clipped.
+    assert np.max(np.abs(dac_waveforms['P2'])) == AwgConfig.MAX_DAC_CODE
+
+
+def test_render_buffer_is_reused():
+    aggregator = UploadAggregator(channels, {'P1':1.0, 'P2':1.0}, {}, {'P1':(0, 0), 'P2':(0, 0)}, dac_codes=True)
+    buffer = aggregator.get_render_buffer(100)
+    assert len(buffer) == 100
+    assert np.shares_memory(aggregator.get_render_buffer(50), buffer)
+    assert len(aggregator.get_render_buffer(200)) == 200
+
+
+def test_upload_dac_codes_requires_driver_support(awgs, uploader, make_sequence):
+    sequence = make_sequence(amplitude=(-800, 800, 5))
+    uploader.upload_dac_codes = True
+    job = uploader.create_job(sequence, (1,), 'seq', 1)
+    uploader.add_upload_job(job)
+    assert all(len(queue) == 1 for queue in job.channel_queues.values())
+
+    awgs['AWG1'].supports_dac_codes = False
+    job = uploader.create_job(sequence, (2,), 'seq', 1)
+    with pytest.raises(ValueError):
+        uploader.add_upload_job(job)
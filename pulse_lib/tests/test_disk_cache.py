@@ -0,0 +1,88 @@
+import os
+import time
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.disk_cache import DiskCache
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    pulse_data.set_waveform_cache_key('content')
+    pulse_data.set_waveform_disk_cache(str(tmp_path))
+    yield pulse_data.waveform_disk_cache
+    pulse_data.set_waveform_disk_cache(None)
+    pulse_data.set_waveform_cache_key('id')
+
+
+def make_data(amplitude=10.0):
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 100, amplitude, 2*amplitude))
+    return data
+
+
+def test_put_get(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = DiskCache.make_key((b'abc', ()), 1e9, 0, 0)
+    assert cache.get(key) is None
+    waveform = np.linspace(0, 1, 101)
+    cache.put(key, waveform)
+    result = cache.get(key)
+    assert isinstance(result, np.memmap)
+    np.testing.assert_array_equal(result, waveform)
+    assert cache.get_stats()['hits'] == 1
+    assert cache.get_stats()['misses'] == 1
+    assert not any(name.endswith('.tmp') for name in os.listdir(cache.directory))
+
+
+def test_key_depends_on_all_arguments():
+    keys = {DiskCache.make_key((b'abc', ()), 1e9, 0, 0),
+            DiskCache.make_key((b'abd', ()), 1e9, 0, 0),
+            DiskCache.make_key((b'abc', ()), 1e8, 0, 0),
+            DiskCache.make_key((b'abc', ()), 1e9, -1, 0),
+            DiskCache.make_key((b'abc', ()), 1e9, 0, 1)}
+    assert len(keys) == 5
+
+
+def test_eviction_of_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=3*800 + 500)
+    now = time.time()
+    for i in range(3):
+        cache.put(str(i), np.full(100, i, dtype=float))
+        # set access times explicitly: the mtime resolution of the file system can be coarse.
+        os.utime(cache._get_path(str(i)), (now - 100 + i, now - 100 + i))
+    os.utime(cache._get_path('0'), (now - 10, now - 10))
+    cache.put('3', np.full(100, 3, dtype=float))
+    assert cache.get('1') is None
+    assert cache.get('0') is not None
+    assert cache.get('3') is not None
+    assert cache.get_stats()['evictions'] >= 1
+
+
+def test_warm_start_loads_from_disk(disk_cache):
+    expected = make_data().render(0, 0, 1e9)
+    assert pulse_data.get_waveform_cache_stats()['renders'] == 1
+    # new process: empty memory cache
+    pulse_data.clear_waveform_cache()
+    pulse_data.reset_waveform_cache_stats()
+    result = make_data().render(0, 0, 1e9)
+    np.testing.assert_array_equal(result, expected)
+    stats = pulse_data.get_waveform_cache_stats()
+    assert stats['renders'] == 0
+    assert stats['disk_hits'] == 1
+
+
+def test_disk_cache_not_used_with_id_key(disk_cache):
+    pulse_data.set_waveform_cache_key('id')
+    make_data().render(0, 0, 1e9)
+    assert disk_cache.get_stats()['writes'] == 0
+
+
+def test_clear(disk_cache):
+    make_data().render(0, 0, 1e9)
+    assert len(os.listdir(disk_cache.directory)) == 1
+    disk_cache.clear()
+    assert len(os.listdir(disk_cache.directory)) == 0
+    assert disk_cache.get_stats()['bytes'] == 0
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from pulse_lib.segments.data_classes.data_IQ import envelope_generator, envelope_lru_cache, cacheable_envelope
+
+
+@pytest.fixture(autouse=True)
+def envelope_cache():
+    max_size = envelope_generator.envelope_cache.max_size
+    envelope_generator.clear_envelope_cache()
+    yield
+    envelope_generator.set_envelope_cache_size(max_size)
+    envelope_generator.clear_envelope_cache()
+
+
+@pytest.mark.parametrize('window', ['blackman', ('tukey', 0.5)])
+def test_window_equal_to_uncached(window):
+    generator = envelope_generator(window)
+    for n_points in [50.2, 50.4, 50.2]:
+        expected = signal.get_window(window, int(n_points*10))[::10]
+        np.testing.assert_array_equal(generator.get_AM_envelope(n_points, 1), expected[:int(n_points)])
+        np.testing.assert_array_equal(envelope_generator(PM_envelope_function=window).get_PM_envelope(n_points, 1),
+                                      expected)
+    # 50.2 and 50.4 are different keys, the AM and PM envelope as well.
+    stats = envelope_generator.get_envelope_cache_stats()
+    assert stats['misses'] == 4
+    assert stats['hits'] == 2
+    assert stats['size'] == 4
+
+
+def test_hits_misses_and_eviction():
+    cache = envelope_lru_cache(2)
+    renders = []
+    def render(key):
+        renders.append(key)
+        return np.full(10, key)
+
+    for key in [1, 2, 1, 3, 2, 1]:
+        np.testing.assert_array_equal(cache.get(key, lambda: render(key)), key)
+    # 3 evicts 2, 2 evicts 1
+    assert renders == [1, 2, 3, 2, 1]
+    stats = cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 5
+    assert stats['evictions'] == 3
+    assert stats['size'] == 2
+    assert stats['bytes'] == 160
+    assert stats['max_size'] == 2
+
+
+def test_set_size_and_clear():
+    generator = envelope_generator('blackman')
+    generator.get_AM_envelope(50, 1)
+    generator.get_AM_envelope(50, 1)
+    assert envelope_generator.get_envelope_cache_stats()['hits'] == 1
+
+    # same size: cache is kept
+    envelope_generator.set_envelope_cache_size(envelope_generator.envelope_cache.max_size)
+    assert envelope_generator.get_envelope_cache_stats()['size'] == 1
+
+    envelope_generator.set_envelope_cache_size(1)
+    stats = envelope_generator.get_envelope_cache_stats()
+    assert stats['size'] == 0
+    assert stats['max_size'] == 1
+    generator.get_AM_envelope(50, 1)
+    generator.get_AM_envelope(60, 1)
+    assert envelope_generator.get_envelope_cache_stats()['size'] == 1
+
+    envelope_generator.clear_envelope_cache()
+    stats = envelope_generator.get_envelope_cache_stats()
+    assert stats['size'] == 0
+    assert stats['hits'] == 0
+    assert stats['misses'] == 0
+    assert stats['max_size'] == 1
+
+
+def test_cached_envelope_is_read_only():
+    envelope = envelope_generator('blackman').get_AM_envelope(50, 1)
+    assert not envelope.flags.writeable
+    with pytest.raises(ValueError):
+        envelope[0] = 1.0
+
+
+def test_only_decorated_functions_are_cached():
+    calls = []
+    def AM_function(delta_t, sample_rate):
+        calls.append(delta_t)
+        return np.ones(int(delta_t*sample_rate))
+
+    generator = envelope_generator(AM_function)
+    generator.get_AM_envelope(50, 1)
+    generator.get_AM_envelope(50, 1)
+    assert len(calls) == 2
+    assert envelope_generator.get_envelope_cache_stats()['size'] == 0
+
+    generator = envelope_generator(cacheable_envelope(AM_function))
+    envelope = generator.get_AM_envelope(50, 1)
+    generator.get_AM_envelope(50, 1)
+    generator.get_AM_envelope(60, 1)
+    assert len(calls) == 4
+    assert not envelope.flags.writeable
+    stats = envelope_generator.get_envelope_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
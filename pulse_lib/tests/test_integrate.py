@@ -0,0 +1,66 @@
+import numpy as np
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+from pulse_lib.segments.data_classes.data_IQ import IQ_data_single, envelope_generator
+
+
+def make_MW_pulse(start, stop, amplitude, frequency, envelope=None):
+    MW_pulse = IQ_data_single()
+    MW_pulse.start = start
+    MW_pulse.stop = stop
+    MW_pulse.amplitude = amplitude
+    MW_pulse.frequency = frequency
+    MW_pulse.start_phase = 0.3
+    if envelope is not None:
+        MW_pulse.envelope = envelope
+    return MW_pulse
+
+
+def make_data(with_MW=True):
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 100, 10.0, 30.0))
+    data.add_pulse_data(base_pulse_element(20, 40, 5.0, 5.0))
+    if with_MW:
+        data.add_MW_data(make_MW_pulse(10, 90, 50, 2e7))
+        data.add_MW_data(make_MW_pulse(40, 70, 20, 1.3e8, envelope_generator('blackman')))
+    return data
+
+
+def make_empty_data():
+    data = pulse_data()
+    data.slice_time(10, 20)
+    return data
+
+
+def test_baseband_integral_is_exact():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 100, 10.0, 30.0))
+    # trapezoid 100 ns * 20 mV. The post delay is at 0 mV.
+    assert np.isclose(data.integrate_waveform(0, 20, 1e9), 2000*1e-9)
+
+
+def test_MW_contribution_is_sum_of_samples():
+    for sample_rate in [1e9, 1e8]:
+        with_MW = make_data()
+        without_MW = make_data(with_MW=False)
+        MW_samples = with_MW.render(-10, 20, sample_rate) - without_MW.render(-10, 20, sample_rate)
+        MW_integral = with_MW.integrate_waveform(-10, 20, sample_rate) - without_MW.integrate_waveform(-10, 20, sample_rate)
+        assert np.isclose(MW_integral, np.sum(MW_samples)/sample_rate, rtol=1e-9, atol=1e-18)
+
+
+def test_integrate_batch_same_as_integrate_waveform():
+    repeated = make_data(with_MW=False)
+    repeated.repeat(3)
+    data_objects = [make_data(), make_empty_data(), repeated, make_data(with_MW=False), make_empty_data()]
+    post_delay = np.array([0, 5, 10, 15, 20])
+    integrals = pulse_data.integrate_batch(data_objects, -10, post_delay, 1e9)
+    expected = [data.integrate_waveform(-10, delay, 1e9) for data, delay in zip(data_objects, post_delay)]
+    np.testing.assert_allclose(integrals, expected, rtol=1e-7)
+
+
+def test_integrate_empty_table():
+    data = make_empty_data()
+    assert data.integrate_waveform(0, 10, 1e9) == 0.0
+    np.testing.assert_array_equal(pulse_data.integrate_batch([data], 0, 10, 1e9), [0.0])
+    np.testing.assert_array_equal(pulse_data.integrate_batch([], 0, 10, 1e9), [])
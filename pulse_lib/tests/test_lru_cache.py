@@ -0,0 +1,73 @@
+import numpy as np
+
+from pulse_lib.segments.data_classes.lru_cache import LruCache
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+
+
+def fill(cache, key, n):
+    entry = cache[key]
+    entry.data = np.zeros(n)
+    return entry
+
+
+def test_count_limit_evicts_least_recently_used():
+    cache = LruCache(2)
+    fill(cache, 'a', 1)
+    fill(cache, 'b', 1)
+    assert cache['a'].data is not None
+    fill(cache, 'c', 1)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_byte_limit():
+    cache = LruCache(None, max_bytes=3000)
+    fill(cache, 'a', 100)
+    fill(cache, 'b', 100)
+    fill(cache, 'c', 100)
+    assert cache.get_stats()['bytes'] == 2400
+    fill(cache, 'd', 100)
+    assert 'a' not in cache
+    stats = cache.get_stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] == 2400
+    assert stats['evictions'] == 1
+
+
+def test_too_large_entry_does_not_evict():
+    cache = LruCache(None, max_bytes=3000)
+    fill(cache, 'a', 100)
+    fill(cache, 'b', 1000)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.get_stats()['bytes'] == 800
+
+
+def test_hits_and_misses():
+    cache = LruCache(10)
+    assert cache['a'].data is None
+    cache['a'].data = [np.zeros(10), np.zeros(5)]
+    assert cache['a'].data is not None
+    stats = cache.get_stats()
+    assert stats['misses'] == 2
+    assert stats['hits'] == 1
+    assert stats['bytes'] == 120
+
+
+def test_waveform_cache_byte_budget():
+    try:
+        pulse_data.set_waveform_cache_max_bytes(10*8000)
+        for i in range(20):
+            data = pulse_data()
+            data.add_pulse_data(base_pulse_element(0, 8000, i, i))
+            data.render(0, 0, 1e9)
+        stats = pulse_data.get_waveform_cache_stats()
+        assert stats['bytes'] <= 10*8000
+        assert stats['evictions'] >= 10
+        assert stats['max_size'] is None
+    finally:
+        pulse_data.set_waveform_cache_max_bytes(None, 100)
+    assert pulse_data.get_waveform_cache_stats()['max_bytes'] is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from pulse_lib.keysight.M3202A_uploader import UploadAggregator, Job
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+
+
+channels = ['P1', 'P2']
+
+
+@pytest.fixture
+def sequence(make_sequence):
+    return make_sequence(amplitude=(-100, 100, 3), mw_amplitude=100, t_seg3=120)
+
+
+def render(sequence, index, executor):
+    limits = {'P1':(-300, 300), 'P2':(-300, 300)}
+    delays = {'P1':(0, 0), 'P2':(-7, 3)}
+    aggregator = UploadAggregator(channels, {channel:1.0 for channel in channels}, limits, delays, executor=executor)
+    job = Job([], sequence, index, None, 1)
+    waveforms = {}
+    aggregator.upload_job(job, lambda channel_name, waveform: waveforms.setdefault(channel_name, waveform.copy()))
+    job.released = True
+    return waveforms, aggregator
+
+
+@pytest.mark.parametrize('index', [(0,), (2,)])
+def test_threaded_upload_equal_to_serial(index, sequence):
+    expected, _ = render(sequence, index, None)
+    pulse_data.clear_waveform_cache()
+    with ThreadPoolExecutor(8) as executor:
+        for i in range(3):
+            waveforms, aggregator = render(sequence, index, executor)
+            for channel in channels:
+                np.testing.assert_array_equal(waveforms[channel], expected[channel])
+
+
+def test_task_timing(sequence):
+    with ThreadPoolExecutor(4) as executor:
+        _, aggregator = render(sequence, (1,), executor)
+    summary = aggregator.get_task_timing_summary()
+    assert summary['segment_info'][0] == len(channels)
+    assert summary['render'][0] == len(channels)*len(sequence)
+    assert summary['compensation'][0] == len(channels)
+
+
+def test_task_exception_is_raised():
+    aggregator = UploadAggregator(channels, {channel:1.0 for channel in channels}, {},
+                                  {channel:(0, 0) for channel in channels}, executor=ThreadPoolExecutor(2))
+    def fail():
+        raise RuntimeError('render failed')
+    with pytest.raises(RuntimeError):
+        aggregator.run_tasks([('render', 'P1', 0, fail, ())])
+    aggregator.executor.shutdown()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.segment_base import segment_base
+from pulse_lib.segments.segment_container import segment_container
+from pulse_lib.segments.data_classes.data_generic import data_container
+from pulse_lib.segments.data_classes.data_parametric import parametric_data_container
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+import pulse_lib.segments.utility.looping as lp
+
+
+@pytest.fixture
+def parametric_loops():
+    yield
+    segment_base.set_parametric_loops(False)
+
+
+def make_segment(parametric):
+    segment_base.set_parametric_loops(parametric)
+    amplitude = lp.linspace(100, 400, 4, axis=0, name='amp', unit='mV')
+    duration = lp.linspace(50, 150, 3, axis=1, name='t', unit='ns')
+    seg = segment_container(['P1', 'P2'])
+    seg.P1.add_block(0, duration, amplitude)
+    seg.P1.add_ramp_ss(0, 80, -50, 50)
+    seg.P1.reset_time()
+    seg.P1.add_sin(10, 60, amplitude*0.1, 2e7)
+    seg.P2.add_block(0, 100, 20)
+    seg.P2.wait(duration)
+    seg.reset_time()
+    seg.extend_dim((3, 4), ref=True)
+    return seg
+
+
+def test_lazy_equal_to_eager(parametric_loops):
+    eager = make_segment(False)
+    lazy = make_segment(True)
+    assert isinstance(lazy.P1.data, parametric_data_container)
+    assert isinstance(eager.P1.data, data_container)
+    assert lazy.P1.data.shape == eager.P1.data.shape
+
+    for channel_name in ['P1', 'P2']:
+        np.testing.assert_array_equal(getattr(lazy, channel_name).total_time, getattr(eager, channel_name).total_time)
+        for index in np.ndindex(*eager.P1.data.shape):
+            np.testing.assert_array_equal(getattr(lazy, channel_name).get_segment(index),
+                                          getattr(eager, channel_name).get_segment(index))
+
+
+def test_getitem(parametric_loops):
+    eager = make_segment(False).P1.data
+    lazy = make_segment(True).P1.data
+
+    for key in [(1, 2), (-1, 0), (np.int64(2), -3)]:
+        item = lazy[key]
+        np.testing.assert_array_equal(item.render(), eager[key].render())
+        # the cached data object is not returned
+        assert item is not lazy.get_item(tuple(np.array(key) % lazy.shape))
+    with pytest.raises(IndexError):
+        lazy[3, 0]
+
+    for key in [1, (slice(None), 2), (slice(1, 3), slice(None, None, -1)), [0, 2]]:
+        items = lazy[key]
+        assert isinstance(items, data_container)
+        assert items.shape == eager[key].shape
+        for index in np.ndindex(*items.shape):
+            np.testing.assert_array_equal(items[index].render(), eager[key][index].render())
+
+
+def test_getitem_materializes_selection(parametric_loops, monkeypatch):
+    lazy = make_segment(True).P1.data
+    evaluated = []
+    evaluate = lazy._evaluate
+    monkeypatch.setattr(lazy, '_evaluate', lambda index: evaluated.append(index) or evaluate(index))
+
+    lazy[1]
+    assert len(evaluated) == 4
+    evaluated.clear()
+    lazy[1, 2]
+    assert len(evaluated) <= 1
+
+
+def test_added_container_is_copied(parametric_loops):
+    lazy = make_segment(True).P1.data
+    for reverse in [False, True]:
+        eager = make_segment(False).P2.data
+        expected = [(lazy.get_item(index) + eager[index]).render() for index in np.ndindex(*lazy.shape)]
+        result = eager + lazy if reverse else lazy + eager
+        assert isinstance(result, parametric_data_container)
+
+        # modify the added container after the addition
+        for index in np.ndindex(*eager.shape):
+            eager[index].add_pulse_data(base_pulse_element(0, 10, 500, 500))
+        for index, waveform in zip(np.ndindex(*lazy.shape), expected):
+            np.testing.assert_array_equal(result.get_item(index).render(), waveform)
@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def test_per_segment_equal_to_single_waveform(uploader, play, make_sequence):
+    sequence = make_sequence(t_seg1=105, t_seg3=120)
+    for index in [(0,), (3,)]:
+        expected, n_queued = play(sequence, index)
+        assert n_queued == {'P1':1, 'P2':1}
+
+        uploader.upload_per_segment = True
+        played, n_queued = play(sequence, index)
+        uploader.upload_per_segment = False
+        # 3 segments and the compensation with zero padding
+        assert n_queued == {'P1':4, 'P2':4}
+        for channel_name in ['P1', 'P2']:
+            np.testing.assert_array_equal(played[channel_name], expected[channel_name])
+
+
+def test_segments_equal_for_all_indices_are_reused(uploader, play, make_sequence):
+    # aligned segment boundaries
+    sequence = make_sequence(t_seg3=120)
+    uploader.upload_per_segment = True
+    jobs = []
+    for i in range(4):
+        job = uploader.create_job(sequence, (i,), 'seq', 1)
+        uploader.add_upload_job(job)
+        jobs.append(job)
+    stats = uploader.get_waveform_statistics()
+    # Segment 1 of P1 differs per index. The length of the compensation is set by P1, so it differs per index
+    # for both channels. The other segments are reused.
+    assert stats['hits'] == 3*2 + 3*3
+    for job in jobs:
+        job.release()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def sequence(make_sequence):
+    return make_sequence(amplitude=(400, 1600, 4), duration=(100, 400, 3), mw_amplitude=1000)
+
+
+def test_segment_npt_batch(sequence):
+    seg1, _ = sequence
+    indices = list(np.ndindex(3, 4))
+    for pre_delay, post_delay, sample_rate in [(0, 0, 1e9), (-7, 12, 1e9), (-10, 25, 1e8)]:
+        npt = seg1.P1.get_segment_npt_batch(indices, pre_delay, post_delay, sample_rate)
+        expected = [seg1.P1.get_segment_npt(index, pre_delay, post_delay, sample_rate) for index in indices]
+        np.testing.assert_array_equal(npt, expected)
+    expected = [len(seg1.P1.get_segment(index)) for index in indices]
+    np.testing.assert_array_equal(seg1.P1.get_segment_npt_batch(indices), expected)
+    np.testing.assert_array_equal(seg1.P2.get_segment_npt_batch(), seg1.P2.get_segment_npt_batch(indices))
+
+
+def test_preflight_equal_to_upload(uploader, sequence):
+    report = uploader.preflight(sequence, (3, 4))
+    assert len(report.indices) == 12
+
+    for i, index in enumerate(report.indices):
+        index = tuple(index)
+        npt = sum(seg.P1.get_segment_npt(index) for seg in sequence)
+        assert report.npt[i] == npt
+        for channel_name in ['P1', 'P2']:
+            integral = sum(getattr(seg, channel_name).integrate(index) for seg in sequence)
+            assert report.integral[channel_name][i] == pytest.approx(integral)
+
+        job = uploader.create_job(sequence, index, 'seq', 1)
+        uploader.add_upload_job(job)
+        for queue in job.channel_queues.values():
+            assert len(queue[0].wave_reference.waveform) == report.upload_npt[i]
+        job.release()
+
+
+def test_preflight_violations(uploader, sequence):
+    report = uploader.preflight(sequence, (3, 4))
+    assert not report.ok
+    # amplitude 1600 mV exceeds the AWG range of 1500 mV
+    amplitude_violations = [violation for violation in report.violations if violation.kind == 'amplitude']
+    assert sorted(violation.index for violation in amplitude_violations) == [(0, 3), (1, 3), (2, 3)]
+    for violation in amplitude_violations:
+        assert violation.channel_name == 'P1'
+        assert violation.value == pytest.approx(1600)
+        assert violation.limit == 1500
+    assert np.all(report.v_max['P2'] < 1500)
+
+    # indices without violations
+    report = uploader.preflight(sequence, (3, 4), indices=[(0, 0), (2, 2)])
+    assert report.ok
+
+    # compensation of 1600 mV during 400 ns with a limit of 1000 mV takes more than 600 ns
+    report = uploader.preflight(sequence, (3, 4), max_compensation_time=600)
+    compensation_violations = [violation for violation in report.violations if violation.kind == 'compensation_time']
+    assert [violation.index for violation in compensation_violations] == [(2, 3)]
+    assert compensation_violations[0].value > 600
+
+
+def test_preflight_MW_extrema_near_limit(uploader, sequence):
+    index = (0, 0)
+    waveform = np.concatenate([seg.P2.get_segment(index) for seg in sequence])
+
+    # the bound of the MW pulse is far from the limit
+    report = uploader.preflight(sequence, (3, 4), indices=[index], neutralize=False)
+    assert report.v_max['P2'][0] >= np.max(waveform)
+
+    # the bound (1150 mV) exceeds the limit (1125 mV): exact maximum
+    uploader.channel_attenuation['P2'] = 0.75
+    report = uploader.preflight(sequence, (3, 4), indices=[index], neutralize=False)
+    assert report.v_max['P2'][0] == pytest.approx(np.max(waveform))
+    assert report.ok
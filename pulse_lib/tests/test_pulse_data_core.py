@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data, _render_baseband_loop
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+
+
+def render_table(table, total_time, sample_rate, starts=None):
+    sample_time_step = 1e9/sample_rate
+    wvf = np.zeros(int(total_time/sample_time_step) + 3)
+    _render_baseband_loop(wvf, np.asarray(table[0]), np.asarray(table[1]), total_time, sample_time_step, 0,
+                          None if starts is None else np.asarray(starts))
+    return wvf
+
+
+def test_start_on_half_sample_is_rendered_from_next_sample():
+    # 1e8 Sa/s: start at 1.5 sample, stop at 4.5 sample.
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(15, 45, 1.0, 1.0))
+    np.testing.assert_array_equal(data.render(0, 0, 1e8), [0, 0, 1, 1, 0])
+
+
+def test_ramp_start_on_half_sample():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(15, 55, 0.0, 4.0))
+    wvf = data.render(0, 0, 1e8)
+    assert wvf[1] == 0.0
+    assert wvf[2] == 0.0
+
+
+@pytest.mark.parametrize('sample_rate', [1e8, 1e9])
+@pytest.mark.parametrize('time_step', [0.25, 0.5, 2.5, 5.0])
+def test_rendering_same_as_previous_kernel(sample_rate, time_step):
+    # the previous kernel (np.unique on time stamps shifted by 1e-6 ns) is the reference for the rounding.
+    # It rounds a stop to the next sample when a start is at the same half sample; these cases are skipped.
+    sample_time_step = 1e9/sample_rate
+    rng = np.random.default_rng(int(time_step*100))
+    for i in range(200):
+        data = pulse_data()
+        starts = set()
+        stops = set()
+        for j in range(rng.integers(1, 5)):
+            start = rng.integers(0, 40)*time_step
+            stop = start + rng.integers(1, 20)*time_step
+            v_start = float(rng.integers(-5, 5))
+            v_stop = v_start if rng.random() < 0.5 else float(rng.integers(-5, 5))
+            data.add_pulse_data(base_pulse_element(start, stop, v_start, v_stop))
+            starts.add(start)
+            stops.add(stop)
+        if any(t % sample_time_step == sample_time_step/2 for t in starts & stops):
+            continue
+        baseband = data.baseband_pulse_data
+        expected = render_table(baseband.pulse_data_unique, baseband.total_time, sample_rate)
+        result = render_table(baseband.pulse_data, baseband.total_time, sample_rate, baseband.pulse_starts)
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-5)
+
+
+def test_rounding_independent_of_other_pulses():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0.5, 10, 100.0, 100.0))
+    np.testing.assert_array_equal(data.render(0, 0, 1e9)[:2], [0, 100])
+    # a tiny pulse just after the start does not shift the start of the block
+    data.add_pulse_data(base_pulse_element(0.5000005, 10, 1e-9, 1e-9))
+    assert data.render(0, 0, 1e9)[0] == 0
+
+
+def test_exact_times_in_table():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(15, 45, 1.0, 1.0))
+    times, voltages = data.baseband_pulse_data.pulse_data
+    starts = data.baseband_pulse_data.pulse_starts
+    assert [(t, v, s) for t, v, s in zip(times, voltages, starts) if t > 1] == [
+        (15.0, 0.0, 0), (15.0, 1.0, 1), (45.0, 1.0, 0), (45.0, 0.0, 0)]
+
+
+def test_adjacent_pulses_have_no_gap():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 10, 1.0, 1.0))
+    data.add_pulse_data(base_pulse_element(10, 20, 2.0, 2.0))
+    wvf = data.render(0, 0, 1e9)
+    np.testing.assert_array_equal(wvf[:10], 1.0)
+    np.testing.assert_array_equal(wvf[10:20], 2.0)
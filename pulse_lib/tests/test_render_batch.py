@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.segment_container import segment_container
+import pulse_lib.segments.utility.looping as lp
+
+
+def make_segment(mw=False):
+    amplitude = lp.linspace(100, 400, 4, axis=0, name='amp', unit='mV')
+    duration = lp.linspace(100, 300.5, 3, axis=1, name='t', unit='ns')
+    seg = segment_container(['P1', 'P2'])
+    seg.P1.add_block(0, duration, amplitude)
+    seg.P1.add_ramp_ss(0, 77.5, -50, 50)
+    seg.P1.reset_time()
+    seg.P1.add_block(0, 10, 30)
+    seg.P2.add_ramp_ss(0, 100, 0, amplitude)
+    seg.P2.add_block(20, 50, -20)
+    if mw:
+        seg.P1.add_sin(10, 60, amplitude*0.1, 2e7)
+        seg.P2.add_sin(0, duration, 50, 3e7)
+    seg.reset_time()
+    seg.extend_dim((3, 4), ref=True)
+    return seg
+
+
+def assert_batch_equal_to_single(channel, indices, pre_delay=0, post_delay=0, sample_rate=1e9):
+    waveforms = channel.get_segment_batch(indices, pre_delay, post_delay, sample_rate)
+    if indices is None:
+        indices = list(np.ndindex(*channel.pulse_data_all.shape))
+    assert waveforms.shape[0] == len(indices)
+
+    for i, index in enumerate(indices):
+        expected = channel.get_segment(index, pre_delay, post_delay, sample_rate)
+        npt = len(expected)
+        np.testing.assert_allclose(waveforms[i,:npt], expected, rtol=0, atol=1e-9)
+        # padded with the last value
+        np.testing.assert_array_equal(waveforms[i,npt:], expected[-1])
+    return waveforms
+
+
+@pytest.mark.parametrize('sample_rate', [1e9, 2.5e8])
+@pytest.mark.parametrize('mw', [False, True])
+def test_batch_equal_to_single(sample_rate, mw):
+    seg = make_segment(mw)
+    for channel_name in ['P1', 'P2']:
+        assert_batch_equal_to_single(getattr(seg, channel_name), None, sample_rate=sample_rate)
+
+
+def test_unequal_lengths():
+    seg = make_segment()
+    indices = [(2, 0), (0, 0), (1, 3)]
+    waveforms = assert_batch_equal_to_single(seg.P1, indices)
+    npt = [len(seg.P1.get_segment(index)) for index in indices]
+    assert npt[1] < npt[2] < npt[0]
+    assert waveforms.shape == (3, npt[0])
+
+
+@pytest.mark.parametrize('sample_rate', [1e9, 2.5e8])
+def test_pre_and_post_delay(sample_rate):
+    seg = make_segment(mw=True)
+    for pre_delay, post_delay in [(-10, 0), (0, 25), (-12, 12)]:
+        # the cached waveform is rendered with the delays of the first call
+        pulse_data.clear_waveform_cache()
+        for channel_name in ['P1', 'P2']:
+            assert_batch_equal_to_single(getattr(seg, channel_name), None, pre_delay, post_delay, sample_rate)
+
+
+def test_indices():
+    seg = make_segment(mw=True)
+    indices = [(2, 1), (0, 3), (2, 1), (1, 0)]
+    waveforms = assert_batch_equal_to_single(seg.P2, indices)
+    np.testing.assert_array_equal(waveforms[0], waveforms[2])
+
+    all_waveforms = seg.P2.get_segment_batch()
+    for i, index in enumerate(indices):
+        flat_index = np.ravel_multi_index(index, (3, 4))
+        npt = len(seg.P2.get_segment(index))
+        np.testing.assert_array_equal(waveforms[i,:npt], all_waveforms[flat_index,:npt])
+
+
+def test_empty():
+    seg = make_segment()
+    waveforms = seg.P1.get_segment_batch([])
+    assert waveforms.shape == (0, 0)
+    np.testing.assert_array_equal(waveforms, np.zeros((0, 0)))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.data_classes.data_pulse import pulse_data
+from pulse_lib.segments.data_classes.data_pulse_core import base_pulse_element
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    pulse_data.clear_waveform_cache()
+    pulse_data.reset_waveform_cache_stats()
+    yield
+    pulse_data.clear_waveform_cache()
+
+
+def make_data():
+    data = pulse_data()
+    data.add_pulse_data(base_pulse_element(0, 100, 10.0, 30.0))
+    data.add_pulse_data(base_pulse_element(20, 40, 5.0, 5.0))
+    return data
+
+
+@pytest.mark.parametrize('pre_delay, post_delay', [(0, 0), (-10, 20), (-5.5, 7.2)])
+def test_render_in_out_same_as_render(pre_delay, post_delay):
+    data = make_data()
+    expected = make_data().render(pre_delay, post_delay, 1e9)
+    out = np.full(data.get_waveform_npt(pre_delay, post_delay, 1e9), np.nan)
+    result = data.render(pre_delay, post_delay, 1e9, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_render_in_out_fills_cache():
+    data = make_data()
+    npt = data.get_waveform_npt(0, 0, 1e9)
+    for i in range(5):
+        data.render(0, 0, 1e9, out=np.empty(npt))
+    stats = pulse_data.get_waveform_cache_stats()
+    assert stats['renders'] == 1
+    assert stats['hits'] == 4
+    assert stats['entries'] == 1
+
+
+def test_render_out_wrong_length():
+    data = make_data()
+    npt = data.get_waveform_npt(0, 0, 1e9)
+    with pytest.raises(ValueError):
+        data.render(0, 0, 1e9, out=np.empty(npt + 1))
+
+
+def test_get_waveform_npt():
+    data = make_data()
+    for pre_delay, post_delay, sample_rate in [(0, 0, 1e9), (-10, 20, 1e9), (-10, 20, 1e8), (-3.3, 0, 2e8)]:
+        npt = data.get_waveform_npt(pre_delay, post_delay, sample_rate)
+        assert npt == len(make_data().render(pre_delay, post_delay, sample_rate))
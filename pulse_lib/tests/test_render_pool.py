@@ -0,0 +1,79 @@
+import gc
+import numpy as np
+import pytest
+
+from pulse_lib.keysight.M3202A_uploader import UploadAggregator, Job
+from pulse_lib.render_pool import render_pool, shared_waveform
+
+
+channels = ['P1', 'P2']
+
+
+@pytest.fixture
+def pool_and_sequence(make_sequence):
+    sequence = make_sequence(amplitude=(-100, 100, 4))
+    pool = render_pool(sequence, channels, n_processes=2)
+    assert pool.active
+    yield pool, sequence
+    pool.shutdown()
+
+
+def render_in_process(sequence, channel_name):
+    return np.array([np.concatenate([seg.get_waveform(channel_name, (i,), 0, 0, 1e9) for seg in sequence])
+                     for i in range(4)])
+
+
+def upload(sequence, index, pool, dac_codes=False):
+    aggregator = UploadAggregator(channels, {'P1':1.0, 'P2':1.0}, {}, {'P1':(0, 0), 'P2':(0, 0)}, dac_codes=dac_codes)
+    job = Job([], sequence, index, None, 1)
+    job.render_pool = pool
+    waveforms = {}
+    aggregator.upload_job(job, lambda channel_name, waveform: waveforms.setdefault(channel_name, waveform.copy()))
+    for shared_buffer in job.shared_buffers:
+        shared_buffer.release()
+    job.released = True
+    return waveforms
+
+
+def test_render_indices(pool_and_sequence):
+    pool, sequence = pool_and_sequence
+    waveforms = pool.render_indices('P1')
+    np.testing.assert_array_equal(waveforms.data, render_in_process(sequence, 'P1'))
+    waveforms.release()
+
+
+def test_changed_segment_is_rendered(pool_and_sequence):
+    pool, sequence = pool_and_sequence
+    sequence[0].P1.add_block(0, 100, 10)
+    waveforms = pool.render_indices('P1')
+    expected = render_in_process(sequence, 'P1')
+    # the block is added after the end of segment 1
+    assert expected[0, 150] == 10
+    np.testing.assert_array_equal(waveforms.data, expected)
+    waveforms.release()
+
+    sequence[0].P2.add_block(20, 40, 30)
+    for index in [(0,), (3,)]:
+        for dac_codes in [False, True]:
+            result = upload(sequence, index, pool, dac_codes)
+            expected = upload(sequence, index, None, dac_codes)
+            for channel in channels:
+                np.testing.assert_array_equal(result[channel], expected[channel])
+    assert pool.active
+    assert len(pool.task_timings) == 1 + 4*len(channels)
+
+
+def test_shared_memory_freed_after_last_view():
+    waveform = shared_waveform((100,))
+    finalizer = waveform._finalizer
+    view = waveform.data[10:20]
+    view[:] = 1.0
+    waveform.release()
+    del waveform
+    gc.collect()
+    # view still valid
+    assert finalizer.alive
+    np.testing.assert_array_equal(view, 1.0)
+    del view
+    gc.collect()
+    assert not finalizer.alive
@@ -0,0 +1,80 @@
+import copy
+import numpy as np
+import pytest
+
+from pulse_lib.segments.segment_container import segment_container
+
+
+def make_repeated_data(n):
+    seg = segment_container(['P1', 'P2'])
+    seg.P1.add_block(0, 20, 100)
+    seg.P1.add_ramp_ss(20, 50, -50, 30)
+    seg.P1.repeat(n)
+    return seg.P1.pulse_data_all.flat[0]
+
+
+def materialize(data):
+    data = copy.copy(data)
+    # accessing the breakpoint table materializes the repetition
+    data.baseband_pulse_data
+    assert data.repeat_count == 1
+    return data
+
+
+def test_repeat_is_symbolic():
+    data = make_repeated_data(4)
+    assert data.repeat_count == 5
+    assert data.total_time == 250
+    assert data.get_repeat_info(0, 1e9) == (0, 50, 5)
+    assert data.get_repeat_info(-7, 1e9) == (7, 50, 5)
+    assert data.get_repeat_info(0, 1e8) == (0, 5, 5)
+    # unit is not a whole number of samples
+    assert data.get_repeat_info(0, 3e7) is None
+    # copies keep the symbolic form
+    assert copy.copy(data).repeat_count == 5
+
+
+@pytest.mark.parametrize('pre_delay,post_delay,sample_rate', [(0, 0, 1e9), (-7, 5, 1e9), (-10, 0, 1e8), (0, 0, 3e7)])
+def test_repeat_equal_to_materialized(pre_delay, post_delay, sample_rate):
+    data = make_repeated_data(4)
+    expected = materialize(data)
+
+    assert data.total_time == expected.total_time
+    np.testing.assert_allclose(data._render(sample_rate, pre_delay, post_delay),
+                               expected._render(sample_rate, pre_delay, post_delay), atol=1e-9)
+    assert data.integrate_waveform(pre_delay, post_delay, sample_rate) == pytest.approx(
+            expected.integrate_waveform(pre_delay, post_delay, sample_rate), rel=1e-6)
+    assert data.get_vmax(sample_rate) == expected.get_vmax(sample_rate)
+    assert data.get_vmin(sample_rate) == expected.get_vmin(sample_rate)
+
+
+def test_adding_pulses_materializes_repeat():
+    data = make_repeated_data(2)
+    expected = materialize(data)
+    seg = segment_container(['P1'])
+    seg.P1.add_block(10, 30, 50)
+    other = seg.P1.pulse_data_all.flat[0]
+
+    result = data + other
+    assert result.repeat_count == 1
+    np.testing.assert_allclose(result._render(1e9), (expected + other)._render(1e9), atol=1e-9)
+
+
+def test_repeated_segment_is_played_with_queue_cycles(uploader, play, make_sequence):
+    # the repeated segment is aligned to the AWG waveform granularity
+    sequence = make_sequence(t_seg2=80, repeat=9)
+    for index in [(0,), (3,)]:
+        expected, n_queued = play(sequence, index)
+        assert n_queued == {'P1':1, 'P2':1}
+
+        uploader.upload_per_segment = True
+        job = uploader.create_job(sequence, index, 'seq', 1)
+        uploader.add_upload_job(job)
+        cycles = [queue_item.cycles for queue_item in job.channel_queues['P1']]
+        assert max(cycles) > 1
+        job.release()
+
+        played, _ = play(sequence, index)
+        uploader.upload_per_segment = False
+        for channel_name in ['P1', 'P2']:
+            np.testing.assert_allclose(played[channel_name], expected[channel_name], atol=1e-12)
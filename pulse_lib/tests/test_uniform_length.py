@@ -0,0 +1,93 @@
+import logging
+import numpy as np
+import pytest
+
+from pulse_lib.keysight.M3202A_uploader import PreflightReport
+import pulse_lib.segments.utility.looping as lp
+
+
+def test_get_uniform_length():
+    # longest compensation and longest waveform, aligned
+    report = PreflightReport(np.array([(0,), (1,)]), np.array([100, 203]), np.array([55, 20]), None,
+                             {}, {}, {}, [])
+    assert report.get_uniform_length() == (55, 260)
+
+
+def test_uniform_length_upload(uploader, play, make_sequence):
+    sequence = make_sequence(duration=(100, 300, 3))
+    report = uploader.preflight(sequence, (3, 4))
+    compensation_npt, upload_npt = report.get_uniform_length()
+    assert compensation_npt == np.max(report.compensation_npt)
+    assert upload_npt >= np.max(report.upload_npt) - 20
+
+    playback_times = set()
+    for index in [(0, 0), (2, 0), (0, 3), (2, 3)]:
+        expected, _ = play(sequence, index)
+
+        job = uploader.create_job(sequence, index, 'seq', 1)
+        job.compensation_npt = compensation_npt
+        job.upload_npt = upload_npt
+        job.add_HVI(object(), None, lambda *args, **kwargs: None)
+        uploader.add_upload_job(job)
+        playback_times.add(job.playback_time)
+        waveforms = {channel_name:queue[0].wave_reference.waveform for channel_name, queue in job.channel_queues.items()}
+        uploader.play('seq', index)
+
+        npt = sum(seg.P1.get_segment_npt(index) for seg in sequence)
+        for channel_name, waveform in waveforms.items():
+            assert len(waveform) == upload_npt + 20
+            # the pulses are equal, the compensation is longer and lower
+            np.testing.assert_allclose(waveform[:npt], expected[channel_name][:npt]/1.5, atol=1e-12)
+            np.testing.assert_array_equal(waveform[npt + compensation_npt:], 0)
+            assert abs(np.sum(waveform)) < 0.01*np.sum(np.abs(waveform))
+    assert len(playback_times) == 1
+
+
+def test_job_longer_than_uniform_length(uploader, caplog, make_sequence):
+    sequence = make_sequence(duration=(100, 300, 3))
+    report = uploader.preflight(sequence, (3, 4), indices=[(0, 0)])
+    compensation_npt, upload_npt = report.get_uniform_length()
+
+    job = uploader.create_job(sequence, (2, 3), 'seq', 1)
+    job.compensation_npt = compensation_npt
+    job.upload_npt = upload_npt
+    with caplog.at_level(logging.WARNING):
+        uploader.add_upload_job(job)
+    assert 'uniform length' in caplog.text
+    waveform = job.channel_queues['P1'][0].wave_reference.waveform
+    # uploaded with its own length
+    assert len(waveform) > upload_npt + 20
+    assert len(waveform) == uploader.preflight(sequence, (3, 4), indices=[(2, 3)]).upload_npt[0]
+
+
+def test_sequencer_uniform_length(pulse):
+    sequences = []
+    for uniform in [False, True]:
+        seg = pulse.mk_segment()
+        seg.P1.add_block(0, lp.linspace(100, 300, 3, axis=0, name='t', unit='ns'), 200)
+        seg.P1.add_ramp_ss(0, 50, 0, 100)
+        seq = pulse.mk_sequence([seg])
+        seq.set_uniform_length(uniform)
+        sequences.append(seq)
+    baseline, seq = sequences
+    compensation_npt, upload_npt = seq.get_uniform_length()
+
+    lengths = set()
+    for i in range(3):
+        waveforms = []
+        for sequence in [baseline, seq]:
+            job = sequence.upload((i,))
+            assert job.index == (i,)
+            waveforms.append(job.channel_queues['P1'][0].wave_reference.waveform)
+            job.release()
+        assert job.compensation_npt == compensation_npt
+        expected, waveform = waveforms
+        lengths.add(len(waveform))
+        npt = seq.sequence[0].P1.get_segment_npt((i,))
+        np.testing.assert_allclose(waveform[:npt], expected[:npt], atol=1e-12)
+        # the compensation is longer and lower, with the same integral
+        assert len(waveform) >= len(expected)
+        assert np.sum(waveform[npt:]) == pytest.approx(np.sum(expected[npt:]), rel=1e-3)
+        assert np.sum(waveform) == pytest.approx(np.sum(expected), abs=1e-3*np.sum(np.abs(expected)))
+    # one length for all indices
+    assert lengths == {upload_npt + 20}
@@ -0,0 +1,155 @@
+import threading
+import time
+import numpy as np
+import pytest
+
+from pulse_lib.keysight.awg_memory import WaveformRegistry
+import pulse_lib.segments.utility.looping as lp
+
+
+class WaveReference:
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+def record_resident_bytes(awg, registry):
+    # resident bytes at every upload, including the reservation of the upload.
+    resident_bytes = []
+    upload_waveform = awg.upload_waveform
+    def upload(wave):
+        resident_bytes.append(registry.resident_bytes)
+        return upload_waveform(wave)
+    awg.upload_waveform = upload
+    return resident_bytes
+
+
+def test_concurrent_upload_of_same_waveform():
+    registry = WaveformRegistry()
+    uploaded = []
+    barrier = threading.Barrier(2)
+    def upload():
+        barrier.wait()
+        wave_ref = WaveReference()
+        uploaded.append(wave_ref)
+        return wave_ref
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.acquire('key', upload, 100)))
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(uploaded) == 2
+    assert results[0][0] is results[1][0]
+    assert sorted(uploaded_flag for _, uploaded_flag in results) == [False, True]
+    # the losing upload is released and not counted
+    assert sum(wave_ref.released for wave_ref in uploaded) == 1
+    stats = registry.get_statistics()
+    assert stats['uploads'] == 1
+    assert stats['bytes_uploaded'] == 100
+    assert stats['resident_bytes'] == 100
+
+
+def test_acquire_waits_for_release():
+    registry = WaveformRegistry()
+    wave_ref1, _ = registry.acquire('a', WaveReference, 100, max_bytes=150)
+    # the caller holds all resident memory: no wait.
+    wave_ref2, _ = registry.acquire('b', WaveReference, 100, max_bytes=150, held_references=[wave_ref1])
+    assert registry.resident_bytes == 200
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(registry.acquire('c', WaveReference, 100, max_bytes=150)))
+    thread.start()
+    time.sleep(0.05)
+    assert len(result) == 0
+    registry.release(wave_ref1)
+    time.sleep(0.05)
+    assert len(result) == 0
+    registry.release(wave_ref2)
+    thread.join(1.0)
+    assert len(result) == 1
+    assert registry.resident_bytes == 100
+
+
+def test_failed_upload_releases_reservation():
+    registry = WaveformRegistry()
+    def upload():
+        raise RuntimeError('upload failed')
+    with pytest.raises(RuntimeError):
+        registry.acquire('a', upload, 100)
+    assert registry.resident_bytes == 0
+
+
+@pytest.mark.parametrize('deduplicate', [False, True])
+def test_max_upload_bytes_bounds_AWG_memory(awgs, uploader, make_sequence, deduplicate):
+    # P1 differs per index. The compensation is shorter than a sample, so P2 is equal for all indices.
+    sequence = make_sequence(amplitude=(1, 10, 10))
+    uploader.deduplicate_waveforms = deduplicate
+    job = uploader.create_job(sequence, (0,), 'seq', 1)
+    uploader.add_upload_job(job)
+    waveform_bytes = job.nbytes // 2
+    job.release()
+    assert uploader.waveform_registry.resident_bytes == 0
+
+    uploader.max_upload_bytes = 3*waveform_bytes
+    resident_bytes = record_resident_bytes(awgs['AWG1'], uploader.waveform_registry)
+    jobs = [uploader.create_job(sequence, (i,), 'seq', 1) for i in range(4)]
+    futures = [uploader.add_upload_job_async(job) for job in jobs]
+    futures[0].result()
+    time.sleep(0.1)
+    # job 1 needs 1 (dedup) or 2 more waveforms
+    assert futures[1].done() == deduplicate
+    for i, job in enumerate(jobs):
+        job.release()
+        if i + 1 < len(jobs):
+            futures[i + 1].result(timeout=2.0)
+
+    assert max(resident_bytes) <= 3*waveform_bytes
+    assert uploader.waveform_registry.resident_bytes == 0
+
+
+def test_memory_of_shared_waveform_is_counted_after_release(awgs, uploader, make_sequence):
+    sequence = make_sequence(amplitude=(1, 10, 10))
+    job = uploader.create_job(sequence, (0,), 'seq', 1)
+    uploader.add_upload_job(job)
+    waveform_bytes = job.nbytes // 2
+
+    uploader.max_upload_bytes = 3*waveform_bytes
+    job1 = uploader.create_job(sequence, (1,), 'seq', 1)
+    uploader.add_upload_job(job1)
+    assert job1.nbytes == waveform_bytes
+    job.release()
+    # P2 of job 0 is still used by job 1
+    assert uploader.waveform_registry.resident_bytes == 2*waveform_bytes
+
+    job2 = uploader.create_job(sequence, (2,), 'seq', 1)
+    job3 = uploader.create_job(sequence, (3,), 'seq', 1)
+    uploader.add_upload_job_async(job2).result(timeout=2.0)
+    future3 = uploader.add_upload_job_async(job3)
+    time.sleep(0.1)
+    assert not future3.done()
+    job1.release()
+    future3.result(timeout=2.0)
+    assert uploader.waveform_registry.resident_bytes == 3*waveform_bytes
+    job2.release()
+    job3.release()
+    assert uploader.waveform_registry.resident_bytes == 0
+
+
+def test_prefetch_repeated_index(pulse):
+    seg = pulse.mk_segment()
+    seg.P1.add_block(0, 100, lp.linspace(10, 100, 3, axis=0, name='amp', unit='mV'))
+    seq = pulse.mk_sequence([seg])
+    seq.add_HVI('HVI', lambda awgs, channel_map, **kwargs: object(), lambda *args, **kwargs: None, lambda *args, **kwargs: None)
+
+    played = []
+    for index in seq.prefetch([(0,), (1,), (0,), (0,), (2,)], lookahead=3):
+        seq.play(index)
+        played.append(index)
+    assert played == [(0,), (1,), (0,), (0,), (2,)]
+    assert len(seq.uploader.jobs) == 0
@@ -0,0 +1,97 @@
+import threading
+import time
+import pytest
+
+from pulse_lib.keysight.M3202A_uploader import UploadScheduler
+
+
+class MockJob:
+    def __init__(self, name, priority=0):
+        self.name = name
+        self.priority = priority
+        self.seq_id = None
+        self.index = name
+
+
+class BlockingUpload:
+    '''
+    upload function that blocks on the first job till unblock() is called.
+    '''
+    def __init__(self):
+        self.order = []
+        self._started = threading.Event()
+        self._unblock = threading.Event()
+
+    def __call__(self, job):
+        if not self._started.is_set():
+            self._started.set()
+            self._unblock.wait(2.0)
+        if job.name == 'fail':
+            raise RuntimeError('upload failed')
+        self.order.append(job.name)
+
+    def wait_started(self):
+        assert self._started.wait(2.0)
+
+    def unblock(self):
+        self._unblock.set()
+
+
+def submit_all(scheduler, upload, jobs):
+    futures = [scheduler.submit(MockJob('first'))]
+    upload.wait_started()
+    futures += [scheduler.submit(job) for job in jobs]
+    return futures
+
+
+def test_priority_order():
+    upload = BlockingUpload()
+    scheduler = UploadScheduler(upload, aging_rate=0.0)
+    futures = submit_all(scheduler, upload,
+                         [MockJob('low', -1), MockJob('a'), MockJob('high', 5), MockJob('b'), MockJob('c', 1)])
+    assert scheduler.n_waiting == 5
+    upload.unblock()
+    for future in futures:
+        future.result(2.0)
+    assert upload.order == ['first', 'high', 'c', 'a', 'b', 'low']
+
+
+def test_aging_passes_newer_jobs_with_higher_priority():
+    upload = BlockingUpload()
+    scheduler = UploadScheduler(upload, aging_rate=100.0)
+    futures = [scheduler.submit(MockJob('first'))]
+    upload.wait_started()
+    futures.append(scheduler.submit(MockJob('old', 0)))
+    time.sleep(0.1)
+    # priority 0 + 100/s * 0.1 s > 5
+    futures.append(scheduler.submit(MockJob('new', 5)))
+    futures.append(scheduler.submit(MockJob('newest', 50)))
+    upload.unblock()
+    for future in futures:
+        future.result(2.0)
+    assert upload.order == ['first', 'newest', 'old', 'new']
+
+
+def test_cancel_and_exception():
+    upload = BlockingUpload()
+    scheduler = UploadScheduler(upload)
+    futures = submit_all(scheduler, upload, [MockJob('cancelled'), MockJob('fail'), MockJob('last')])
+    assert futures[1].cancel()
+    upload.unblock()
+    with pytest.raises(RuntimeError):
+        futures[2].result(2.0)
+    futures[3].result(2.0)
+    assert upload.order == ['first', 'last']
+
+
+def test_statistics():
+    upload = BlockingUpload()
+    scheduler = UploadScheduler(upload, aging_rate=0.0)
+    futures = submit_all(scheduler, upload, [MockJob('a', 1), MockJob('b', 1), MockJob('c', 0)])
+    upload.unblock()
+    for future in futures:
+        future.result(2.0)
+    statistics = scheduler.get_statistics()
+    assert statistics[0]['jobs'] == 2
+    assert statistics[1]['jobs'] == 2
+    assert statistics[0]['max_wait'] >= statistics[1]['max_wait']
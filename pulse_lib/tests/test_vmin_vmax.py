@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from pulse_lib.segments.segment_container import segment_container
+import pulse_lib.segments.utility.looping as lp
+
+
+def make_segment(overlap):
+    # MW pulses of 100 and 50 mV on a baseband between 0 and at most 200 mV.
+    amplitude = lp.linspace(100, 200, 3, axis=0, name='amp', unit='mV')
+    seg = segment_container(['P1', 'P2'])
+    seg.P1.add_block(0, 500, amplitude)
+    seg.P1.add_sin(50, 150, 100, 2e7)
+    t_start = 100 if overlap else 150
+    seg.P1.add_sin(t_start, t_start + 100, 50, 3e7)
+    seg.reset_time()
+    seg.extend_dim((3,), ref=True)
+    return seg
+
+
+@pytest.mark.parametrize('overlap', [False, True])
+def test_exact_without_limit(overlap):
+    seg = make_segment(overlap)
+    for i in range(3):
+        waveform = seg.P1.get_segment((i,))
+        assert seg.P1.v_max((i,)) == np.max(waveform)
+        assert seg.P1.v_min((i,)) == np.min(waveform)
+
+
+@pytest.mark.parametrize('overlap', [False, True])
+def test_bound_adds_overlapping_pulses(overlap):
+    seg = make_segment(overlap)
+    data = seg.P1.pulse_data_all.flat[2]
+    peak = 150 if overlap else 100
+    assert data.get_vmax(1e9, limit=1000) == pytest.approx(200 + peak)
+    assert data.get_vmin(1e9, limit=-1000) == pytest.approx(-peak)
+    waveform = seg.P1.get_segment((2,))
+    assert data.get_vmax(1e9, limit=1000) >= np.max(waveform)
+    assert data.get_vmin(1e9, limit=-1000) <= np.min(waveform)
+
+    # bound within tolerance of the limit: exact value
+    assert data.get_vmax(1e9, limit=200 + peak, tolerance=10) == np.max(waveform)
+    assert data.get_vmin(1e9, limit=-peak, tolerance=10) == np.min(waveform)
+
+
+def test_touching_pulses_do_not_overlap():
+    seg = segment_container(['P1'])
+    seg.P1.add_sin(0, 100, 100, 2e7)
+    seg.P1.add_sin(100, 200, 80, 2e7)
+    data = seg.P1.pulse_data_all.flat[0]
+    assert data.get_vmax(1e9, limit=1000) == pytest.approx(100)
+
+
+@pytest.mark.parametrize('overlap', [False, True])
+def test_batch_equal_to_single(overlap):
+    seg = make_segment(overlap)
+    for limits in [(None, None), (-1000, 1000), (-10, 10)]:
+        v_min, v_max = seg.P1.v_min_max_batch(None, 1e9, limits)
+        for i in range(3):
+            data = seg.P1.pulse_data_all.flat[i]
+            if limits[0] is None:
+                assert v_min[i] == data.get_vmin(1e9)
+                assert v_max[i] == data.get_vmax(1e9)
+            else:
+                assert v_min[i] == pytest.approx(data.get_vmin(1e9, limits[0]))
+                assert v_max[i] == pytest.approx(data.get_vmax(1e9, limits[1]))
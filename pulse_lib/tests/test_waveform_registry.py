@@ -0,0 +1,95 @@
+import numpy as np
+
+from pulse_lib.keysight.awg_memory import WaveformRegistry
+from pulse_lib.segments.segment_container import segment_container
+
+
+class WaveReference:
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+def test_reference_count():
+    registry = WaveformRegistry()
+    key = WaveformRegistry.make_key('AWG1', np.ones(100))
+    wave_ref, uploaded = registry.acquire(key, WaveReference, 800)
+    assert uploaded
+    for i in range(2):
+        ref, uploaded = registry.acquire(key, WaveReference, 800)
+        assert ref is wave_ref
+        assert not uploaded
+
+    registry.release(wave_ref)
+    registry.release(wave_ref)
+    assert not wave_ref.released
+    registry.release(wave_ref)
+    assert wave_ref.released
+
+    stats = registry.get_statistics()
+    assert stats['n_waveforms'] == 0
+    assert stats['resident_bytes'] == 0
+    assert stats['uploads'] == 1
+    assert stats['hits'] == 2
+    assert stats['bytes_saved'] == 1600
+
+    # released waveform is uploaded again
+    new_ref, uploaded = registry.acquire(key, WaveReference, 800)
+    assert uploaded
+    assert new_ref is not wave_ref
+
+
+def test_release_of_unknown_reference():
+    registry = WaveformRegistry()
+    wave_ref = WaveReference()
+    registry.release(wave_ref)
+    assert wave_ref.released
+
+
+def test_unique_upload_without_key():
+    registry = WaveformRegistry()
+    ref1, _ = registry.acquire(None, WaveReference, 100)
+    ref2, _ = registry.acquire(None, WaveReference, 100)
+    assert ref1 is not ref2
+    assert registry.get_statistics()['resident_bytes'] == 200
+    registry.release(ref1)
+    assert ref1.released
+    assert registry.get_statistics()['resident_bytes'] == 100
+
+
+def test_key():
+    waveform = np.linspace(0, 1, 100)
+    key = WaveformRegistry.make_key('AWG1', waveform)
+    assert key == WaveformRegistry.make_key('AWG1', waveform.copy())
+    # non-contiguous view with the same content
+    assert key == WaveformRegistry.make_key('AWG1', np.repeat(waveform, 2)[::2])
+    assert key != WaveformRegistry.make_key('AWG2', waveform)
+    assert key != WaveformRegistry.make_key('AWG1', waveform[:99])
+    assert key != WaveformRegistry.make_key('AWG1', waveform.astype(np.float32))
+    changed = waveform.copy()
+    changed[50] += 1e-12
+    assert key != WaveformRegistry.make_key('AWG1', changed)
+
+
+def test_uploader_reuses_waveforms(awgs, uploader):
+    seg = segment_container(['P1', 'P2'])
+    seg.P1.add_block(0, 100, 50)
+    seg.P2.add_block(0, 100, 50)
+    sequence = [seg]
+    jobs = []
+    for i in range(3):
+        job = uploader.create_job(sequence, (0,), f'seq{i}', 1)
+        uploader.add_upload_job(job)
+        jobs.append(job)
+    stats = uploader.get_waveform_statistics()
+    # P1 and P2 are equal and on the same AWG
+    assert stats['uploads'] == 1
+    assert stats['hits'] == 5
+    assert awgs['AWG1'].memory_manager.get_statistics()['n_waveforms'] == 1
+
+    for job in jobs:
+        job.release()
+    assert uploader.get_waveform_statistics()['n_waveforms'] == 0
+    assert awgs['AWG1'].memory_manager.get_statistics()['n_waveforms'] == 0